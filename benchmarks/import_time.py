@@ -0,0 +1,132 @@
+from pathlib import Path
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from spitec.callbacks.callbacks import DATA_FOLDER_ENV
+
+
+ROOT_FOLDER = Path(__file__).parent.parent
+DEFAULT_MODULE = "main"
+DEFAULT_REPEAT = 5
+# Бюджет холодного импорта main.py (медиана по запускам), с
+IMPORT_TIME_BUDGET = 1.0
+TOP_MODULES = 15
+# Тяжелые зависимости, которые импортируются при первом использовании
+LAZY_MODULES = ["pandas", "plotly.express", "h5py", "requests"]
+
+
+def parse_importtime(output: str) -> dict[str, tuple[int, int]]:
+    """
+    Parses the stderr of python -X importtime
+    Returns: self and cumulative time in microseconds by module
+    """
+    modules = dict()
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if not fields[0].strip().isdigit():
+            continue  # строка заголовка
+        modules[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return modules
+
+
+def measure_import(module: str = DEFAULT_MODULE) -> dict:
+    """
+    Imports module in a fresh interpreter
+    Returns: wall time of the process, import times by module and
+        the lazy modules that were imported anyway
+    """
+    code = (
+        f"import sys; import {module}; "
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    with tempfile.TemporaryDirectory() as folder:
+        # main.py создает кэш фоновых callback в текущей папке
+        env = os.environ | {
+            "PYTHONPATH": os.pathsep.join(
+                filter(None, [str(ROOT_FOLDER), os.environ.get("PYTHONPATH")])
+            ),
+            DATA_FOLDER_ENV: folder,
+        }
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=folder, env=env, capture_output=True, text=True, check=True,
+        )
+        wall = time.perf_counter() - start
+    modules = parse_importtime(process.stderr)
+    return {
+        "wall": wall,
+        "import": modules[module][1] / 1e6,
+        "modules": modules,
+        "lazy_imported": [name for name in process.stdout.strip().split(",") if name],
+    }
+
+
+def run_import_benchmark(module: str = DEFAULT_MODULE, repeat: int = DEFAULT_REPEAT) -> dict:
+    runs = [measure_import(module) for _ in range(repeat)]
+    self_times = dict()
+    for run in runs:
+        for name, (self_time, _) in run["modules"].items():
+            self_times.setdefault(name, []).append(self_time / 1e6)
+    top = sorted(
+        ((name, statistics.median(times)) for name, times in self_times.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:TOP_MODULES]
+    return {
+        "module": module,
+        "python": sys.version.split()[0],
+        "wall": statistics.median(run["wall"] for run in runs),
+        "import": statistics.median(run["import"] for run in runs),
+        "top_modules": [{"module": name, "self": value} for name, value in top],
+        "lazy_imported": sorted({name for run in runs for name in run["lazy_imported"]}),
+    }
+
+
+def format_import_results(results: dict) -> str:
+    lines = [
+        f"import {results['module']}: {results['import'] * 1000:.0f} ms, "
+        f"process {results['wall'] * 1000:.0f} ms",
+        f"{'module':<50} {'self ms':>8}",
+    ]
+    for item in results["top_modules"]:
+        lines.append(f"{item['module']:<50} {item['self'] * 1000:>8.1f}")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Cold start import time of the spitec application"
+    )
+    parser.add_argument("--module", default=DEFAULT_MODULE)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--budget", type=float, default=IMPORT_TIME_BUDGET,
+                        help="maximal median import time, s")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="JSON file for the results")
+    args = parser.parse_args(argv)
+
+    results = run_import_benchmark(args.module, args.repeat)
+    print(format_import_results(results))
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    failed = False
+    if results["import"] > args.budget:
+        print(f"OVER BUDGET {results['import'] * 1000:.0f} > {args.budget * 1000:.0f} ms")
+        failed = True
+    if results["lazy_imported"]:
+        print(f"EAGER IMPORT {', '.join(results['lazy_imported'])}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
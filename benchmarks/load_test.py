@@ -0,0 +1,424 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import requests
+from spitec.processing.site_processing import get_sites_coords
+from spitec.view.visualization import ProjectionType
+from spitec.callbacks.callbacks import DATA_FOLDER_ENV
+from spitec.callbacks.prewarm import PREWARM_FILES_ENV
+from benchmarks.synthetic import (
+    SYNTHETIC_DATE,
+    SATELLITES_COUNT,
+    EPOCHS_PER_DAY,
+    create_daily_file,
+    satellite_names,
+)
+
+
+ROOT_FOLDER = Path(__file__).parent.parent
+DEPENDENCIES_ROUTE = "/_dash-dependencies"
+UPDATE_ROUTE = "/_dash-update-component"
+DEFAULT_DATA_FOLDER = Path(tempfile.gettempdir()) / "spitec-load-test"
+SERVER_START_TIMEOUT = 60
+REQUEST_TIMEOUT = 120
+
+# Колбэки сценария и входы, по которым они находятся в /_dash-dependencies
+SCENARIO_CALLBACKS = {
+    "update_site_data": "graph-site-map.clickData",
+    "change_xaxis": "time-slider-request-store.data",
+    "update_map_projection": "map-projection-request-store.data",
+    "download_file": "download-file.n_clicks",
+}
+
+
+@dataclass
+class LoadTestConfig:
+    url: str
+    local_file: Path
+    site_coords: dict
+    users: int = 4
+    sessions: int = 5
+    clicks: int = 3
+    think_time: float = 0.0
+    seed: int = 0
+
+
+@dataclass
+class LoadTestStats:
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    errors: dict[str, int] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add(self, name: str, seconds: float, ok: bool) -> None:
+        with self.lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self, duration: float) -> dict[str, dict[str, float]]:
+        summary = dict()
+        for name, latencies in sorted(self.latencies.items()):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            summary[name] = {
+                "count": len(latencies),
+                "errors": self.errors.get(name, 0),
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+                "max": max(latencies),
+                "throughput": len(latencies) / duration,
+            }
+        return summary
+
+
+class DashClient:
+    """
+    Sends callback requests in the same JSON format as the Dash renderer
+    """
+
+    def __init__(self, url: str, dependencies: list[dict]) -> None:
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+        self.callbacks = {
+            name: _find_dependency(dependencies, component)
+            for name, component in SCENARIO_CALLBACKS.items()
+        }
+
+    def call(self, name: str, values: dict) -> tuple[dict | None, bool]:
+        # Возвращает ответ колбэка (None, если обновления нет) и признак успеха
+        dependency = self.callbacks[name]
+        payload = build_payload(dependency, values)
+        response = self.session.post(
+            self.url + UPDATE_ROUTE, json=payload, timeout=REQUEST_TIMEOUT
+        )
+        if dependency.get("long") is not None and response.status_code == 200:
+            response = self._wait_background(dependency, payload, response.json())
+        if response.status_code == 204:
+            return None, True
+        if response.status_code != 200:
+            return None, False
+        return response.json().get("response"), True
+
+    def _wait_background(
+        self, dependency: dict, payload: dict, job: dict
+    ) -> requests.Response:
+        # Опрос фонового колбэка с интервалом, как в браузере
+        interval = dependency["long"].get("interval", 1000) / 1000
+        params = {"cacheKey": job["cacheKey"], "job": job["job"]}
+        while True:
+            time.sleep(interval)
+            response = self.session.post(
+                self.url + UPDATE_ROUTE,
+                json=payload,
+                params=params,
+                timeout=REQUEST_TIMEOUT,
+            )
+            if response.status_code != 200 or "response" in response.json():
+                return response
+
+
+def _find_dependency(dependencies: list[dict], component: str) -> dict:
+    found = [
+        dependency
+        for dependency in dependencies
+        if dependency.get("clientside_function") is None
+        and [f"{i['id']}.{i['property']}" for i in dependency["inputs"]] == [component]
+    ]
+    if len(found) != 1:
+        raise ValueError(f"Expected one callback with input {component}, found {len(found)}")
+    return found[0]
+
+
+def build_payload(dependency: dict, values: dict) -> dict:
+    """
+    Builds the body of a _dash-update-component request
+    Parameters:
+        dependency - callback description from /_dash-dependencies
+        values - values of the components, keys are 'id.property'
+    """
+    output = dependency["output"]
+    if output.startswith(".."):
+        outputs = []
+        for item in output[2:-2].split("..."):
+            component_id, component_property = item.split(".", 1)
+            outputs.append({"id": component_id, "property": component_property})
+    else:
+        component_id, component_property = output.split(".", 1)
+        outputs = {"id": component_id, "property": component_property}
+
+    def entries(items: list[dict]) -> list[dict]:
+        return [
+            {
+                "id": item["id"],
+                "property": item["property"],
+                "value": values.get(f"{item['id']}.{item['property']}"),
+            }
+            for item in items
+        ]
+
+    return {
+        "output": output,
+        "outputs": outputs,
+        "inputs": entries(dependency["inputs"]),
+        "state": entries(dependency["state"]),
+        "changedPropIds": [
+            f"{item['id']}.{item['property']}" for item in dependency["inputs"]
+        ],
+    }
+
+
+def run_session(
+    client: DashClient,
+    config: LoadTestConfig,
+    stats: LoadTestStats,
+    rng: np.random.Generator,
+) -> None:
+    # Один пользователь: выбирает станции, двигает время, меняет проекцию,
+    # повторно скачивает уже загруженный файл
+    values = {
+        "local-file-store.data": str(config.local_file),
+        "site-coords-store.data": config.site_coords,
+        "projection-radio.value": ProjectionType.ORTHOGRAPHIC.value,
+        "hide-show-site.value": False,
+        "time-slider.value": [0, 24],
+        "selection-satellites.value": satellite_names(1)[0],
+        "selection-data-types.value": "roti",
+        "input-hm.value": 300,
+        "scale-map-store.data": 1,
+        "date-selection.date": config.local_file.stem,
+        "download-file.n_clicks": 1,
+    }
+
+    def call(name: str) -> dict | None:
+        start = time.perf_counter()
+        try:
+            response, ok = client.call(name, values)
+        except (requests.RequestException, ValueError):
+            response, ok = None, False
+        stats.add(name, time.perf_counter() - start, ok)
+        if config.think_time > 0:
+            time.sleep(rng.uniform(0, 2 * config.think_time))
+        return response
+
+    n_sites = len(config.site_coords)
+    for _ in range(config.clicks):
+        values["graph-site-map.clickData"] = {
+            "points": [{"curveNumber": 0, "pointIndex": int(rng.integers(n_sites))}]
+        }
+        response = call("update_site_data")
+        if response is not None and "site-data-store" in response:
+            values["site-data-store.data"] = response["site-data-store"]["data"]
+        if response is not None and "graph-site-data" in response:
+            figure = response["graph-site-data"]["figure"]
+            values["graph-site-data.figure"] = figure
+            # Как клиентский колбэк: имена и цвета рядов без массивов
+            values["site-data-traces-store.data"] = {
+                "data": [
+                    {
+                        "name": trace.get("name"),
+                        "marker": {"color": trace.get("marker", {}).get("color")},
+                    }
+                    for trace in figure["data"]
+                ]
+            }
+
+    start_hour = int(rng.integers(0, 20))
+    values["time-slider.value"] = [start_hour, start_hour + 4]
+    # Окно после остановки ползунка, с номером запроса вкладки
+    values["time-slider-request-store.data"] = {
+        "client": f"{threading.get_ident()}-{rng.integers(2**31)}",
+        "seq": 1,
+        "value": values["time-slider.value"],
+    }
+    call("change_xaxis")
+
+    # Mercator переключается в браузере, на сервер уходит только
+    # переход в orthographic с выбранными станциями
+    values["projection-radio.value"] = ProjectionType.ORTHOGRAPHIC.value
+    values["map-projection-request-store.data"] = {
+        "projection": ProjectionType.ORTHOGRAPHIC.value,
+        "time": time.time() * 1000,
+    }
+    call("update_map_projection")
+
+    call("download_file")
+
+
+def run_load_test(config: LoadTestConfig) -> dict:
+    """
+    Replays user sessions against a running app with config.users
+    concurrent users, every user runs config.sessions sessions
+    """
+    dependencies = requests.get(
+        config.url.rstrip("/") + DEPENDENCIES_ROUTE, timeout=REQUEST_TIMEOUT
+    ).json()
+    stats = LoadTestStats()
+
+    def user(user_idx: int) -> None:
+        client = DashClient(config.url, dependencies)
+        rng = np.random.default_rng(config.seed + user_idx)
+        for _ in range(config.sessions):
+            run_session(client, config, stats, rng)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=config.users) as executor:
+        list(executor.map(user, range(config.users)))
+    duration = time.perf_counter() - start
+    return {
+        "users": config.users,
+        "sessions": config.sessions,
+        "duration": duration,
+        "callbacks": stats.summary(duration),
+    }
+
+
+def start_server(
+    data_folder: Path,
+    port: int,
+    workers: int,
+    use_gunicorn: bool,
+    preload: bool = False,
+) -> subprocess.Popen:
+    # Приложение запускается в отдельном процессе с папкой данных data_folder
+    env = dict(os.environ)
+    env[DATA_FOLDER_ENV] = str(data_folder)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(ROOT_FOLDER), env.get("PYTHONPATH", "")]
+    ).rstrip(os.pathsep)
+    if use_gunicorn:
+        command = [
+            sys.executable, "-m", "gunicorn",
+            "-w", str(workers),
+            "-b", f"127.0.0.1:{port}",
+            "main:server",
+        ]
+        if preload:
+            command.insert(-1, "--preload")
+            env[PREWARM_FILES_ENV] = "1"
+    else:
+        command = [
+            sys.executable, "-c",
+            "from main import server; "
+            f"server.run(host='127.0.0.1', port={port}, threaded=True)",
+        ]
+    # Рабочая папка - data_folder, чтобы кэш фоновых колбэков был там же
+    process = subprocess.Popen(
+        command,
+        cwd=data_folder,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The app exited during start")
+        try:
+            if requests.get(url + DEPENDENCIES_ROUTE, timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("The app did not start in time")
+
+
+def format_summary(summary: dict) -> str:
+    lines = [
+        f"users: {summary['users']}, sessions per user: {summary['sessions']}, "
+        f"duration: {summary['duration']:.1f} s",
+        f"{'callback':<24}{'count':>7}{'errors':>8}{'p50, ms':>10}"
+        f"{'p95, ms':>10}{'p99, ms':>10}{'req/s':>8}",
+    ]
+    for name, item in summary["callbacks"].items():
+        lines.append(
+            f"{name:<24}{item['count']:>7}{item['errors']:>8}"
+            f"{item['p50'] * 1000:>10.0f}{item['p95'] * 1000:>10.0f}"
+            f"{item['p99'] * 1000:>10.0f}{item['throughput']:>8.2f}"
+        )
+    return "\n".join(lines)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Load test of the spitec callbacks with concurrent users"
+    )
+    parser.add_argument("--url", default=None,
+                        help="running app with the same data folder; "
+                        "by default the app is started locally")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=5,
+                        help="sessions per user")
+    parser.add_argument("--clicks", type=int, default=3,
+                        help="selected stations per session")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="mean pause between actions, s")
+    parser.add_argument("--sites", type=int, default=50,
+                        help="stations in the synthetic daily file")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="gunicorn workers")
+    parser.add_argument("--gunicorn", action="store_true",
+                        help="start the app with gunicorn instead of the Flask server")
+    parser.add_argument("--preload", action="store_true",
+                        help="gunicorn --preload with caches prewarmed in the master")
+    parser.add_argument("--data-folder", type=Path, default=DEFAULT_DATA_FOLDER)
+    parser.add_argument("--output", type=Path, default=None,
+                        help="JSON file for the results")
+    args = parser.parse_args(argv)
+
+    # Файл с датой SYNTHETIC_DATE лежит в папке данных приложения,
+    # поэтому download_file не обращается к сети
+    app_folder = args.data_folder / f"{args.sites}-sites"
+    local_file = app_folder / f"{SYNTHETIC_DATE}.h5"
+    if not local_file.exists():
+        create_daily_file(local_file, args.sites, SATELLITES_COUNT, EPOCHS_PER_DAY)
+
+    process = None
+    url = args.url
+    if url is None:
+        port = _free_port()
+        process = start_server(
+            app_folder, port, args.workers, args.gunicorn, args.preload
+        )
+        url = f"http://127.0.0.1:{port}"
+    try:
+        config = LoadTestConfig(
+            url,
+            local_file,
+            get_sites_coords(local_file),
+            args.users,
+            args.sessions,
+            args.clicks,
+            args.think_time,
+        )
+        summary = run_load_test(config)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print(format_summary(summary))
+    if args.output is not None:
+        args.output.write_text(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,444 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+import plotly
+import plotly.io as pio
+import h5py
+from spitec.processing.site_processing import get_sites_coords
+from spitec.processing.data_processing import (
+    Sat,
+    retrieve_data,
+    get_satellites,
+    get_el_az,
+    timestamps_to_datetimes,
+)
+from spitec.processing.data_products import DataProducts
+from spitec.processing.trajectorie import Trajectorie
+from spitec.processing.stage_cache import STAGE_CACHES
+from spitec.callbacks.figure import (
+    create_map_with_points,
+    create_map_with_trajectories,
+    create_site_data_with_values,
+    get_namelatlon_arrays,
+)
+from spitec.callbacks.render import get_site_colors
+from spitec.callbacks.analysis import compute_grid_map
+from spitec.processing.binning import BinStatistic
+from spitec.processing.velocity import estimate_velocity
+from spitec.view.visualization import ProjectionType
+from benchmarks.synthetic import (
+    SATELLITES_COUNT,
+    EPOCHS_PER_DAY,
+    EPOCH_SECONDS,
+    get_daily_file,
+    satellite_names,
+)
+
+
+DEFAULT_SCALES = [10, 50]
+DEFAULT_REPEAT = 5
+SELECTED_SITES = 10
+REGRESSION_THRESHOLD = 1.25
+DEFAULT_DATA_FOLDER = Path(tempfile.gettempdir()) / "spitec-benchmarks"
+
+
+@dataclass
+class Scenario:
+    local_file: Path
+    n_sites: int
+    n_sats: int
+    n_epochs: int
+    site_coords: dict
+    site_data_store: dict[str, int]
+    sat: Sat
+    hm: float = 300
+    time_value: tuple[int] = (0, 24)
+
+
+@dataclass
+class BenchmarkCase:
+    name: str
+    # Подготовка (не замеряется), возвращает замеряемую функцию
+    prepare: Callable[[Scenario], Callable[[], Any]]
+    # Очищать кэши этапов перед каждым замером
+    cold: bool = True
+
+
+def create_scenario(
+    local_file: Path,
+    n_sites: int,
+    n_sats: int,
+    n_epochs: int,
+    selected_sites: int,
+) -> Scenario:
+    site_coords = get_sites_coords(local_file)
+    # Станции выбираются как кликами по карте: имя -> индекс точки
+    site_data_store = {
+        name: idx
+        for idx, name in enumerate(site_coords.keys())
+        if idx < selected_sites
+    }
+    return Scenario(
+        local_file,
+        n_sites,
+        n_sats,
+        n_epochs,
+        site_coords,
+        site_data_store,
+        Sat(satellite_names(n_sats)[0]),
+    )
+
+
+def _prepare_trajectories(scenario: Scenario) -> Callable[[], list[Trajectorie]]:
+    _, lat_array, lon_array = get_namelatlon_arrays(scenario.site_coords)
+
+    def build() -> list[Trajectorie]:
+        names = list(scenario.site_data_store.keys())
+        site_azimuth, site_elevation, is_satellite = get_el_az(
+            scenario.local_file, names, scenario.sat
+        )
+        trajectories = []
+        for name in names:
+            idx = scenario.site_data_store[name]
+            traj = Trajectorie(
+                name,
+                scenario.sat,
+                np.radians(lat_array[idx]),
+                np.radians(lon_array[idx]),
+            )
+            if is_satellite[name]:
+                traj.add_trajectory_points(
+                    site_azimuth[name][scenario.sat][DataProducts.azimuth],
+                    site_elevation[name][scenario.sat][DataProducts.elevation],
+                    timestamps_to_datetimes(
+                        site_azimuth[name][scenario.sat][DataProducts.timestamp]
+                    ),
+                    scenario.hm,
+                )
+            trajectories.append(traj)
+        return trajectories
+    return build
+
+
+def _create_site_data(scenario: Scenario):
+    return create_site_data_with_values(
+        scenario.site_data_store,
+        scenario.sat,
+        DataProducts.roti.name,
+        str(scenario.local_file),
+        list(scenario.time_value),
+        None,
+        None,
+        None,
+    )
+
+
+def _create_site_map(scenario: Scenario):
+    return create_map_with_points(
+        scenario.site_coords,
+        ProjectionType.ORTHOGRAPHIC.value,
+        False,
+        None,
+        scenario.site_data_store,
+        None,
+        None,
+        None,
+    )
+
+
+def _prepare_map_with_trajectories(scenario: Scenario) -> Callable:
+    colors = get_site_colors(_create_site_data(scenario)["data"])
+    site_map = _create_site_map(scenario)
+    return lambda: create_map_with_trajectories(
+        site_map,
+        str(scenario.local_file),
+        scenario.site_data_store,
+        scenario.site_coords,
+        scenario.sat,
+        colors,
+        list(scenario.time_value),
+        scenario.hm,
+        None,
+        None,
+        None,
+    )
+
+
+def _prepare_site_map_json(scenario: Scenario) -> Callable[[], str]:
+    site_map = _prepare_map_with_trajectories(scenario)()
+    return lambda: pio.to_json(site_map, validate=False)
+
+
+def _prepare_site_data_json(scenario: Scenario) -> Callable[[], str]:
+    site_data = _create_site_data(scenario)
+    return lambda: pio.to_json(site_data, validate=False)
+
+
+def _daily_start(scenario: Scenario) -> float:
+    date = datetime.strptime(scenario.local_file.stem, "%Y-%m-%d")
+    return date.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _compute_grid_map(scenario: Scenario, statistic: BinStatistic):
+    # Одна эпоха всей сети в середине дня
+    epoch = datetime.fromtimestamp(
+        _daily_start(scenario) + scenario.n_epochs // 2 * EPOCH_SECONDS,
+        timezone.utc,
+    )
+    return compute_grid_map(
+        scenario.local_file, DataProducts.roti, scenario.hm, epoch, epoch, statistic, 2
+    )
+
+
+def _estimate_velocity(scenario: Scenario):
+    # Все пары станций сети по одному спутнику за сутки, в одном процессе
+    start = datetime.fromtimestamp(_daily_start(scenario), timezone.utc)
+    end = datetime.fromtimestamp(
+        _daily_start(scenario) + (scenario.n_epochs - 1) * EPOCH_SECONDS,
+        timezone.utc,
+    )
+    return estimate_velocity(
+        scenario.local_file,
+        list(scenario.site_coords.keys()),
+        scenario.sat,
+        DataProducts.dtec_20_60,
+        scenario.hm,
+        start,
+        end,
+        workers=1,
+    )
+
+
+BENCHMARK_CASES = [
+    BenchmarkCase(
+        "get_sites_coords",
+        lambda s: lambda: get_sites_coords(s.local_file),
+    ),
+    BenchmarkCase(
+        "get_satellites",
+        lambda s: lambda: get_satellites(s.local_file),
+    ),
+    BenchmarkCase(
+        "retrieve_data",
+        lambda s: lambda: retrieve_data(
+            s.local_file, list(s.site_data_store.keys()), s.sat, DataProducts.roti
+        ),
+    ),
+    BenchmarkCase("trajectories", _prepare_trajectories),
+    BenchmarkCase(
+        "create_site_data_with_values",
+        lambda s: lambda: _create_site_data(s),
+    ),
+    BenchmarkCase(
+        "create_site_data_with_values[warm]",
+        lambda s: lambda: _create_site_data(s),
+        cold=False,
+    ),
+    BenchmarkCase(
+        "create_map_with_trajectories",
+        _prepare_map_with_trajectories,
+    ),
+    BenchmarkCase(
+        "create_map_with_trajectories[warm]",
+        _prepare_map_with_trajectories,
+        cold=False,
+    ),
+    BenchmarkCase("site_map_json", _prepare_site_map_json),
+    BenchmarkCase(
+        "grid_map",
+        lambda s: lambda: _compute_grid_map(s, BinStatistic.MEAN),
+    ),
+    BenchmarkCase(
+        "grid_map[warm]",
+        lambda s: lambda: _compute_grid_map(s, BinStatistic.MEDIAN),
+        cold=False,
+    ),
+    BenchmarkCase(
+        "velocity_pairs",
+        lambda s: lambda: _estimate_velocity(s),
+    ),
+    BenchmarkCase("site_data_json", _prepare_site_data_json),
+]
+
+
+def clear_caches() -> None:
+    for cache in STAGE_CACHES.values():
+        cache.clear()
+
+
+def run_case(case: BenchmarkCase, scenario: Scenario, repeat: int) -> dict:
+    times = []
+    payload_bytes = None
+    for _ in range(repeat):
+        clear_caches()
+        if not case.cold:
+            case.prepare(scenario)()  # прогрев кэшей
+        func = case.prepare(scenario)
+        if case.cold:
+            clear_caches()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+        if isinstance(result, str):
+            payload_bytes = len(result.encode())
+    return {
+        "case": case.name,
+        "n_sites": scenario.n_sites,
+        "n_sats": scenario.n_sats,
+        "n_epochs": scenario.n_epochs,
+        "selected_sites": len(scenario.site_data_store),
+        "times": times,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "max": max(times),
+        "payload_bytes": payload_bytes,
+    }
+
+
+def run_benchmarks(
+    data_folder: str | Path = DEFAULT_DATA_FOLDER,
+    scales: list[int] = DEFAULT_SCALES,
+    repeat: int = DEFAULT_REPEAT,
+    n_sats: int = SATELLITES_COUNT,
+    n_epochs: int = EPOCHS_PER_DAY,
+    selected_sites: int = SELECTED_SITES,
+    cases: list[str] | None = None,
+) -> dict:
+    """
+    Times the hot paths on synthetic daily files of several sizes
+    Parameters:
+        data_folder - folder for generated files, reused between runs
+        scales - numbers of stations in the daily files
+        repeat - number of measurements of every case
+        cases - names of the cases to run, None for all
+    """
+    results = []
+    for n_sites in scales:
+        local_file = get_daily_file(data_folder, n_sites, n_sats, n_epochs)
+        scenario = create_scenario(
+            local_file, n_sites, n_sats, n_epochs, selected_sites
+        )
+        for case in BENCHMARK_CASES:
+            if cases is not None and case.name not in cases:
+                continue
+            results.append(run_case(case, scenario, repeat))
+    clear_caches()
+    return {"meta": _get_meta(repeat), "results": results}
+
+
+def _get_meta(repeat: int) -> dict:
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "numpy": np.__version__,
+        "h5py": h5py.__version__,
+        "plotly": plotly.__version__,
+        "repeat": repeat,
+    }
+
+
+def compare_results(
+    baseline: dict,
+    current: dict,
+    threshold: float = REGRESSION_THRESHOLD,
+) -> list[dict]:
+    # Сравнение медиан; регрессия - замедление больше threshold раз
+    def key(result: dict) -> tuple:
+        return (
+            result["case"],
+            result["n_sites"],
+            result["n_sats"],
+            result["n_epochs"],
+        )
+
+    baseline_results = {key(result): result for result in baseline["results"]}
+    comparison = []
+    for result in current["results"]:
+        base = baseline_results.get(key(result))
+        if base is None or base["median"] == 0:
+            continue
+        ratio = result["median"] / base["median"]
+        comparison.append({
+            "case": result["case"],
+            "n_sites": result["n_sites"],
+            "baseline": base["median"],
+            "current": result["median"],
+            "ratio": ratio,
+            "regression": ratio > threshold,
+        })
+    return comparison
+
+
+def format_results(results: dict) -> str:
+    lines = [f"{'case':<38}{'sites':>6}{'median, ms':>12}{'min, ms':>10}{'payload, KB':>13}"]
+    for result in results["results"]:
+        payload = result["payload_bytes"]
+        payload = "" if payload is None else f"{payload / 1024:.0f}"
+        lines.append(
+            f"{result['case']:<38}{result['n_sites']:>6}"
+            f"{result['median'] * 1000:>12.1f}{result['min'] * 1000:>10.1f}"
+            f"{payload:>13}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmarks of spitec hot paths on synthetic daily files"
+    )
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="numbers of stations in the daily files")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--sats", type=int, default=SATELLITES_COUNT)
+    parser.add_argument("--epochs", type=int, default=EPOCHS_PER_DAY)
+    parser.add_argument("--selected", type=int, default=SELECTED_SITES,
+                        help="number of selected stations")
+    parser.add_argument("--cases", nargs="+", default=None)
+    parser.add_argument("--data-folder", type=Path, default=DEFAULT_DATA_FOLDER)
+    parser.add_argument("--output", type=Path, default=None,
+                        help="JSON file for the results")
+    parser.add_argument("--compare", type=Path, default=None,
+                        help="JSON results of a previous run")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        args.data_folder,
+        args.scales,
+        args.repeat,
+        args.sats,
+        args.epochs,
+        args.selected,
+        args.cases,
+    )
+    print(format_results(results))
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text())
+        comparison = compare_results(baseline, results, args.threshold)
+        regressions = [item for item in comparison if item["regression"]]
+        for item in regressions:
+            print(
+                f"REGRESSION {item['case']} ({item['n_sites']} sites): "
+                f"{item['baseline'] * 1000:.1f} -> {item['current'] * 1000:.1f} ms"
+            )
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+from pathlib import Path
+from datetime import datetime, timezone
+import h5py
+import numpy as np
+from spitec.processing.data_products import DataProducts
+
+
+EPOCH_SECONDS = 30
+EPOCHS_PER_DAY = 24 * 60 * 60 // EPOCH_SECONDS  # 2880
+SATELLITES_COUNT = 32
+ELEVATION_CUTOFF = np.radians(10)
+ORBIT_PERIOD = 12 * 60 * 60  # полусуточная орбита, как у GPS
+SYNTHETIC_DATE = "2024-01-01"
+
+
+def site_names(n_sites: int) -> list[str]:
+    return [f"s{i:03d}" for i in range(n_sites)]
+
+
+def satellite_names(n_sats: int = SATELLITES_COUNT) -> list[str]:
+    return [f"G{i + 1:02d}" for i in range(n_sats)]
+
+
+def create_daily_file(
+    local_file: str | Path,
+    n_sites: int,
+    n_sats: int = SATELLITES_COUNT,
+    n_epochs: int = EPOCHS_PER_DAY,
+    date: str = SYNTHETIC_DATE,
+    seed: int = 0,
+) -> Path:
+    """
+    Writes a synthetic daily file with the same layout as the downloaded ones
+    Parameters:
+        local_file - path of the file, its stem must be the date
+        n_sites - number of stations
+        n_sats - number of satellites per station
+        n_epochs - number of 30 s epochs, satellites are stored only
+            for epochs where they are above the elevation cutoff
+        date - day of the data, '%Y-%m-%d'
+        seed - seed of the random generator, equal seeds give equal files
+    """
+    local_file = Path(local_file)
+    local_file.parent.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    start = datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    epochs = np.arange(n_epochs) * EPOCH_SECONDS
+    timestamps = start.timestamp() + epochs.astype(np.float64)
+
+    with h5py.File(local_file, "w") as f:
+        for site in site_names(n_sites):
+            site_group = f.create_group(site)
+            site_group.attrs["lat"] = np.radians(rng.uniform(-70, 70))
+            site_group.attrs["lon"] = np.radians(rng.uniform(-180, 180))
+            for sat in satellite_names(n_sats):
+                phase = rng.uniform(0, 2 * np.pi)
+                max_elevation = np.radians(rng.uniform(30, 90))
+                elevation = max_elevation * np.sin(
+                    2 * np.pi * epochs / ORBIT_PERIOD + phase
+                )
+                visible = elevation > ELEVATION_CUTOFF
+                if not visible.any():
+                    continue
+                size = int(visible.sum())
+                sat_group = site_group.create_group(sat)
+                sat_group[DataProducts.timestamp.hdf_name] = timestamps[visible]
+                sat_group[DataProducts.elevation.hdf_name] = elevation[visible]
+                azimuth = (phase + 2 * np.pi * epochs / ORBIT_PERIOD) % (2 * np.pi)
+                sat_group[DataProducts.azimuth.hdf_name] = azimuth[visible]
+                tec = 20 + 10 * np.sin(2 * np.pi * epochs[visible] / 86400 + phase)
+                sat_group[DataProducts.tec.hdf_name] = tec + rng.normal(0, 0.5, size)
+                sat_group[DataProducts.roti.hdf_name] = np.abs(rng.normal(0, 0.1, size))
+                sat_group[DataProducts.dtec_2_10.hdf_name] = rng.normal(0, 0.1, size)
+                sat_group[DataProducts.dtec_10_20.hdf_name] = rng.normal(0, 0.2, size)
+                sat_group[DataProducts.dtec_20_60.hdf_name] = rng.normal(0, 0.4, size)
+    return local_file
+
+
+def get_daily_file(
+    data_folder: str | Path,
+    n_sites: int,
+    n_sats: int = SATELLITES_COUNT,
+    n_epochs: int = EPOCHS_PER_DAY,
+    seed: int = 0,
+) -> Path:
+    # Файл создается один раз для каждого набора параметров
+    folder = Path(data_folder) / f"{n_sites}x{n_sats}x{n_epochs}-{seed}"
+    local_file = folder / f"{SYNTHETIC_DATE}.h5"
+    if not local_file.exists():
+        tmp_file = folder / "tmp" / local_file.name
+        create_daily_file(tmp_file, n_sites, n_sats, n_epochs, seed=seed)
+        tmp_file.replace(local_file)
+        tmp_file.parent.rmdir()
+    return local_file
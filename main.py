@@ -1,8 +1,13 @@
+import os
 import diskcache
 from dash import DiskcacheManager, Dash
 import dash_bootstrap_components as dbc
 from spitec.view.visualization import create_layout, create_index_string
-from spitec.callbacks.callbacks import register_callbacks
+from spitec.callbacks.callbacks import register_callbacks, set_data_folder
+from spitec.monitoring.metrics import instrument_callbacks, register_metrics
+from spitec.callbacks.admission import limit_callbacks
+from spitec.processing.session_maintenance import start_periodic_gc, GC_INTERVAL_ENV
+from spitec.callbacks.prewarm import prewarm_from_env
 
 cache = diskcache.Cache("./cache")
 background_callback_manager = DiskcacheManager(cache)
@@ -20,6 +25,15 @@ server = app.server
 app.layout = create_layout()
 
 register_callbacks(app)
+limit_callbacks(app)
+instrument_callbacks(app)
+register_metrics(server, set_data_folder())
+
+if os.environ.get(GC_INTERVAL_ENV):
+    start_periodic_gc(set_data_folder(), float(os.environ[GC_INTERVAL_ENV]))
+
+# С gunicorn --preload выполняется в мастере до запуска рабочих процессов
+prewarm_from_env(set_data_folder())
 
 if __name__ == "__main__":
     app.run_server()
@@ -0,0 +1,155 @@
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Iterator
+import fcntl
+import logging
+import os
+import tempfile
+import threading
+import time
+import dash
+from spitec.monitoring.metrics import rejected_callbacks
+
+
+logger = logging.getLogger(__name__)
+
+# Число одновременных вызовов колбэков на узел, например
+# "update_site_data=4,build_grid_map=1"; колбэки без записи не ограничены
+CALLBACK_LIMITS_ENV = "SPITEC_CALLBACK_LIMITS"
+# Сколько обычный колбэк ждет свободного места, с
+CALLBACK_WAIT_ENV = "SPITEC_CALLBACK_WAIT"
+CALLBACK_WAIT_DEFAULT = 10.0
+SLOTS_FOLDER_NAME = "spitec-callback-slots"
+SLOT_POLL_INTERVAL = 0.05  # сек
+
+
+class CallbackOverloaded(Exception):
+    pass
+
+
+class ConcurrencyLimiter:
+    """
+    Host-wide limit of simultaneous calls of one callback type
+    A call holds an exclusive flock on one of limit slot files, so the
+    limit is shared by all worker processes and background jobs, and
+    the kernel frees the slot of a process that died
+    """
+
+    def __init__(self, name: str, limit: int, folder: str | Path) -> None:
+        self.name = name
+        self.limit = limit
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def slot(self, timeout: float | None = None) -> Iterator[None]:
+        """
+        Holds a slot while the block runs
+        Parameters:
+            timeout - seconds to wait for a free slot, None - without
+                a limit; CallbackOverloaded when no slot became free
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            fd = self._try_acquire()
+            if fd is not None:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                raise CallbackOverloaded(
+                    f"{self.name}: {self.limit} calls are already running"
+                )
+            time.sleep(SLOT_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            os.close(fd)
+
+    def _try_acquire(self) -> int | None:
+        # Дескриптор занятого места или None, если все места заняты
+        for idx in range(self.limit):
+            fd = os.open(self.folder / f"{self.name}-{idx}.lock", os.O_RDWR | os.O_CREAT)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            return fd
+        return None
+
+
+_limiters: dict[str, ConcurrencyLimiter] = dict()
+_limiters_lock = threading.Lock()
+
+
+def callback_limits() -> dict[str, int]:
+    # Ограничения из SPITEC_CALLBACK_LIMITS
+    limits = dict()
+    for item in os.environ.get(CALLBACK_LIMITS_ENV, "").split(","):
+        if "=" not in item:
+            continue
+        name, limit = item.split("=", 1)
+        limits[name.strip()] = int(limit)
+    return limits
+
+
+def get_limiter(name: str) -> ConcurrencyLimiter | None:
+    # Ограничитель колбэка name, None - колбэк не ограничен
+    limit = callback_limits().get(name)
+    if limit is None or limit <= 0:
+        return None
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None or limiter.limit != limit:
+            folder = Path(tempfile.gettempdir()) / f"{SLOTS_FOLDER_NAME}-{os.getuid()}"
+            limiter = ConcurrencyLimiter(name, limit, folder)
+            _limiters[name] = limiter
+        return limiter
+
+
+@contextmanager
+def callback_slot(name: str, timeout: float | None = None) -> Iterator[None]:
+    """
+    Slot of the callback type name for the block, when it is limited
+    Background callbacks wait without a timeout: they do not hold
+    the web workers
+    """
+    limiter = get_limiter(name)
+    if limiter is None:
+        yield
+        return
+    with limiter.slot(timeout):
+        yield
+
+
+def limit_callbacks(app: dash.Dash) -> None:
+    """
+    Puts the limits of SPITEC_CALLBACK_LIMITS on the server-side
+    callbacks registered in app. A call that does not get a slot within
+    SPITEC_CALLBACK_WAIT seconds is dropped (no update) instead of
+    occupying a worker
+    Must be called after register_callbacks
+    """
+    limits = callback_limits()
+    for callback in app.callback_map.values():
+        func = callback.get("callback")
+        # Фоновые колбэки ограничиваются в своем теле, см. callback_slot
+        if func is None or callback.get("long") is not None:
+            continue
+        name = getattr(func, "__wrapped__", func).__name__
+        if name in limits:
+            callback["callback"] = _limit_callback(func, name)
+
+
+def _limit_callback(func: Callable, name: str) -> Callable:
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        timeout = float(os.environ.get(CALLBACK_WAIT_ENV) or CALLBACK_WAIT_DEFAULT)
+        try:
+            with callback_slot(name, timeout):
+                return func(*args, **kwargs)
+        except CallbackOverloaded as e:
+            rejected_callbacks.inc(name)
+            logger.warning("%s, the call is dropped", e)
+            raise dash.exceptions.PreventUpdate
+    return wrapper
@@ -0,0 +1,411 @@
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import plotly.graph_objects as go
+from spitec.view.visualization import (
+    ProjectionType,
+    create_analysis_figure,
+    language,
+)
+from spitec.processing.data_products import DataProducts
+from spitec.processing.pierce_points import get_network_points
+from spitec.processing.binning import BinStatistic, Grid2D, bin_2d, make_edges
+from spitec.processing.animation import AnimationFrames
+from spitec.processing.keogram import KeogramAxis
+from spitec.processing.event_detection import EVENT_DTYPE
+from spitec.processing.velocity import VelocityEstimate
+from spitec.monitoring.metrics import timed
+
+
+# Отсчеты в файлах идут через 30 с: эпоха - окно в полшага вокруг времени
+EPOCH_SECONDS = 30
+GRID_STEP_DEFAULT = 2.0  # градусы
+GRID_STEP_MIN = 0.5
+ANIMATION_FRAME_MS = 200
+ANIMATION_STEP_DEFAULT = 60  # с
+MAX_LISTED_EVENTS = 100
+# Окно графика вокруг события при переходе к нему, часы
+EVENT_WINDOW_HOURS = 1
+
+
+def epoch_window(local_file: str | Path, epoch_time: str) -> tuple[datetime]:
+    # Время 'HH:MM:SS' дня файла -> границы эпохи
+    date = Path(local_file).stem  # Получаем '2024-01-01'
+    epoch = datetime.strptime(f"{date} {epoch_time}", "%Y-%m-%d %H:%M:%S")
+    epoch = epoch.replace(tzinfo=timezone.utc)
+    half = timedelta(seconds=EPOCH_SECONDS / 2)
+    return epoch - half, epoch + half - timedelta(seconds=1)
+
+
+@timed("compute_grid_map")
+def compute_grid_map(
+    local_file: str | Path,
+    dataproduct: DataProducts,
+    hm: float,
+    start: datetime,
+    end: datetime,
+    statistic: BinStatistic,
+    step: float,
+) -> Grid2D:
+    """
+    Grid of the data product at the pierce points of all stations
+    and satellites in the time window
+    Parameters:
+        hm - ionospheric maximum height (km)
+        statistic - aggregation of the points in a cell
+        step - cell size in degrees
+    """
+    points = get_network_points(local_file, dataproduct).pierce_points(
+        hm, start, end
+    )
+    return bin_2d(
+        points.lon,
+        points.lat,
+        points.values,
+        make_edges(-180, 180, step),
+        make_edges(-90, 90, step),
+        statistic,
+    )
+
+
+def create_grid_map(
+    grid: Grid2D,
+    dataproduct: DataProducts,
+    statistic: BinStatistic,
+    projection_value: ProjectionType,
+    title: str,
+) -> go.Figure:
+    figure = create_analysis_figure()
+    lon_centers, lat_centers = grid.centers()
+    lon, lat = np.meshgrid(lon_centers, lat_centers)
+    filled = grid.counts > 0
+    colorbar_title = dataproduct.long_name if statistic is not BinStatistic.COUNT \
+        else language["tab-analysis"]["count"]
+    # Ячейки рисуются квадратными маркерами; пустые ячейки не передаются
+    figure.add_trace(
+        go.Scattergeo(
+            lon=lon[filled],
+            lat=lat[filled],
+            mode="markers",
+            marker=dict(
+                symbol="square",
+                size=max(4, 3 * (grid.x_edges[1] - grid.x_edges[0])),
+                color=grid.values[filled],
+                colorscale="Viridis",
+                showscale=True,
+                colorbar=dict(title=colorbar_title),
+            ),
+            customdata=grid.counts[filled],
+            hovertemplate="%{lat}, %{lon}<br>%{marker.color:.3f}"
+                "<br>n = %{customdata}<extra></extra>",
+        )
+    )
+    figure.update_layout(
+        title=title,
+        geo=dict(projection_type=projection_value),
+    )
+    return figure
+
+
+def grid_map_title(
+    dataproduct: DataProducts,
+    statistic: BinStatistic,
+    start: datetime,
+    end: datetime,
+) -> str:
+    return (
+        f"{dataproduct.long_name}, {language['tab-analysis'][statistic.value]}: "
+        f"{start:%H:%M:%S} - {end:%H:%M:%S}"
+    )
+
+
+def create_animation_map(
+    frames: AnimationFrames,
+    dataproduct: DataProducts,
+    projection_value: ProjectionType,
+) -> dict:
+    """
+    Map with a Plotly frame per epoch; playback runs in the browser
+    The figure is built as a dict: validation of hundreds of frames
+    by plotly.graph_objects takes longer than computing them
+    """
+    figure = create_analysis_figure()
+    figure.update_layout(
+        title=dataproduct.long_name,
+        geo=dict(projection_type=projection_value),
+    )
+    # Общая шкала цветов для всех кадров
+    if len(frames.values) > 0:
+        cmin, cmax = np.percentile(frames.values, [2, 98])
+    else:
+        cmin, cmax = 0, 1
+    names = [
+        datetime.fromtimestamp(t, timezone.utc).strftime("%H:%M:%S")
+        for t in frames.times
+    ]
+    frame_dicts = []
+    for idx, name in enumerate(names):
+        lat, lon, values = frames.frame(idx)
+        frame_dicts.append(
+            {
+                "name": name,
+                "data": [
+                    {
+                        "type": "scattergeo",
+                        "lat": lat,
+                        "lon": lon,
+                        "marker": {"color": values},
+                    }
+                ],
+                "traces": [1],
+            }
+        )
+
+    figure = figure.to_plotly_json()
+    lat, lon, values = frames.frame(0) if len(names) > 0 else ([], [], [])
+    figure["data"].append(
+        {
+            "type": "scattergeo",
+            "mode": "markers",
+            "lat": lat,
+            "lon": lon,
+            "marker": {
+                "size": 5,
+                "color": values,
+                "colorscale": "Viridis",
+                "cmin": float(cmin),
+                "cmax": float(cmax),
+                "showscale": True,
+                "colorbar": {"title": {"text": dataproduct.long_name}},
+            },
+            "hovertemplate": "%{lat}, %{lon}<br>%{marker.color}<extra></extra>",
+        }
+    )
+    figure["frames"] = frame_dicts
+    animation_args = {
+        "frame": {"duration": ANIMATION_FRAME_MS, "redraw": True},
+        "transition": {"duration": 0},
+        "mode": "immediate",
+    }
+    figure["layout"]["updatemenus"] = [
+        {
+            "type": "buttons",
+            "direction": "left",
+            "x": 0.1,
+            "y": 0,
+            "xanchor": "right",
+            "yanchor": "top",
+            "buttons": [
+                {
+                    "label": "▶",
+                    "method": "animate",
+                    "args": [None, dict(animation_args, fromcurrent=True)],
+                },
+                {
+                    "label": "❚❚",
+                    "method": "animate",
+                    "args": [
+                        [None],
+                        dict(animation_args, frame={"duration": 0, "redraw": False}),
+                    ],
+                },
+            ],
+        }
+    ]
+    figure["layout"]["sliders"] = [
+        {
+            "x": 0.1,
+            "len": 0.9,
+            "y": 0,
+            "currentvalue": {"prefix": language["tab-analysis"]["frame"] + ": "},
+            "steps": [
+                {
+                    "label": name,
+                    "method": "animate",
+                    "args": [[name], animation_args],
+                }
+                for name in names
+            ],
+        }
+    ]
+    return figure
+
+
+def create_keogram(
+    grid: Grid2D,
+    dataproduct: DataProducts,
+    axis: KeogramAxis,
+    statistic: BinStatistic,
+) -> go.Figure:
+    time_centers, y_centers = grid.centers()
+    times = np.array(time_centers, dtype="datetime64[s]")
+    colorbar_title = dataproduct.long_name if statistic is not BinStatistic.COUNT \
+        else language["tab-analysis"]["count"]
+    if axis is KeogramAxis.LAT:
+        yaxis_title = language["tab-analysis"]["keogram-lat"]
+    else:
+        yaxis_title = language["tab-analysis"]["keogram-lon"]
+    # Пустые строки по краям сетки не показываются
+    filled_rows = np.flatnonzero(grid.counts.sum(axis=1) > 0)
+    if len(filled_rows) > 0:
+        rows = slice(filled_rows[0], filled_rows[-1] + 1)
+    else:
+        rows = slice(0, 0)
+
+    figure = go.Figure(
+        go.Heatmap(
+            x=times,
+            y=y_centers[rows],
+            z=grid.values[rows],
+            colorscale="Viridis",
+            colorbar=dict(title=colorbar_title),
+            hoverongaps=False,
+        )
+    )
+    figure.update_layout(
+        title=(
+            f"{dataproduct.long_name}, "
+            f"{language['tab-analysis'][statistic.value]}"
+        ),
+        title_font=dict(size=24, color="black"),
+        plot_bgcolor="white",
+        margin=dict(l=0, t=60, r=0, b=0),
+        xaxis=dict(
+            title=language["tab-analysis"]["time"],
+            linecolor="black",
+            showline=True,
+            mirror=True,
+        ),
+        yaxis=dict(
+            title=yaxis_title,
+            linecolor="black",
+            showline=True,
+            mirror=True,
+        ),
+    )
+    return figure
+
+
+def list_events(events: np.ndarray, limit: int = MAX_LISTED_EVENTS) -> list[dict]:
+    """
+    The strongest events of the index as records for the event list
+    Magnitudes of different detectors are not comparable: the events are
+    taken by their rank within the detector. An event found by several
+    detectors is listed once
+    Returns: records sorted by time
+    """
+    events = np.asarray(events, dtype=EVENT_DTYPE)
+    ranks = np.empty(len(events), dtype=np.int64)
+    for detector in np.unique(events["detector"]):
+        in_detector = np.flatnonzero(events["detector"] == detector)
+        order = np.argsort(-events["magnitude"][in_detector], kind="stable")
+        ranks[in_detector[order]] = np.arange(len(in_detector))
+
+    records = []
+    seen = set()
+    for idx in np.lexsort((events["detector"], ranks)):
+        event = events[idx]
+        key = (event["site"], event["sat"], event["product"], event["time"])
+        if key in seen:
+            continue
+        seen.add(key)
+        records.append(
+            {
+                "time": datetime.fromtimestamp(event["time"], timezone.utc)
+                .strftime("%Y-%m-%d %H:%M:%S"),
+                "site": str(event["site"]),
+                "sat": str(event["sat"]),
+                "product": str(event["product"]),
+                "detector": str(event["detector"]),
+                "magnitude": round(float(event["magnitude"]), 3),
+            }
+        )
+        if len(records) == limit:
+            break
+    return sorted(records, key=lambda record: record["time"])
+
+
+def event_options(records: list[dict]) -> list[dict[str, str]]:
+    return [
+        {
+            "label": (
+                f"{record['time'][11:]} {record['site']} {record['sat']} "
+                f"{record['product']} {record['magnitude']}"
+            ),
+            "value": str(idx),
+        }
+        for idx, record in enumerate(records)
+    ]
+
+
+def event_time_window(record: dict) -> list[int]:
+    # Часы слайдера времени вокруг события
+    hour = int(record["time"][11:13])
+    return [
+        max(hour - EVENT_WINDOW_HOURS, 0),
+        min(hour + EVENT_WINDOW_HOURS + 1, 24),
+    ]
+
+
+def event_sip_tag(record: dict) -> dict:
+    # Метка в формате all-select-sip-tag
+    return {
+        "name": f"{record['site']} {record['sat']} {record['time'][11:]}",
+        "marker": "star",
+        "color": "red",
+        "time": record["time"],
+        "data": record["magnitude"],
+        "data_types": record["product"],
+        "event": "detected",
+        "site": record["site"],
+    }
+
+
+def create_velocity_figure(
+    estimate: VelocityEstimate | None,
+    dataproduct: DataProducts,
+) -> go.Figure:
+    # Измеренные запаздывания пар против запаздываний плоской волны
+    if estimate is None:
+        figure = create_analysis_figure()
+        figure.update_layout(title=language["tab-analysis"]["no-velocity"])
+        return figure
+    used = estimate.used
+    fitted = estimate.baselines @ estimate.slowness
+    figure = go.Figure(
+        go.Scattergl(
+            x=fitted[used],
+            y=estimate.pairs.lags[used],
+            mode="markers",
+            marker=dict(
+                size=4,
+                color=estimate.pairs.correlation[used],
+                colorscale="Viridis",
+                colorbar=dict(title=language["tab-analysis"]["correlation"]),
+            ),
+        )
+    )
+    figure.update_layout(
+        title=(
+            f"{dataproduct.long_name}: "
+            f"{estimate.velocity:.0f} {language['tab-analysis']['velocity-unit']}, "
+            f"{language['tab-analysis']['azimuth']} {estimate.azimuth:.0f}°, "
+            f"{language['tab-analysis']['pairs']} {int(used.sum())}"
+        ),
+        title_font=dict(size=20, color="black"),
+        plot_bgcolor="white",
+        margin=dict(l=0, t=60, r=0, b=0),
+        xaxis=dict(
+            title=language["tab-analysis"]["fitted-lag"],
+            linecolor="black",
+            showline=True,
+            mirror=True,
+        ),
+        yaxis=dict(
+            title=language["tab-analysis"]["lag"],
+            linecolor="black",
+            showline=True,
+            mirror=True,
+        ),
+    )
+    return figure
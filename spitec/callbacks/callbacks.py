@@ -1,22 +1,102 @@
+from dash import html, dcc
 from dash.dependencies import Input, Output, State
 import plotly.graph_objects as go
-from spitec.view.visualization import *
+from spitec.view.visualization import (
+    ProjectionType,
+    create_analysis_figure,
+    create_site_data,
+)
 from spitec.view.languages import languages
-from spitec.processing.data_processing import *
+from spitec.processing.data_processing import Sat
 from spitec.processing.data_products import DataProducts
-from spitec.processing.trajectorie import Trajectorie
-from spitec.processing.site_processing import *
-from spitec.callbacks.figure import *
+from spitec.processing.trajectory_parsing import (
+    decode_trajectory_upload,
+    parse_trajectory_csv,
+    TrajectoryFileError,
+    TrajectoryFileSizeError,
+    MAX_TRAJECTORY_FILE_SIZE,
+)
+from spitec.processing.trajectory_store import (
+    save_trajectory,
+    get_trajectories_folder,
+)
+from spitec.processing.session_store import (
+    SessionStore,
+    SESSIONS_DB_NAME,
+    LEGACY_SESSIONS_FOLDER_NAME,
+    slim_session,
+    expand_session,
+)
+from spitec.processing.catalogue import get_file_catalogue, get_events_config
+from spitec.processing.export import (
+    EXPORT_FORMATS,
+    ExportError,
+    iter_export,
+    parse_export_products,
+)
+from spitec.processing.site_processing import (
+    Site,
+    Coordinate,
+    load_data,
+    сheck_file_size,
+    get_namelatlon_arrays,
+    select_sites_by_region,
+    select_sites_in_circle,
+)
+from spitec.callbacks.figure import (
+    create_map_with_points,
+    _create_limit_xaxis,
+    _define_data_type,
+)
+from spitec.callbacks.render import (
+    render_views,
+    get_view_state,
+    get_view_states,
+    TRAJECTORY_ERROR_STYLE,
+    TRAJECTORY_ERROR_HIDDEN_STYLE,
+)
+from spitec.callbacks.figure_cache import FigureCache, FIGURE_CACHE_FOLDER_NAME
+from spitec.callbacks.admission import callback_slot
+from spitec.callbacks.request_sequence import (
+    RequestSequence,
+    REQUEST_SEQUENCE_FOLDER_NAME,
+    DEBOUNCE_REQUEST_FUNCTION,
+)
+from spitec.callbacks.analysis import (
+    ANIMATION_STEP_DEFAULT,
+    GRID_STEP_DEFAULT,
+    GRID_STEP_MIN,
+    compute_grid_map,
+    create_animation_map,
+    create_grid_map,
+    create_keogram,
+    create_velocity_figure,
+    epoch_window,
+    event_options,
+    event_sip_tag,
+    event_time_window,
+    grid_map_title,
+    list_events,
+)
+from spitec.processing.binning import BinStatistic
+from spitec.processing.animation import compute_animation_frames
+from spitec.processing.keogram import KeogramAxis, compute_keogram
+from spitec.processing.event_detection import build_event_index, load_event_index
+from spitec.processing.velocity import estimate_velocity
 import dash
 from pathlib import Path
-import base64
-import uuid
 import sys
+import os
 import re
-from flask import request
+import json
+from urllib.parse import urlencode
+from flask import request, Response, abort, stream_with_context
 
 
 language = languages["en"]
+# Переменная окружения для другой папки с данными (нагрузочные тесты)
+DATA_FOLDER_ENV = "SPITEC_DATA_FOLDER"
+EXPORT_ROUTE = "export"
 
 def set_data_folder():
     platform = sys.platform
@@ -25,98 +105,119 @@ def set_data_folder():
         folder = Path(__file__).parent.parent / "data"  
     elif platform == "win32":
         folder = Path(__file__).parent.parent / "data"  
+    if os.environ.get(DATA_FOLDER_ENV):
+        folder = Path(os.environ[DATA_FOLDER_ENV])
     folder.mkdir(parents=True, exist_ok=True)
     return folder
 
 
 def register_callbacks(app: dash.Dash) -> None:
     FILE_FOLDER = set_data_folder()
-
-    @app.callback(
+    session_store = SessionStore(
+        FILE_FOLDER / SESSIONS_DB_NAME,
+        FILE_FOLDER / LEGACY_SESSIONS_FOLDER_NAME,
+    )
+    # Отрисованные фигуры для ссылок "share" по id сессии
+    figure_cache = FigureCache(FILE_FOLDER / FIGURE_CACHE_FOLDER_NAME)
+    # Номера последних запросов ползунка времени по вкладкам
+    request_sequence = RequestSequence(FILE_FOLDER / REQUEST_SEQUENCE_FOLDER_NAME)
+
+    # Проекция меняется в браузере; на сервер уходит только переход
+    # в ортографическую проекцию с выбранными станциями - траектории
+    # станций читаются из файла
+    app.clientside_callback(
+        """
+        function(projection, figure, siteDataStore, newPoints, siteData) {
+            const noUpdate = window.dash_clientside.no_update;
+            const selected = Object.keys(siteDataStore || {}).length;
+            if ((projection === ORTHOGRAPHIC && selected > 0) || !figure) {
+                return [
+                    noUpdate, noUpdate, noUpdate, noUpdate, noUpdate,
+                    {projection: projection, time: Date.now()},
+                ];
+            }
+            // Масштаб и поворот сбрасываются, как при отрисовке на сервере
+            const geo = Object.assign({}, figure.layout.geo);
+            geo.projection = {type: projection};
+            delete geo.center;
+            let data = figure.data;
+            let style = TRAJECTORY_ERROR_HIDDEN_STYLE;
+            if (projection !== ORTHOGRAPHIC) {
+                // Станции и точки пользователя, без траекторий
+                data = data.slice(0, 1 + Object.keys(newPoints || {}).length);
+                if (siteData && siteData.data && siteData.data.length > 0) {
+                    style = TRAJECTORY_ERROR_STYLE;
+                }
+            }
+            const layout = Object.assign({}, figure.layout, {geo: geo});
+            return [
+                Object.assign({}, figure, {data: data, layout: layout}),
+                1, null, style, projection, noUpdate,
+            ];
+        }
+        """.replace("ORTHOGRAPHIC", json.dumps(ProjectionType.ORTHOGRAPHIC.value))
+        .replace("TRAJECTORY_ERROR_HIDDEN_STYLE", json.dumps(TRAJECTORY_ERROR_HIDDEN_STYLE))
+        .replace("TRAJECTORY_ERROR_STYLE", json.dumps(TRAJECTORY_ERROR_STYLE)),
         [
             Output("graph-site-map", "figure", allow_duplicate=True),
             Output("scale-map-store", "data", allow_duplicate=True),
             Output("relayout-map-store", "data", allow_duplicate=True),
             Output("trajectory-error", "style", allow_duplicate=True),
             Output("projection-radio-store", "data", allow_duplicate=True),
+            Output("map-projection-request-store", "data"),
         ],
-        [Input("projection-radio", "value")],
+        Input("projection-radio", "value"),
         [
-            State("hide-show-site", "value"),
-            State("region-site-names-store", "data"),
-            State("site-coords-store", "data"),
+            State("graph-site-map", "figure"),
             State("site-data-store", "data"),
-            State("local-file-store", "data"),
-            State("selection-satellites", "value"),
-            State("graph-site-data", "figure"),
-            State("time-slider", "value"),
-            State("input-hm", "value"),
-            State("sip-tag-time-store", "data"),
             State("new-points-store", "data"),
-            State("new-trajectories-store", "data"),
-            State("all-select-sip-tag", "data"),
+            State("graph-site-data", "figure"),
+        ],
+        prevent_initial_call=True,
+    )
+
+    @app.callback(
+        [
+            Output("graph-site-map", "figure", allow_duplicate=True),
+            Output("scale-map-store", "data", allow_duplicate=True),
+            Output("relayout-map-store", "data", allow_duplicate=True),
+            Output("trajectory-error", "style", allow_duplicate=True),
+            Output("projection-radio-store", "data", allow_duplicate=True),
+        ],
+        [Input("map-projection-request-store", "data")],
+        [
+            State("projection-radio", "value"),
+            State("site-data-traces-store", "data"),
+            *get_view_states(
+                "show_names_site",
+                "region_site_names",
+                "site_coords",
+                "site_data_store",
+                "local_file",
+                "sat",
+                "time_value",
+                "input_hm",
+                "sip_tag_time",
+                "new_points",
+                "new_trajectories",
+                "all_select_sip_tag",
+            ),
         ],
         prevent_initial_call=True,
     )
     def update_map_projection(
+        projection_request: dict,
         projection_value: ProjectionType,
-        show_names_site: bool,
-        region_site_names: dict[str, int],
-        site_coords: dict[Site, dict[Coordinate, float]],
-        site_data_store: dict[str, int],
-        local_file: str,
-        sat: Sat,
         site_data: dict,
-        time_value: list[int],
-        input_hm: float,
-        sip_tag_time: dict,
-        new_points: dict[str, dict[str, str | float]],
-        new_trajectories: dict[str, dict[str, float | str]],
-        all_select_sip_tag: list[dict],
+        *view_states,  # читает get_view_state
     ) -> list[go.Figure, int, None, dict[str, str], ProjectionType]:
-        style_traj_error = {"visibility": "hidden"}
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            region_site_names,
-            site_data_store,
-            None,
-            None,
-            new_points,
-        )
-        
-        colors = {}
-        for data in site_data["data"]:
-            if data["name"] is None:
-                continue
-            colors[data["name"].lower()] = data["marker"]["color"]
-        
-        site_map = create_map_with_trajectories(
-            site_map,
-            local_file,
-            site_data_store,
-            site_coords,
-            sat, 
-            colors,
-            time_value,
-            input_hm,
-            sip_tag_time,
-            all_select_sip_tag,
-            new_trajectories,
+        render = render_views(
+            get_view_state(relayout_data=None, scale_map_store=None),
+            "projection_value",
+            site_data,
         )
-
-        if site_map.layout.geo.projection.type != ProjectionType.ORTHOGRAPHIC.value and \
-        len(site_data["data"]) != 0:
-            style_traj_error = {
-                "margin-top": "5px",
-                "text-align": "center",
-                "fontSize": "16px",
-                "color": "red",
-            }
-
         scale_map = 1
-        return site_map, scale_map, None, style_traj_error, projection_value
+        return render.site_map, scale_map, None, render.trajectory_error_style, projection_value
 
     @app.callback(
         [
@@ -130,47 +231,35 @@ def register_callbacks(app: dash.Dash) -> None:
         ],
         [Input("graph-site-map", "clickData")],
         [
-            State("local-file-store", "data"),
-            State("projection-radio", "value"),
-            State("hide-show-site", "value"),
-            State("region-site-names-store", "data"),
             State("site-coords-store", "data"),
-            State("selection-data-types", "value"),
             State("site-data-store", "data"),
-            State("time-slider", "value"),
-            State("selection-satellites", "value"),
-            State("input-shift", "value"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
-            State("input-hm", "value"),
             State("sip-tag-time-store", "data"),
-            State("new-points-store", "data"),
-            State("new-trajectories-store", "data"),
-            State("all-select-sip-tag", "data"),
+            *get_view_states(
+                "local_file",
+                "projection_value",
+                "show_names_site",
+                "region_site_names",
+                "data_types",
+                "time_value",
+                "sat",
+                "shift",
+                "relayout_data",
+                "scale_map_store",
+                "input_hm",
+                "new_points",
+                "new_trajectories",
+                "all_select_sip_tag",
+            ),
         ],
         prevent_initial_call=True,
     )
     def update_site_data(
         clickData: dict[str, list[dict[str, float | str | dict]]],
-        local_file: str,
-        projection_value: ProjectionType,
-        show_names_site: bool,
-        region_site_names: dict[str, int],
         site_coords: dict[Site, dict[Coordinate, float]],
-        data_types: str,
         site_data_store: dict[str, int],
-        time_value: list[int],
-        sat: Sat,
-        shift: float,
-        relayout_data: dict[str, float],
-        scale_map_store: float,
-        input_hm: float,
         sip_tag_time: dict,
-        new_points: dict[str, dict[str, str | float]],
-        new_trajectories: dict[str, dict[str, float | str]],
-        all_select_sip_tag: list[dict],
+        *view_states,  # читает get_view_state
     ) -> list[go.Figure, None, bool, dict[str, int], dict[str, str]]:
-        style_traj_error = {"visibility": "hidden"}
         if clickData is not None and clickData["points"][0]["curveNumber"] == 0:
             pointIndex = clickData["points"][0]["pointIndex"]
             site_name = list(site_coords.keys())[pointIndex]
@@ -181,59 +270,50 @@ def register_callbacks(app: dash.Dash) -> None:
             else:
                 site_data_store[site_name] = pointIndex
 
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            region_site_names,
-            site_data_store,
-            relayout_data,
-            scale_map_store,
-            new_points,
+        render = render_views(
+            get_view_state(site_data_store=site_data_store),
+            "site_data_store",
         )
-        site_data = create_site_data_with_values(
+        if not site_data_store:
+            sip_tag_time = None
+        return (
+            render.site_map,
+            None,
+            render.site_data,
+            render.disabled,
             site_data_store,
-            sat,
-            data_types,
-            local_file,
-            time_value,
-            shift,
+            render.trajectory_error_style,
             sip_tag_time,
-            all_select_sip_tag,
         )
 
-        colors = {}
-        for data in site_data.data:
-            if data["name"] is None:
-                continue
-            colors[data.name.lower()] = data.marker.color
-        
-        site_map = create_map_with_trajectories(
-            site_map,
-            local_file,
-            site_data_store,
-            site_coords,
-            sat, 
-            colors,
-            time_value,
-            input_hm,
-            sip_tag_time,
-            all_select_sip_tag,
-            new_trajectories,
-        )
-        if site_map.layout.geo.projection.type != ProjectionType.ORTHOGRAPHIC.value and \
-        len(site_data.data) != 0:
-            style_traj_error = {
-                "margin-top": "5px",
-                "text-align": "center",
-                "fontSize": "16px",
-                "color": "red",
+    # Серверу нужны только имена и цвета рядов (см. get_site_colors);
+    # массивы фигуры, в том числе декодированные typed array, остаются
+    # в браузере
+    app.clientside_callback(
+        """
+        function(figure) {
+            if (!figure || !figure.data) {
+                return null;
             }
+            const data = figure.data.map((trace) => ({
+                name: trace.name === undefined ? null : trace.name,
+                marker: {color: (trace.marker || {}).color || null},
+            }));
+            return {data: data};
+        }
+        """,
+        Output("site-data-traces-store", "data"),
+        Input("graph-site-data", "figure"),
+    )
 
-        disabled = True if len(site_data.data) == 0 else False
-        if not site_data_store:
-            sip_tag_time = None
-        return site_map, None, site_data, disabled, site_data_store, style_traj_error, sip_tag_time
+    # Пока ползунок двигается, запросы не отправляются; на сервер уходит
+    # только последнее окно времени с номером запроса
+    app.clientside_callback(
+        DEBOUNCE_REQUEST_FUNCTION,
+        Output("time-slider-request-store", "data"),
+        Input("time-slider", "value"),
+        prevent_initial_call=True,
+    )
 
     @app.callback(
         [
@@ -242,89 +322,47 @@ def register_callbacks(app: dash.Dash) -> None:
             Output("graph-site-map", "figure", allow_duplicate=True),
             Output("time-slider-store", "data", allow_duplicate=True),
         ],
-        [Input("time-slider", "value")],
+        [Input("time-slider-request-store", "data")],
         [
-            State("selection-data-types", "value"),
-            State("site-data-store", "data"),
-            State("local-file-store", "data"),
-            State("selection-satellites", "value"),
-            State("input-shift", "value"),
-            State("projection-radio", "value"),
-            State("hide-show-site", "value"),
-            State("site-coords-store", "data"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
-            State("input-hm", "value"),
-            State("region-site-names-store", "data"),
-            State("sip-tag-time-store", "data"),
-            State("new-points-store", "data"),
-            State("new-trajectories-store", "data"),
-            State("all-select-sip-tag", "data"),
+            *get_view_states(
+                "data_types",
+                "site_data_store",
+                "local_file",
+                "sat",
+                "shift",
+                "projection_value",
+                "show_names_site",
+                "site_coords",
+                "relayout_data",
+                "scale_map_store",
+                "input_hm",
+                "region_site_names",
+                "sip_tag_time",
+                "new_points",
+                "new_trajectories",
+                "all_select_sip_tag",
+            ),
         ],
         prevent_initial_call=True,
     )
     def change_xaxis(
-        time_value: list[int],
-        data_types: str,
-        site_data_store: dict[str, int],
-        local_file: str,
-        sat: Sat,
-        shift: float,
-        projection_value: ProjectionType,
-        show_names_site: bool,
-        site_coords: dict[Site, dict[Coordinate, float]],
-        relayout_data: dict[str, float],
-        scale_map_store: float,
-        input_hm: float,
-        region_site_names: dict[str, int],
-        sip_tag_time: dict,
-        new_points: dict[str, dict[str, str | float]],
-        new_trajectories: dict[str, dict[str, float | str]],
-        all_select_sip_tag: list[dict],
+        time_request: dict,
+        *view_states,  # читает get_view_state
     ) -> list[go.Figure, bool, go.Figure, list[int]]:
-        site_data = create_site_data_with_values(
-            site_data_store,
-            sat,
-            data_types,
-            local_file,
-            time_value,
-            shift,
-            sip_tag_time,
-            all_select_sip_tag,
-        )
-        disabled = True if len(site_data.data) == 0 else False
-
-        colors = {}
-        for data in site_data["data"]:
-            if data["name"] is None:
-                continue
-            colors[data["name"].lower()] = data["marker"]["color"]
-
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            region_site_names,
-            site_data_store,
-            relayout_data,
-            scale_map_store,
-            new_points,
-        )
-        site_map = create_map_with_trajectories(
-            site_map,
-            local_file,
-            site_data_store,
-            site_coords,
-            sat, 
-            colors,
-            time_value,
-            input_hm,
-            sip_tag_time,
-            all_select_sip_tag,
-            new_trajectories,
+        # Запрос, который уже заменен более новым, не выполняется
+        if not request_sequence.start(time_request, "change_xaxis"):
+            return [dash.no_update for _ in range(4)]
+        time_value = time_request["value"]
+        render = render_views(
+            get_view_state(time_value=time_value),
+            "time_value",
+            is_superseded=lambda: request_sequence.is_superseded(
+                time_request, "change_xaxis"
+            ),
         )
-
-        return site_data, disabled, site_map, time_value
+        if request_sequence.is_superseded(time_request, "change_xaxis"):
+            return [dash.no_update for _ in range(4)]
+        return render.site_data, render.disabled, render.site_map, time_value
 
     @app.callback(
         [
@@ -338,42 +376,39 @@ def register_callbacks(app: dash.Dash) -> None:
         ],
         [Input("clear-all", "n_clicks")],
         [
-            State("projection-radio", "value"),
-            State("hide-show-site", "value"),
-            State("region-site-names-store", "data"),
-            State("site-coords-store", "data"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
-            State("new-points-store", "data"),
+            *get_view_states(
+                "projection_value",
+                "show_names_site",
+                "region_site_names",
+                "site_coords",
+                "relayout_data",
+                "scale_map_store",
+                "new_points",
+            ),
         ],
         prevent_initial_call=True,
     )
     def clear_all(
         n: int,
-        projection_value: ProjectionType,
-        show_names_site: bool,
-        region_site_names: dict[str, int],
-        site_coords: dict[Site, dict[Coordinate, float]],
-        relayout_data: dict[str, float],
-        scale_map_store: float,
-        new_points: dict[str, dict[str, str | float]],
+        *view_states,  # читает get_view_state
     ) -> list[go.Figure, bool, None, dict[str, str], None]:
-        site_data = create_site_data_with_values(
-            None, None, None, None, None, None, None, None
+        render = render_views(
+            get_view_state(
+                site_data_store=None,
+                sip_tag_time=None,
+                all_select_sip_tag=None,
+            ),
+            "site_data_store",
         )
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            region_site_names,
+        return (
+            render.site_map,
+            render.site_data,
+            render.disabled,
+            None,
+            render.trajectory_error_style,
+            None,
             None,
-            relayout_data,
-            scale_map_store,
-            new_points,
         )
-        disabled = True
-        style_traj_error = {"visibility": "hidden"}
-        return site_map, site_data, disabled, None, style_traj_error, None, None
 
     @app.callback(
         [
@@ -397,80 +432,47 @@ def register_callbacks(app: dash.Dash) -> None:
             relayout_data = relayout_data_store
         return scale_map, relayout_data
 
-    @app.callback(
+    # Имена станций переключаются в браузере так же, как в
+    # configure_show_site_names: имена невыбранных станций в customdata
+    app.clientside_callback(
+        """
+        function(showNames, figure, siteDataStore) {
+            const noUpdate = window.dash_clientside.no_update;
+            if (!figure || figure.data.length === 0 || !figure.data[0].text) {
+                return [noUpdate, showNames];
+            }
+            const sites = Object.assign({}, figure.data[0]);
+            const customdata = sites.customdata || [];
+            const names = sites.text.map((text, i) => text || customdata[i] || "");
+            const selected = new Set(
+                Object.keys(siteDataStore || {}).map((site) => site.toUpperCase())
+            );
+            if (showNames) {
+                sites.text = names;
+                sites.hoverinfo = "lat+lon";
+                delete sites.customdata;
+                delete sites.hovertemplate;
+            } else {
+                sites.text = names.map((name) => selected.has(name) ? name : "");
+                sites.customdata = names.map((name) => selected.has(name) ? "" : name);
+                sites.hoverinfo = "text";
+                sites.hovertemplate = "%{customdata} (%{lat}, %{lon})<extra></extra>";
+            }
+            const data = [sites].concat(figure.data.slice(1));
+            return [Object.assign({}, figure, {data: data}), showNames];
+        }
+        """,
         [
             Output("graph-site-map", "figure", allow_duplicate=True),
             Output("checkbox-site-store", "data", allow_duplicate=True),
         ],
-        [Input("hide-show-site", "value")],
+        Input("hide-show-site", "value"),
         [
-            State("projection-radio", "value"),
-            State("region-site-names-store", "data"),
-            State("site-coords-store", "data"),
+            State("graph-site-map", "figure"),
             State("site-data-store", "data"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
-            State("graph-site-data", "figure"),
-            State("local-file-store", "data"),
-            State("selection-satellites", "value"),
-            State("time-slider", "value"),
-            State("input-hm", "value"),
-            State("sip-tag-time-store", "data"),
-            State("new-points-store", "data"),
-            State("new-trajectories-store", "data"),
-            State("all-select-sip-tag", "data"),
         ],
         prevent_initial_call=True,
     )
-    def hide_show_site(
-        show_names_site: bool,
-        projection_value: ProjectionType,
-        region_site_names: dict[str, int],
-        site_coords: dict[Site, dict[Coordinate, float]],
-        site_data_store: dict[str, int],
-        relayout_data: dict[str, float],
-        scale_map_store: float,
-        site_data: dict,
-        local_file: str,
-        sat: Sat,
-        time_value: list[int],
-        input_hm: float,
-        sip_tag_time: dict,
-        new_points: dict[str, dict[str, str | float]],
-        new_trajectories: dict[str, dict[str, float | str]],
-        all_select_sip_tag: list[dict],
-    ) -> list[go.Figure, bool]:
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            region_site_names,
-            site_data_store,
-            relayout_data,
-            scale_map_store,
-            new_points,
-        )
-
-        colors = {}
-        for data in site_data["data"]:
-            if data["name"] is None:
-                continue
-            colors[data["name"].lower()] = data["marker"]["color"]
-        
-        site_map = create_map_with_trajectories(
-            site_map,
-            local_file,
-            site_data_store,
-            site_coords,
-            sat, 
-            colors,
-            time_value,
-            input_hm,
-            sip_tag_time,
-            all_select_sip_tag,
-            new_trajectories,
-        )
-        return site_map, show_names_site
 
     @app.callback(
         [
@@ -488,21 +490,23 @@ def register_callbacks(app: dash.Dash) -> None:
             State("min-lon", "value"),
             State("max-lon", "value"),
             State("region-site-names-store", "data"),
-            State("projection-radio", "value"),
-            State("hide-show-site", "value"),
             State("site-coords-store", "data"),
-            State("site-data-store", "data"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
-            State("graph-site-data", "figure"),
-            State("local-file-store", "data"),
-            State("selection-satellites", "value"),
-            State("time-slider", "value"),
-            State("input-hm", "value"),
-            State("sip-tag-time-store", "data"),
-            State("new-points-store", "data"),
-            State("new-trajectories-store", "data"),
-            State("all-select-sip-tag", "data"),
+            State("site-data-traces-store", "data"),
+            *get_view_states(
+                "projection_value",
+                "show_names_site",
+                "site_data_store",
+                "relayout_data",
+                "scale_map_store",
+                "local_file",
+                "sat",
+                "time_value",
+                "input_hm",
+                "sip_tag_time",
+                "new_points",
+                "new_trajectories",
+                "all_select_sip_tag",
+            ),
         ],
         prevent_initial_call=True,
     )
@@ -513,21 +517,9 @@ def register_callbacks(app: dash.Dash) -> None:
         min_lon: int,
         max_lon: int,
         region_site_names: dict[str, int],
-        projection_value: ProjectionType,
-        show_names_site: bool,
         site_coords: dict[Site, dict[Coordinate, float]],
-        site_data_store: dict[str, int],
-        relayout_data: dict[str, float],
-        scale_map_store: float,
         site_data: dict,
-        local_file: str,
-        sat: Sat,
-        time_value: list[int],
-        input_hm: float,
-        sip_tag_time: dict,
-        new_points: dict[str, dict[str, str | float]],
-        new_trajectories: dict[str, dict[str, float | str]],
-        all_select_sip_tag: list[dict],
+        *view_states,  # читает get_view_state
     ) -> list[go.Figure | bool | dict[str, int]]:
         return_value_list = [
             None,
@@ -558,36 +550,12 @@ def register_callbacks(app: dash.Dash) -> None:
                 for site in tmp_sites:
                     sites[site] = keys.index(site)
                 return_value_list[-1] = sites
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            sites,
-            site_data_store,
-            relayout_data,
-            scale_map_store,
-            new_points,
-        )
-
-        colors = {}
-        for data in site_data["data"]:
-            if data["name"] is None:
-                continue
-            colors[data["name"].lower()] = data["marker"]["color"]
-        
-        return_value_list[0] = create_map_with_trajectories(
-            site_map,
-            local_file,
-            site_data_store,
-            site_coords,
-            sat, 
-            colors,
-            time_value,
-            input_hm,
-            sip_tag_time,
-            all_select_sip_tag,
-            new_trajectories,
+        render = render_views(
+            get_view_state(region_site_names=sites),
+            "region_site_names",
+            site_data,
         )
+        return_value_list[0] = render.site_map
         return return_value_list
 
     def check_region_value(
@@ -612,21 +580,23 @@ def register_callbacks(app: dash.Dash) -> None:
             State("center-point-lat", "value"),
             State("center-point-lon", "value"),
             State("region-site-names-store", "data"),
-            State("projection-radio", "value"),
-            State("hide-show-site", "value"),
             State("site-coords-store", "data"),
-            State("site-data-store", "data"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
-            State("graph-site-data", "figure"),
-            State("local-file-store", "data"),
-            State("selection-satellites", "value"),
-            State("time-slider", "value"),
-            State("input-hm", "value"),
-            State("sip-tag-time-store", "data"),
-            State("new-points-store", "data"),
-            State("new-trajectories-store", "data"),
-            State("all-select-sip-tag", "data"),
+            State("site-data-traces-store", "data"),
+            *get_view_states(
+                "projection_value",
+                "show_names_site",
+                "site_data_store",
+                "relayout_data",
+                "scale_map_store",
+                "local_file",
+                "sat",
+                "time_value",
+                "input_hm",
+                "sip_tag_time",
+                "new_points",
+                "new_trajectories",
+                "all_select_sip_tag",
+            ),
         ],
         prevent_initial_call=True,
     )
@@ -636,21 +606,9 @@ def register_callbacks(app: dash.Dash) -> None:
         lat: int,
         lon: int,
         region_site_names: dict[str, int],
-        projection_value: ProjectionType,
-        show_names_site: bool,
         site_coords: dict[Site, dict[Coordinate, float]],
-        site_data_store: dict[str, int],
-        relayout_data: dict[str, float],
-        scale_map_store: float,
         site_data: dict,
-        local_file: str,
-        sat: Sat,
-        time_value: list[int],
-        input_hm: float,
-        sip_tag_time: dict,
-        new_points: dict[str, dict[str, str | float]],
-        new_trajectories: dict[str, dict[str, float | str]],
-        all_select_sip_tag: list[dict],
+        *view_states,  # читает get_view_state
     ) -> list[go.Figure | bool | dict[str, int]]:
         return_value_list = [None, False, False, False, region_site_names]
         sites = region_site_names
@@ -677,36 +635,12 @@ def register_callbacks(app: dash.Dash) -> None:
                     sites[site] = keys.index(site)
                 return_value_list[-1] = sites
 
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            sites,
-            site_data_store,
-            relayout_data,
-            scale_map_store,
-            new_points,
-        )
-
-        colors = {}
-        for data in site_data["data"]:
-            if data["name"] is None:
-                continue
-            colors[data["name"].lower()] = data["marker"]["color"]
-
-        return_value_list[0] = create_map_with_trajectories(
-            site_map,
-            local_file,
-            site_data_store,
-            site_coords,
-            sat, 
-            colors,
-            time_value,
-            input_hm,
-            sip_tag_time,
-            all_select_sip_tag,
-            new_trajectories,
+        render = render_views(
+            get_view_state(region_site_names=sites),
+            "region_site_names",
+            site_data,
         )
+        return_value_list[0] = render.site_map
         return return_value_list
 
     @app.callback(
@@ -716,73 +650,37 @@ def register_callbacks(app: dash.Dash) -> None:
         ],
         Input("clear-selection-by-region", "n_clicks"),
         [
-            State("projection-radio", "value"),
-            State("hide-show-site", "value"),
-            State("site-coords-store", "data"),
-            State("site-data-store", "data"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
-            State("graph-site-data", "figure"),
-            State("local-file-store", "data"),
-            State("selection-satellites", "value"),
-            State("time-slider", "value"),
-            State("input-hm", "value"),
-            State("sip-tag-time-store", "data"),
-            State("new-points-store", "data"),
-            State("new-trajectories-store", "data"),
-            State("all-select-sip-tag", "data"),
+            State("site-data-traces-store", "data"),
+            *get_view_states(
+                "projection_value",
+                "show_names_site",
+                "site_coords",
+                "site_data_store",
+                "relayout_data",
+                "scale_map_store",
+                "local_file",
+                "sat",
+                "time_value",
+                "input_hm",
+                "sip_tag_time",
+                "new_points",
+                "new_trajectories",
+                "all_select_sip_tag",
+            ),
         ],
-        prevent_initial_call=True,
-    )
-    def clear_selection_by_region(
-        n1: int,
-        projection_value: ProjectionType,
-        show_names_site: bool,
-        site_coords: dict[Site, dict[Coordinate, float]],
-        site_data_store: dict[str, int],
-        relayout_data: dict[str, float],
-        scale_map_store: float,
-        site_data: dict,
-        local_file: str,
-        sat: Sat,
-        time_value: list[int],
-        input_hm: float,
-        sip_tag_time: dict,
-        new_points: dict[str, dict[str, str | float]],
-        new_trajectories: dict[str, dict[str, float | str]],
-        all_select_sip_tag: list[dict],
+        prevent_initial_call=True,
+    )
+    def clear_selection_by_region(
+        n1: int,
+        site_data: dict,
+        *view_states,  # читает get_view_state
     ) -> list[go.Figure | None]:
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            None,
-            site_data_store,
-            relayout_data,
-            scale_map_store,
-            new_points,
-        )
-
-        colors = {}
-        for data in site_data["data"]:
-            if data["name"] is None:
-                continue
-            colors[data["name"].lower()] = data["marker"]["color"]
-
-        site_map = create_map_with_trajectories(
-            site_map,
-            local_file,
-            site_data_store,
-            site_coords,
-            sat, 
-            colors,
-            time_value,
-            input_hm,
-            sip_tag_time,
-            all_select_sip_tag,
-            new_trajectories,
+        render = render_views(
+            get_view_state(region_site_names=None),
+            "region_site_names",
+            site_data,
         )
-        return site_map, None
+        return render.site_map, None
     
     @app.callback(
         [
@@ -801,21 +699,23 @@ def register_callbacks(app: dash.Dash) -> None:
             State("point-lat", "value"),
             State("point-lon", "value"),
             State("new-points-store", "data"),
-            State("region-site-names-store", "data"),
-            State("projection-radio", "value"),
-            State("hide-show-site", "value"),
             State("site-coords-store", "data"),
-            State("site-data-store", "data"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
-            State("graph-site-data", "figure"),
-            State("local-file-store", "data"),
-            State("selection-satellites", "value"),
-            State("time-slider", "value"),
-            State("input-hm", "value"),
-            State("sip-tag-time-store", "data"),
-            State("new-trajectories-store", "data"),
-            State("all-select-sip-tag", "data"),
+            State("site-data-traces-store", "data"),
+            *get_view_states(
+                "region_site_names",
+                "projection_value",
+                "show_names_site",
+                "site_data_store",
+                "relayout_data",
+                "scale_map_store",
+                "local_file",
+                "sat",
+                "time_value",
+                "input_hm",
+                "sip_tag_time",
+                "new_trajectories",
+                "all_select_sip_tag",
+            ),
         ],
         prevent_initial_call=True,
     )
@@ -827,21 +727,9 @@ def register_callbacks(app: dash.Dash) -> None:
         point_lat: int,
         point_lon: int,
         new_points: dict[str, dict[str, str | float]],
-        region_site_names: dict[str, int],
-        projection_value: ProjectionType,
-        show_names_site: bool,
         site_coords: dict[Site, dict[Coordinate, float]],
-        site_data_store: dict[str, int],
-        relayout_data: dict[str, float],
-        scale_map_store: float,
         site_data: dict,
-        local_file: str,
-        sat: Sat,
-        time_value: list[int],
-        input_hm: float,
-        sip_tag_time: dict,
-        new_trajectories: dict[str, dict[str, float | str]],
-        all_select_sip_tag: list[dict],
+        *view_states,  # читает get_view_state
     ) -> list[go.Figure | bool | dict[str, dict[str, str | float]], dict[str, str]]:
         return_value_list = [None, False, False, False, new_points]
         points = new_points
@@ -873,37 +761,12 @@ def register_callbacks(app: dash.Dash) -> None:
         if len(points) == 0:
             points = None
 
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            region_site_names,
-            site_data_store,
-            relayout_data,
-            scale_map_store,
-            points,
-        )
-
-        colors = {}
-        for data in site_data["data"]:
-            if data["name"] is None:
-                continue
-            colors[data["name"].lower()] = data["marker"]["color"]
-
-        return_value_list[0] = create_map_with_trajectories(
-            site_map,
-            local_file,
-            site_data_store,
-            site_coords,
-            sat, 
-            colors,
-            time_value,
-            input_hm,
-            sip_tag_time,
-            all_select_sip_tag,
-            new_trajectories,
+        render = render_views(
+            get_view_state(new_points=points),
+            "new_points",
+            site_data,
         )
-
+        return_value_list[0] = render.site_map
         return_value_list[-1] = points
         return_value_list.append(style)
         return return_value_list
@@ -915,73 +778,37 @@ def register_callbacks(app: dash.Dash) -> None:
         ],
         Input("delete-all-points", "n_clicks"),
         [
-            State("projection-radio", "value"),
-            State("hide-show-site", "value"),
-            State("site-coords-store", "data"),
-            State("site-data-store", "data"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
-            State("graph-site-data", "figure"),
-            State("local-file-store", "data"),
-            State("selection-satellites", "value"),
-            State("time-slider", "value"),
-            State("input-hm", "value"),
-            State("sip-tag-time-store", "data"),
-            State("region-site-names-store", "data"),
-            State("new-trajectories-store", "data"),
-            State("all-select-sip-tag", "data"),
+            State("site-data-traces-store", "data"),
+            *get_view_states(
+                "projection_value",
+                "show_names_site",
+                "site_coords",
+                "site_data_store",
+                "relayout_data",
+                "scale_map_store",
+                "local_file",
+                "sat",
+                "time_value",
+                "input_hm",
+                "sip_tag_time",
+                "region_site_names",
+                "new_trajectories",
+                "all_select_sip_tag",
+            ),
         ],
         prevent_initial_call=True,
     )
     def delete_all_points(
         n1: int,
-        projection_value: ProjectionType,
-        show_names_site: bool,
-        site_coords: dict[Site, dict[Coordinate, float]],
-        site_data_store: dict[str, int],
-        relayout_data: dict[str, float],
-        scale_map_store: float,
         site_data: dict,
-        local_file: str,
-        sat: Sat,
-        time_value: list[int],
-        input_hm: float,
-        sip_tag_time: dict,
-        region_site_names: dict[str, int],
-        new_trajectories: dict[str, dict[str, float | str]],
-        all_select_sip_tag: list[dict],
+        *view_states,  # читает get_view_state
     ) -> list[go.Figure | None]:
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            region_site_names,
-            site_data_store,
-            relayout_data,
-            scale_map_store,
-            None,
-        )
-
-        colors = {}
-        for data in site_data["data"]:
-            if data["name"] is None:
-                continue
-            colors[data["name"].lower()] = data["marker"]["color"]
-
-        site_map = create_map_with_trajectories(
-            site_map,
-            local_file,
-            site_data_store,
-            site_coords,
-            sat, 
-            colors,
-            time_value,
-            input_hm,
-            sip_tag_time,
-            all_select_sip_tag,
-            new_trajectories,
+        render = render_views(
+            get_view_state(new_points=None),
+            "new_points",
+            site_data,
         )
-        return site_map, None
+        return render.site_map, None
     
     @app.callback(
         [
@@ -991,81 +818,45 @@ def register_callbacks(app: dash.Dash) -> None:
         Input("delete-point", "n_clicks"),
         [
             State("name-point-by-delete", "value"),
-            State("projection-radio", "value"),
-            State("hide-show-site", "value"),
-            State("site-coords-store", "data"),
-            State("site-data-store", "data"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
-            State("graph-site-data", "figure"),
-            State("local-file-store", "data"),
-            State("selection-satellites", "value"),
-            State("time-slider", "value"),
-            State("input-hm", "value"),
-            State("sip-tag-time-store", "data"),
-            State("region-site-names-store", "data"),
+            State("site-data-traces-store", "data"),
             State("new-points-store", "data"),
-            State("new-trajectories-store", "data"),
-            State("all-select-sip-tag", "data"),
+            *get_view_states(
+                "projection_value",
+                "show_names_site",
+                "site_coords",
+                "site_data_store",
+                "relayout_data",
+                "scale_map_store",
+                "local_file",
+                "sat",
+                "time_value",
+                "input_hm",
+                "sip_tag_time",
+                "region_site_names",
+                "new_trajectories",
+                "all_select_sip_tag",
+            ),
         ],
         prevent_initial_call=True,
     )
     def delete_point(
         n1: int,
         name_point: str,
-        projection_value: ProjectionType,
-        show_names_site: bool,
-        site_coords: dict[Site, dict[Coordinate, float]],
-        site_data_store: dict[str, int],
-        relayout_data: dict[str, float],
-        scale_map_store: float,
         site_data: dict,
-        local_file: str,
-        sat: Sat,
-        time_value: list[int],
-        input_hm: float,
-        sip_tag_time: dict,
-        region_site_names: dict[str, int],
         new_points: dict[str, dict[str, str | float]],
-        new_trajectories: dict[str, dict[str, float | str]],
-        all_select_sip_tag: list[dict],
+        *view_states,  # читает get_view_state
     ) -> list[go.Figure | None]:
         if name_point in new_points.keys():
             del new_points[name_point]
         if len(new_points) == 0:
             new_points == None
             
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            region_site_names,
-            site_data_store,
-            relayout_data,
-            scale_map_store,
-            new_points,
-        )
-
-        colors = {}
-        for data in site_data["data"]:
-            if data["name"] is None:
-                continue
-            colors[data["name"].lower()] = data["marker"]["color"]
-
-        site_map = create_map_with_trajectories(
-            site_map,
-            local_file,
-            site_data_store,
-            site_coords,
-            sat, 
-            colors,
-            time_value,
-            input_hm,
-            sip_tag_time,
-            all_select_sip_tag,
-            new_trajectories,
+        render = render_views(
+            get_view_state(new_points=new_points),
+            "new_points",
+            site_data,
         )
-        return site_map, new_points
+        return render.site_map, new_points
     
     @app.callback(
         [
@@ -1112,24 +903,25 @@ def register_callbacks(app: dash.Dash) -> None:
         [
             State("name-trajectory", "value"),
             State("trajectory-file", "contents"),
-            State("trajectory-file", "filename"),
             State("trajectory-color", "value"),
             State("new-trajectories-store", "data"),
-            State("new-points-store", "data"),
-            State("region-site-names-store", "data"),
-            State("projection-radio", "value"),
-            State("hide-show-site", "value"),
             State("site-coords-store", "data"),
-            State("site-data-store", "data"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
-            State("graph-site-data", "figure"),
+            State("site-data-traces-store", "data"),
             State("local-file-store", "data"),
-            State("selection-satellites", "value"),
-            State("time-slider", "value"),
-            State("input-hm", "value"),
-            State("sip-tag-time-store", "data"),
-            State("all-select-sip-tag", "data"),
+            *get_view_states(
+                "new_points",
+                "region_site_names",
+                "projection_value",
+                "show_names_site",
+                "site_data_store",
+                "relayout_data",
+                "scale_map_store",
+                "sat",
+                "time_value",
+                "input_hm",
+                "sip_tag_time",
+                "all_select_sip_tag",
+            ),
         ],
         prevent_initial_call=True,
     )
@@ -1137,24 +929,12 @@ def register_callbacks(app: dash.Dash) -> None:
         n: int,
         trajectory_name: str,
         file_contents: str,
-        filename,
         trajectory_color: str,
-        new_trajectories: dict[str, dict[str, float | str]],
-        new_points: dict[str, dict[str, str | float]],
-        region_site_names: dict[str, int],
-        projection_value: ProjectionType,
-        show_names_site: bool,
+        new_trajectories: dict[str, dict[str, str]],
         site_coords: dict[Site, dict[Coordinate, float]],
-        site_data_store: dict[str, int],
-        relayout_data: dict[str, float],
-        scale_map_store: float,
         site_data: dict,
         local_file: str,
-        sat: Sat,
-        time_value: list[int],
-        input_hm: float,
-        sip_tag_time: dict,
-        all_select_sip_tag: list[dict],
+        *view_states,  # читает get_view_state
     ) -> list[go.Figure | bool | dict[str, dict[str, str | float]], dict[str, str]]:
         error_text = language["tab-add-trajectories"]["error-name"]
         error_style = {"visibility": "hidden"}
@@ -1186,42 +966,36 @@ def register_callbacks(app: dash.Dash) -> None:
             try:
                 local_file_path = Path(local_file)
 
-                content_type, content_string = file_contents.split(',')
-                decoded = base64.b64decode(content_string)
-                data_string = decoded.decode('utf-8')
-            
-                lines = data_string.strip().split('\n')
-                data_rows = [line.split(',') for line in lines[1:]]  # Получаем данные без загаловков
-                times, lons, lats, hms = [], [], [], []
-                for row in data_rows:
-                    traj_time_str = datetime.strptime(
-                        f"{local_file_path.stem} {row[0]}","%Y-%m-%d %H:%M:%S"
-                    )
-                    traj_time = traj_time_str.replace(tzinfo=timezone.utc)
-                    
-                    times.append(traj_time)
-                    lons.append(float(row[1]))
-                    lats.append(float(row[2]))
-                    hms.append(float(row[3]))
-
-                traj = Trajectorie(trajectory_name, None, None, None)
-                traj.traj_lat = np.array(lats, dtype=object)
-                traj.traj_lon = np.array(lons, dtype=object)
-                traj.times = np.array(times)
-                traj.traj_hm = np.array(hms, dtype=object)
-                
-                traj.adding_artificial_value()
+                decoded = decode_trajectory_upload(file_contents)
+                times, lons, lats, hms = parse_trajectory_csv(
+                    decoded, local_file_path.stem
+                )
 
+                trajectory_id = save_trajectory(
+                    get_trajectories_folder(FILE_FOLDER), times, lats, lons, hms
+                )
                 trajectories[trajectory_name] = {
-                    "times": traj.times,
-                    "traj_lat": traj.traj_lat,
-                    "traj_lon": traj.traj_lon ,
-                    "traj_hm": traj.traj_hm,
+                    "id": trajectory_id,
                     "color": trajectory_color,
                 }
-            except Exception:
+            except TrajectoryFileSizeError:
+                error_text = language["tab-add-trajectories"]["error-size"].format(
+                    size=MAX_TRAJECTORY_FILE_SIZE // 1024 // 1024
+                )
+                error_style = {
+                    "margin-top": "10px",
+                    "fontSize": "14px",
+                    "color": "red",
+                }
+            except Exception as err:
+                row_text = ""
+                if isinstance(err, TrajectoryFileError) and err.row is not None:
+                    row_text = language["tab-add-trajectories"]["error-row"].format(
+                        row=err.row
+                    )
                 error_text = [
                     language["tab-add-trajectories"]["error-file"],
+                    row_text,
                     ". ",
                     language["tab-add-trajectories"]["example"],
                     html.Br(),
@@ -1238,38 +1012,12 @@ def register_callbacks(app: dash.Dash) -> None:
         if len(trajectories) == 0:
             trajectories = None
 
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            region_site_names,
-            site_data_store,
-            relayout_data,
-            scale_map_store,
-            new_points,
-        )
-
-        colors = {}
-        for data in site_data["data"]:
-            if data["name"] is None:
-                continue
-            colors[data["name"].lower()] = data["marker"]["color"]
-
-        site_map = create_map_with_trajectories(
-            site_map,
-            local_file,
-            site_data_store,
-            site_coords,
-            sat, 
-            colors,
-            time_value,
-            input_hm,
-            sip_tag_time,
-            all_select_sip_tag,
-            trajectories,
+        render = render_views(
+            get_view_state(new_trajectories=trajectories),
+            "new_trajectories",
+            site_data,
         )
-
-        return site_map, invalid_name, trajectories, error_text, error_style
+        return render.site_map, invalid_name, trajectories, error_text, error_style
     
     @app.callback(
         [
@@ -1278,73 +1026,37 @@ def register_callbacks(app: dash.Dash) -> None:
         ],
         Input("delete-all-trajectories", "n_clicks"),
         [
-            State("projection-radio", "value"),
-            State("hide-show-site", "value"),
-            State("site-coords-store", "data"),
-            State("site-data-store", "data"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
-            State("graph-site-data", "figure"),
-            State("local-file-store", "data"),
-            State("selection-satellites", "value"),
-            State("time-slider", "value"),
-            State("input-hm", "value"),
-            State("sip-tag-time-store", "data"),
-            State("region-site-names-store", "data"),
-            State("new-points-store", "data"),
-            State("all-select-sip-tag", "data"),
-        ],
-        prevent_initial_call=True,
-    )
-    def delete_all_new_trajectories(
-        n1: int,
-        projection_value: ProjectionType,
-        show_names_site: bool,
-        site_coords: dict[Site, dict[Coordinate, float]],
-        site_data_store: dict[str, int],
-        relayout_data: dict[str, float],
-        scale_map_store: float,
-        site_data: dict,
-        local_file: str,
-        sat: Sat,
-        time_value: list[int],
-        input_hm: float,
-        sip_tag_time: dict,
-        region_site_names: dict[str, int],
-        new_points: dict[str, dict[str, str | float]],
-        all_select_sip_tag: list[dict],
-    ) -> list[go.Figure | None]:
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            region_site_names,
-            site_data_store,
-            relayout_data,
-            scale_map_store,
-            new_points,
-        )
-
-        colors = {}
-        for data in site_data["data"]:
-            if data["name"] is None:
-                continue
-            colors[data["name"].lower()] = data["marker"]["color"]
-
-        site_map = create_map_with_trajectories(
-            site_map,
-            local_file,
-            site_data_store,
-            site_coords,
-            sat, 
-            colors,
-            time_value,
-            input_hm,
-            sip_tag_time,
-            all_select_sip_tag,
-            None
+            State("site-data-traces-store", "data"),
+            *get_view_states(
+                "projection_value",
+                "show_names_site",
+                "site_coords",
+                "site_data_store",
+                "relayout_data",
+                "scale_map_store",
+                "local_file",
+                "sat",
+                "time_value",
+                "input_hm",
+                "sip_tag_time",
+                "region_site_names",
+                "new_points",
+                "all_select_sip_tag",
+            ),
+        ],
+        prevent_initial_call=True,
+    )
+    def delete_all_new_trajectories(
+        n1: int,
+        site_data: dict,
+        *view_states,  # читает get_view_state
+    ) -> list[go.Figure | None]:
+        render = render_views(
+            get_view_state(new_trajectories=None),
+            "new_trajectories",
+            site_data,
         )
-        return site_map, None
+        return render.site_map, None
     
     @app.callback(
         [
@@ -1354,81 +1066,45 @@ def register_callbacks(app: dash.Dash) -> None:
         Input("delete-trajectory", "n_clicks"),
         [
             State("name-trajectory-by-delete", "value"),
-            State("projection-radio", "value"),
-            State("hide-show-site", "value"),
-            State("site-coords-store", "data"),
-            State("site-data-store", "data"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
-            State("graph-site-data", "figure"),
-            State("local-file-store", "data"),
-            State("selection-satellites", "value"),
-            State("time-slider", "value"),
-            State("input-hm", "value"),
-            State("sip-tag-time-store", "data"),
-            State("region-site-names-store", "data"),
-            State("new-points-store", "data"),
+            State("site-data-traces-store", "data"),
             State("new-trajectories-store", "data"),
-            State("all-select-sip-tag", "data"),
+            *get_view_states(
+                "projection_value",
+                "show_names_site",
+                "site_coords",
+                "site_data_store",
+                "relayout_data",
+                "scale_map_store",
+                "local_file",
+                "sat",
+                "time_value",
+                "input_hm",
+                "sip_tag_time",
+                "region_site_names",
+                "new_points",
+                "all_select_sip_tag",
+            ),
         ],
         prevent_initial_call=True,
     )
     def delete_trajectory_by_name(
         n1: int,
         name_trajectory: str,
-        projection_value: ProjectionType,
-        show_names_site: bool,
-        site_coords: dict[Site, dict[Coordinate, float]],
-        site_data_store: dict[str, int],
-        relayout_data: dict[str, float],
-        scale_map_store: float,
         site_data: dict,
-        local_file: str,
-        sat: Sat,
-        time_value: list[int],
-        input_hm: float,
-        sip_tag_time: dict,
-        region_site_names: dict[str, int],
-        new_points: dict[str, dict[str, str | float]],
-        new_trajectories: dict[str, dict[str, float | str]],
-        all_select_sip_tag: list[dict],
+        new_trajectories: dict[str, dict[str, str]],
+        *view_states,  # читает get_view_state
     ) -> list[go.Figure | None]:
         if new_trajectories is not None and name_trajectory in new_trajectories.keys():
             del new_trajectories[name_trajectory]
             if len(new_trajectories) == 0:
                 new_trajectories == None
             
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            region_site_names,
-            site_data_store,
-            relayout_data,
-            scale_map_store,
-            new_points,
-        )
-
-        colors = {}
-        for data in site_data["data"]:
-            if data["name"] is None:
-                continue
-            colors[data["name"].lower()] = data["marker"]["color"]
-
-        site_map = create_map_with_trajectories(
-            site_map,
-            local_file,
-            site_data_store,
-            site_coords,
-            sat, 
-            colors,
-            time_value,
-            input_hm,
-            sip_tag_time,
-            all_select_sip_tag,
-            new_trajectories,
+        render = render_views(
+            get_view_state(new_trajectories=new_trajectories),
+            "new_trajectories",
+            site_data,
         )
-        return site_map, new_trajectories
+        return render.site_map, new_trajectories
 
     @app.callback(
         [
@@ -1469,6 +1145,8 @@ def register_callbacks(app: dash.Dash) -> None:
         if not is_open:
             if incomplete_file is not None:
                 local_file = FILE_FOLDER / (incomplete_file + ".h5")
+                import h5py
+
                 try:
                     f = h5py.File(local_file)
                     f.close
@@ -1506,6 +1184,8 @@ def register_callbacks(app: dash.Dash) -> None:
     def download_file(
         set_progress, n1: int, date: str
     ) -> list[dict[str, str] | str]:
+        import requests
+
         text = language["download_window"]["successаfuly"]
         color = "green"
         if date is None:
@@ -1626,17 +1306,17 @@ def register_callbacks(app: dash.Dash) -> None:
         | list[dict[str, str]]
     ]:
         local_file = FILE_FOLDER / filename
-        site_coords = get_sites_coords(local_file)
+        catalogue = get_file_catalogue(local_file)
+        site_coords = catalogue.site_coords
 
         site_map = create_map_with_points(
             site_coords, projection_value, show_names_site, None, None, None, None, None
         )
         site_data = create_site_data()
-        satellites = get_satellites(local_file)
-        options = [{"label": sat, "value": sat} for sat in satellites]
+        options = catalogue.satellites_options()
 
         events_options = []
-        option_data = load_data_json(Path("events.json"))
+        option_data = get_events_config()
         if option_data is None:
             events_options = dash.no_update
         else:
@@ -1724,7 +1404,7 @@ def register_callbacks(app: dash.Dash) -> None:
         input_hm: float,
         sip_tag_time: dict,
         new_points: dict[str, dict[str, str | float]],
-        new_trajectories: dict[str, dict[str, float | str]],
+        new_trajectories: dict[str, dict[str, str]],
         all_select_sip_tag: list[dict],
         input_email: str, 
     ) -> list[bool, str, html.I, dict[str, str], str]:
@@ -1758,30 +1438,11 @@ def register_callbacks(app: dash.Dash) -> None:
             "user_trajectories": new_trajectories,
             "events": all_select_sip_tag,
         }
-        file_folder_json = (FILE_FOLDER / "json")
-        file_folder_json.mkdir(parents=True, exist_ok=True)
-        
-        new_file_hash = calculate_json_hash(data_to_save)
+        # Одинаковые состояния сохраняются один раз, id - хэш состояния
+        session_id = session_store.save(slim_session(data_to_save))
         if session_id_store is None:
             session_id_store = {}
-
-            session_id = str(uuid.uuid4()) 
-            file_name = (FILE_FOLDER / "json") / f"{session_id}.json"
-            save_data_json(file_name, data_to_save)
-            session_id_store[session_id] = new_file_hash
-        else:
-            session_id_exists = False
-            for key, value in session_id_store.items():
-                if new_file_hash == value:
-                    session_id = key
-                    session_id_exists = True
-                    break
-
-            if not session_id_exists:
-                session_id = str(uuid.uuid4()) 
-                file_name = (FILE_FOLDER / "json") / f"{session_id}.json"
-                save_data_json(file_name, data_to_save)
-                session_id_store[session_id] = new_file_hash
+        session_id_store[session_id] = session_id
         
         link = f"{base_url}session_id={session_id}"
         if not is_open:
@@ -1790,6 +1451,12 @@ def register_callbacks(app: dash.Dash) -> None:
             icon = html.I(className="fas fa-check")
         return True, link, icon, session_id_store, session_id, False
 
+    def load_session(session_id: str) -> dict | None:
+        session_data = session_store.load(session_id)
+        if session_data is None:
+            return None
+        return expand_session(session_data, FILE_FOLDER)
+
     def get_base_url():
         part_url = request.host_url.split("://")
         proto = request.headers.get('X-Forwarded-Proto', request.scheme)
@@ -1799,41 +1466,82 @@ def register_callbacks(app: dash.Dash) -> None:
     @app.callback(
         [
             Output("share-window", "is_open", allow_duplicate=True),
-            Output("download-data", "data"),
+            Output("export-location", "href"),
         ],
         Input("upload-data", "n_clicks"),
         [
             State('current-session-id', 'data'),
-            State("graph-site-data", "figure"),
             State("input-email", "value"),
+            State("export-format", "value"),
         ],
         prevent_initial_call=True,
     )
     def upload_data(
         n: int,
         current_session_id: str,
-        site_data: go.Figure,
         input_email: str,
-    ) -> bool:
+        export_format: str,
+    ) -> list[bool, str]:
         if current_session_id is None:
             return False, dash.no_update
-        
-        file_name = (FILE_FOLDER / "json") / f"{current_session_id}.json"
-        session_data = load_data_json(file_name)
-
-        base_url = get_base_url()
-        session_data["email"] = input_email
-        session_data["link"] = f"{base_url}session_id={current_session_id}"
-        session_data["site_data"] = []
-        for data in site_data["data"]:
-            tmp_data = {
-                "site": data["name"].lower(),
-                "times": data["x"],
-                "data": data["customdata"],
-            }
-            session_data["site_data"].append(tmp_data)
-        json_data = json.dumps(session_data)
-        return False, dict(content=json_data, filename="spitec.json")
+        # Выгрузка отдается потоком по ссылке, см. export_session
+        query = {"format": export_format}
+        if input_email is not None:
+            query["email"] = input_email
+        href = f"{get_base_url()}{EXPORT_ROUTE}/{current_session_id}?{urlencode(query)}"
+        return False, href
+
+    @app.server.route(f"/{EXPORT_ROUTE}/<session_id>")
+    def export_session(session_id: str) -> Response:
+        """
+        Streams the data of a share session from the daily file
+        Query parameters:
+            format - h5, npz or csv
+            products - comma-separated data products, by default
+                the data type of the session
+            email - added to the export metadata
+        """
+        session_data = load_session(session_id)
+        export_format = request.args.get("format", "h5")
+        if session_data is None or session_data["file_name"] is None or \
+            session_data["site_data_store"] is None:
+            abort(404)
+        local_file = Path(session_data["file_name"])
+        if export_format not in EXPORT_FORMATS or not local_file.exists():
+            abort(404)
+        try:
+            products = parse_export_products(
+                request.args.get("products", session_data["data_type"] or "")
+            )
+        except ExportError:
+            abort(400)
+        start, end = _create_limit_xaxis(session_data["time_limit"], local_file)
+        metadata = {
+            "link": f"{get_base_url()}session_id={session_id}",
+            "email": request.args.get("email", ""),
+            "file_name": local_file.name,
+            "sat": session_data["sat"] or "",
+            "products": [product.name for product in products],
+            "time_limit": [start.isoformat(), end.isoformat()],
+        }
+        chunks = iter_export(
+            export_format,
+            local_file,
+            list(session_data["site_data_store"].keys()),
+            session_data["sat"],
+            products,
+            start,
+            end,
+            metadata,
+        )
+        return Response(
+            stream_with_context(chunks),
+            mimetype=EXPORT_FORMATS[export_format],
+            headers={
+                "Content-Disposition":
+                    f"attachment; filename=spitec-{local_file.stem}.{export_format}"
+            },
+        )
     
     app.clientside_callback(
         """
@@ -1890,72 +1598,37 @@ def register_callbacks(app: dash.Dash) -> None:
         ],
         [Input("input-hm", "value")],
         [
-            State("selection-satellites", "value"),
-            State("local-file-store", "data"),
-            State("site-data-store", "data"),
-            State("time-slider", "value"),
-            State("projection-radio", "value"),
-            State("hide-show-site", "value"),
-            State("site-coords-store", "data"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
-            State("graph-site-data", "figure"),
-            State("region-site-names-store", "data"),
-            State("sip-tag-time-store", "data"),
-            State("new-points-store", "data"),
-            State("new-trajectories-store", "data"),
-            State("all-select-sip-tag", "data"),
+            State("site-data-traces-store", "data"),
+            *get_view_states(
+                "sat",
+                "local_file",
+                "site_data_store",
+                "time_value",
+                "projection_value",
+                "show_names_site",
+                "site_coords",
+                "relayout_data",
+                "scale_map_store",
+                "region_site_names",
+                "sip_tag_time",
+                "new_points",
+                "new_trajectories",
+                "all_select_sip_tag",
+            ),
         ],
         prevent_initial_call=True,
     )
     def change_hm(
         input_hm: float,
-        sat: Sat,
-        local_file: str,
-        site_data_store: dict[str, int],
-        time_value: list[int],
-        projection_value: ProjectionType,
-        show_names_site: bool,
-        site_coords: dict[Site, dict[Coordinate, float]],
-        relayout_data: dict[str, float],
-        scale_map_store: float,
         site_data: dict,
-        region_site_names: dict[str, int],
-        sip_tag_time: dict,
-        new_points: dict[str, dict[str, str | float]],
-        new_trajectories: dict[str, dict[str, float | str]],
-        all_select_sip_tag: list[dict],
+        *view_states,  # читает get_view_state
     ) -> list[go.Figure, float]:
-        colors = {}
-        for data in site_data["data"]:
-            if data["name"] is None:
-                continue
-            colors[data["name"].lower()] = data["marker"]["color"]
-
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            region_site_names,
-            site_data_store,
-            relayout_data,
-            scale_map_store,
-            new_points,
-        )
-        site_map = create_map_with_trajectories(
-            site_map,
-            local_file,
-            site_data_store,
-            site_coords,
-            sat, 
-            colors,
-            time_value,
-            input_hm,
-            sip_tag_time,
-            all_select_sip_tag,
-            new_trajectories,
+        render = render_views(
+            get_view_state(),
+            "input_hm",
+            site_data,
         )
-        return site_map, input_hm
+        return render.site_map, input_hm
     
     @app.callback(
         [
@@ -1966,46 +1639,32 @@ def register_callbacks(app: dash.Dash) -> None:
         [Input("show-tag-sip", "n_clicks")],
         [
             State("input-sip-tag-time", "value"),
-            State("input-hm", "value"),
-            State("selection-satellites", "value"),
-            State("local-file-store", "data"),
             State("site-data-store", "data"),
-            State("time-slider", "value"),
-            State("projection-radio", "value"),
-            State("hide-show-site", "value"),
-            State("site-coords-store", "data"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
-            State("graph-site-data", "figure"),
-            State("region-site-names-store", "data"),
-            State("selection-data-types", "value"),
-            State("input-shift", "value"),
-            State("new-points-store", "data"),
-            State("new-trajectories-store", "data"),
-            State("all-select-sip-tag", "data"),
+            *get_view_states(
+                "input_hm",
+                "sat",
+                "local_file",
+                "time_value",
+                "projection_value",
+                "show_names_site",
+                "site_coords",
+                "relayout_data",
+                "scale_map_store",
+                "region_site_names",
+                "data_types",
+                "shift",
+                "new_points",
+                "new_trajectories",
+                "all_select_sip_tag",
+            ),
         ],
         prevent_initial_call=True,
     )
     def show_sip_tag(
         n: int,
         sip_tag_time: str,
-        input_hm: float,
-        sat: Sat,
-        local_file: str,
         site_data_store: dict[str, int],
-        time_value: list[int],
-        projection_value: ProjectionType,
-        show_names_site: bool,
-        site_coords: dict[Site, dict[Coordinate, float]],
-        relayout_data: dict[str, float],
-        scale_map_store: float,
-        site_data: dict,
-        region_site_names: dict[str, int],
-        data_types: str,
-        shift: float,
-        new_points: dict[str, dict[str, str | float]],
-        new_trajectories: dict[str, dict[str, float | str]],
-        all_select_sip_tag: list[dict],
+        *view_states,  # читает get_view_state
     ) -> list[go.Figure | dict]:
         sip_tag_time_dict = {
             "name": None,
@@ -2015,49 +1674,13 @@ def register_callbacks(app: dash.Dash) -> None:
             "site": "",
             "coords": []
         }
-        site_data = create_site_data_with_values(
-            site_data_store,
-            sat,
-            data_types,
-            local_file,
-            time_value,
-            shift,
-            sip_tag_time_dict,
-            all_select_sip_tag,
-        )
-
-        colors = {}
-        for data in site_data.data:
-            if data["name"] is None:
-                continue
-            colors[data.name.lower()] = data.marker.color
-
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            region_site_names,
-            site_data_store,
-            relayout_data,
-            scale_map_store,
-            new_points,
-        )
-        site_map = create_map_with_trajectories(
-            site_map,
-            local_file,
-            site_data_store,
-            site_coords,
-            sat, 
-            colors,
-            time_value,
-            input_hm,
-            sip_tag_time_dict,
-            all_select_sip_tag,
-            new_trajectories,
+        render = render_views(
+            get_view_state(sip_tag_time=sip_tag_time_dict),
+            "sip_tag_time",
         )
         if not site_data_store:
             sip_tag_time_dict = None
-        return site_map, sip_tag_time_dict, site_data
+        return render.site_map, sip_tag_time_dict, render.site_data
     
     @app.callback(
         [
@@ -2081,7 +1704,7 @@ def register_callbacks(app: dash.Dash) -> None:
             return [False, dash.no_update, None]
         
         options = []
-        option_data = load_data_json(Path("events.json"))
+        option_data = get_events_config()
         if option_data is None:
             return [dash.no_update, dash.no_update, dash.no_update]
         
@@ -2115,49 +1738,38 @@ def register_callbacks(app: dash.Dash) -> None:
         ],
         Input("dynamic-radio", "value"),
         [
-            State("selection-satellites", "value"),
             State("selection-data-types", "value"),
-            State("local-file-store", "data"),
             State("site-data-store", "data"),
-            State("time-slider", "value"),
-            State("input-shift", "value"),
-            State("sip-tag-time-store", "data"),
             State("current-select-sip-tag", "data"),
             State("all-select-sip-tag", "data"),
-            State("projection-radio", "value"),
-            State("hide-show-site", "value"),
-            State("site-coords-store", "data"),
-            State("region-site-names-store", "data"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
-            State("input-hm", "value"),
-            State("new-points-store", "data"),
-            State("new-trajectories-store", "data"),
             State("selection-events", "value"),
+            *get_view_states(
+                "sat",
+                "local_file",
+                "time_value",
+                "shift",
+                "sip_tag_time",
+                "projection_value",
+                "show_names_site",
+                "site_coords",
+                "region_site_names",
+                "relayout_data",
+                "scale_map_store",
+                "input_hm",
+                "new_points",
+                "new_trajectories",
+            ),
         ],
         prevent_initial_call=True,
     )
     def select_new_sip_tag(
         idx_geo_stucture: str,
-        sat: Sat,
         data_types: str,
-        local_file: str,
         site_data_store: dict[str, int],
-        time_value: list[int],
-        shift: float,
-        sip_tag_time: dict,
         clickData: dict[str, list[dict[str, float | str | dict]]],
         all_select_sip_tag: list[dict],
-        projection_value: ProjectionType,
-        show_names_site: bool,
-        site_coords: dict[Site, dict[Coordinate, float]],
-        region_site_names: dict[str, int],
-        relayout_data: dict[str, float],
-        scale_map_store: float,
-        input_hm: float,
-        new_points: dict[str, dict[str, str | float]],
-        new_trajectories: dict[str, dict[str, float | str]],
         event: str,
+        *view_states,  # читает get_view_state
     ) -> list[go.Figure | list[dict]]:
         if clickData is None or idx_geo_stucture is None:
             is_open = True
@@ -2170,7 +1782,7 @@ def register_callbacks(app: dash.Dash) -> None:
         if all_select_sip_tag is None:
             all_select_sip_tag = []
 
-        data = load_data_json(Path("events.json"))
+        data = get_events_config()
         geo_stucture = data[event][int(idx_geo_stucture)].copy()
         
         index = -1
@@ -2195,46 +1807,11 @@ def register_callbacks(app: dash.Dash) -> None:
         geo_stucture["site"] = list(site_data_store.keys())[point['curveNumber']]
         all_select_sip_tag.append(geo_stucture)
         
-        site_data = create_site_data_with_values(
-            site_data_store,
-            sat,
-            data_types,
-            local_file,
-            time_value,
-            shift,
-            sip_tag_time, 
-            all_select_sip_tag,
-        )
-        colors = {}
-        for data in site_data["data"]:
-            if data["name"] is None:
-                continue
-            colors[data["name"].lower()] = data["marker"]["color"]
-
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            region_site_names,
-            site_data_store,
-            relayout_data,
-            scale_map_store,
-            new_points,
+        render = render_views(
+            get_view_state(all_select_sip_tag=all_select_sip_tag),
+            "all_select_sip_tag",
         )
-        site_map = create_map_with_trajectories(
-            site_map,
-            local_file,
-            site_data_store,
-            site_coords,
-            sat, 
-            colors,
-            time_value,
-            input_hm,
-            sip_tag_time,
-            all_select_sip_tag,
-            new_trajectories,
-        )
-        return [False, site_data, site_map, all_select_sip_tag]
+        return [False, render.site_data, render.site_map, all_select_sip_tag]
     
     def change_time(point_x: str) -> str:
         x_time = point_x
@@ -2254,216 +1831,518 @@ def register_callbacks(app: dash.Dash) -> None:
         ],
         [Input("selection-satellites", "value")],
         [
+            *get_view_states(
+                "data_types",
+                "local_file",
+                "site_data_store",
+                "time_value",
+                "shift",
+                "projection_value",
+                "show_names_site",
+                "site_coords",
+                "relayout_data",
+                "scale_map_store",
+                "input_hm",
+                "region_site_names",
+                "sip_tag_time",
+                "new_points",
+                "new_trajectories",
+                "all_select_sip_tag",
+            ),
+        ],
+        prevent_initial_call=True,
+    )
+    def change_satellite(
+        sat: Sat,
+        *view_states,  # читает get_view_state
+    ) -> list[go.Figure, go.Figure, Sat]:
+        render = render_views(get_view_state(), "sat")
+        return render.site_data, render.site_map, sat
+    
+    @app.callback(
+        [
+            Output("graph-site-data", "figure", allow_duplicate=True),
+            Output("graph-site-map", "figure", allow_duplicate=True),
+            Output("event-store", "data", allow_duplicate=True),
+            Output("all-select-sip-tag", "data", allow_duplicate=True),
+        ],
+        [Input("selection-events", "value")],
+        [
+            State("event-store", "data"),
+            *get_view_states(
+                "sat",
+                "data_types",
+                "local_file",
+                "site_data_store",
+                "time_value",
+                "shift",
+                "projection_value",
+                "show_names_site",
+                "site_coords",
+                "relayout_data",
+                "scale_map_store",
+                "input_hm",
+                "region_site_names",
+                "sip_tag_time",
+                "new_points",
+                "new_trajectories",
+            ),
+        ],
+        prevent_initial_call=True,
+    )
+    def change_event(
+        event: str,
+        event_store: str,
+        *view_states,  # читает get_view_state
+    ) -> list[go.Figure, go.Figure, str, None]:
+        if event_store == event:
+            return [dash.no_update, dash.no_update, dash.no_update, dash.no_update]
+        
+        render = render_views(
+            get_view_state(all_select_sip_tag=None),
+            "all_select_sip_tag",
+        )
+        return render.site_data, render.site_map, event, None
+
+    @app.callback(
+        [
+            Output("graph-site-data", "figure", allow_duplicate=True),
+            Output("input-shift-store", "data", allow_duplicate=True),
+        ],
+        [Input("input-shift", "value")],
+        [
+            *get_view_states(
+                "data_types",
+                "local_file",
+                "site_data_store",
+                "time_value",
+                "sat",
+                "sip_tag_time",
+                "all_select_sip_tag",
+            ),
+        ],
+        prevent_initial_call=True,
+    )
+    def change_shift(
+        shift: float,
+        *view_states,  # читает get_view_state
+    ) -> list[go.Figure, float]:
+        render = render_views(get_view_state(), "shift")
+        return render.site_data, shift
+
+    @app.callback(
+        Output("graph-analysis", "figure", allow_duplicate=True),
+        [Input("build-grid-map", "n_clicks")],
+        [
+            State("grid-time-mode", "value"),
+            State("grid-statistic", "value"),
+            State("grid-step", "value"),
+            State("input-sip-tag-time", "value"),
+            State("time-slider", "value"),
+            State("input-hm", "value"),
             State("selection-data-types", "value"),
             State("local-file-store", "data"),
-            State("site-data-store", "data"),
-            State("time-slider", "value"),
-            State("input-shift", "value"),
             State("projection-radio", "value"),
-            State("hide-show-site", "value"),
-            State("site-coords-store", "data"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
-            State("input-hm", "value"),
-            State("region-site-names-store", "data"),
-            State("sip-tag-time-store", "data"),
-            State("new-points-store", "data"),
-            State("new-trajectories-store", "data"),
-            State("all-select-sip-tag", "data"),
         ],
         prevent_initial_call=True,
     )
-    def change_satellite(
-        sat: Sat,
+    def build_grid_map(
+        n: int,
+        time_mode: str,
+        statistic: str,
+        step: float,
+        epoch_time: str,
+        time_value: list[int],
+        input_hm: float,
         data_types: str,
         local_file: str,
-        site_data_store: dict[str, int],
-        time_value: list[int],
-        shift: float,
         projection_value: ProjectionType,
-        show_names_site: bool,
-        site_coords: dict[Site, dict[Coordinate, float]],
-        relayout_data: dict[str, float],
-        scale_map_store: float,
-        input_hm: float,
-        region_site_names: dict[str, int],
-        sip_tag_time: dict,
-        new_points: dict[str, dict[str, str | float]],
-        new_trajectories: dict[str, dict[str, float | str]],
-        all_select_sip_tag: list[dict],
-    ) -> list[go.Figure, go.Figure, Sat]:
-        site_data = create_site_data_with_values(
-            site_data_store,
-            sat,
-            data_types,
-            local_file,
-            time_value,
-            shift,
-            sip_tag_time,
-            all_select_sip_tag,
+    ) -> go.Figure:
+        if local_file is None or not Path(local_file).exists():
+            return create_analysis_figure()
+        if time_mode == "window" or not epoch_time:
+            start, end = _create_limit_xaxis(time_value, Path(local_file))
+        else:
+            start, end = epoch_window(local_file, epoch_time)
+        if step is None or step < GRID_STEP_MIN:
+            step = GRID_STEP_DEFAULT
+        if input_hm is None:
+            input_hm = 300
+        statistic = BinStatistic(statistic)
+        dataproduct = _define_data_type(data_types)
+
+        grid = compute_grid_map(
+            local_file, dataproduct, input_hm, start, end, statistic, step
         )
-        colors = {}
-        for data in site_data["data"]:
-            if data["name"] is None:
-                continue
-            colors[data["name"].lower()] = data["marker"]["color"]
-
-        site_map = create_map_with_points(
-            site_coords,
+        return create_grid_map(
+            grid,
+            dataproduct,
+            statistic,
             projection_value,
-            show_names_site,
-            region_site_names,
-            site_data_store,
-            relayout_data,
-            scale_map_store,
-            new_points,
-        )
-        site_map = create_map_with_trajectories(
-            site_map,
-            local_file,
-            site_data_store,
-            site_coords,
-            sat, 
-            colors,
-            time_value,
-            input_hm,
-            sip_tag_time,
-            all_select_sip_tag,
-            new_trajectories,
+            grid_map_title(dataproduct, statistic, start, end),
         )
-        return site_data, site_map, sat
-    
+
     @app.callback(
+        Output("graph-analysis", "figure", allow_duplicate=True),
+        [Input("build-animation", "n_clicks")],
         [
-            Output("graph-site-data", "figure", allow_duplicate=True),
-            Output("graph-site-map", "figure", allow_duplicate=True),
-            Output("event-store", "data", allow_duplicate=True),
-            Output("all-select-sip-tag", "data", allow_duplicate=True),
+            State("animation-step", "value"),
+            State("time-slider", "value"),
+            State("input-hm", "value"),
+            State("selection-data-types", "value"),
+            State("local-file-store", "data"),
+            State("projection-radio", "value"),
         ],
-        [Input("selection-events", "value")],
+        background=True,
+        running=[
+            (Output("build-animation", "disabled"), True, False),
+            (Output("cancel-analysis", "disabled"), False, True),
+        ],
+        cancel=Input("cancel-analysis", "n_clicks"),
+        progress=[
+            Output("analysis-progress", "value"),
+            Output("analysis-progress", "label"),
+        ],
+        prevent_initial_call=True,
+    )
+    def build_animation(
+        set_progress,
+        n: int,
+        step: float,
+        time_value: list[int],
+        input_hm: float,
+        data_types: str,
+        local_file: str,
+        projection_value: ProjectionType,
+    ) -> dict:
+        if local_file is None or not Path(local_file).exists():
+            return create_analysis_figure()
+        start, end = _create_limit_xaxis(time_value, Path(local_file))
+        if step is None:
+            step = ANIMATION_STEP_DEFAULT
+        if input_hm is None:
+            input_hm = 300
+        dataproduct = _define_data_type(data_types)
+
+        set_progress((0, ""))
+        with callback_slot("build_animation"):
+            frames = compute_animation_frames(
+                local_file,
+                dataproduct,
+                input_hm,
+                start,
+                end,
+                step,
+                progress=lambda done: set_progress((done, f"{done}%")),
+            )
+        return create_animation_map(frames, dataproduct, projection_value)
+
+    @app.callback(
+        Output("graph-analysis", "figure", allow_duplicate=True),
+        [Input("build-keogram", "n_clicks")],
         [
-            State("selection-satellites", "value"),
+            State("keogram-axis", "value"),
+            State("keogram-band-min", "value"),
+            State("keogram-band-max", "value"),
+            State("keogram-statistic", "value"),
+            State("grid-step", "value"),
+            State("time-slider", "value"),
+            State("input-hm", "value"),
             State("selection-data-types", "value"),
             State("local-file-store", "data"),
+        ],
+        background=True,
+        running=[
+            (Output("build-keogram", "disabled"), True, False),
+            (Output("cancel-analysis", "disabled"), False, True),
+        ],
+        cancel=Input("cancel-analysis", "n_clicks"),
+        progress=[
+            Output("analysis-progress", "value"),
+            Output("analysis-progress", "label"),
+        ],
+        prevent_initial_call=True,
+    )
+    def build_keogram(
+        set_progress,
+        n: int,
+        axis: str,
+        band_min: float,
+        band_max: float,
+        statistic: str,
+        step: float,
+        time_value: list[int],
+        input_hm: float,
+        data_types: str,
+        local_file: str,
+    ) -> go.Figure:
+        if local_file is None or not Path(local_file).exists():
+            return create_analysis_figure()
+        start, end = _create_limit_xaxis(time_value, Path(local_file))
+        if step is None or step < GRID_STEP_MIN:
+            step = GRID_STEP_DEFAULT
+        if input_hm is None:
+            input_hm = 300
+        band = (
+            -180 if band_min is None else band_min,
+            180 if band_max is None else band_max,
+        )
+        axis = KeogramAxis(axis)
+        statistic = BinStatistic(statistic)
+        dataproduct = _define_data_type(data_types)
+
+        set_progress((0, ""))
+        with callback_slot("build_keogram"):
+            grid = compute_keogram(
+                local_file,
+                dataproduct,
+                input_hm,
+                start,
+                end,
+                axis,
+                band,
+                step,
+                statistic,
+                progress=lambda done: set_progress((done, f"{done}%")),
+            )
+        return create_keogram(grid, dataproduct, axis, statistic)
+
+    @app.callback(
+        Output("graph-analysis", "figure", allow_duplicate=True),
+        [Input("estimate-velocity", "n_clicks")],
+        [
+            State("region-site-names-store", "data"),
             State("site-data-store", "data"),
+            State("selection-satellites", "value"),
             State("time-slider", "value"),
-            State("input-shift", "value"),
-            State("projection-radio", "value"),
-            State("hide-show-site", "value"),
-            State("site-coords-store", "data"),
-            State("relayout-map-store", "data"),
-            State("scale-map-store", "data"),
             State("input-hm", "value"),
-            State("region-site-names-store", "data"),
-            State("sip-tag-time-store", "data"),
-            State("new-points-store", "data"),
-            State("new-trajectories-store", "data"),
-            State("event-store", "data"),
+            State("selection-data-types", "value"),
+            State("local-file-store", "data"),
+        ],
+        background=True,
+        running=[
+            (Output("estimate-velocity", "disabled"), True, False),
+            (Output("cancel-analysis", "disabled"), False, True),
+        ],
+        cancel=Input("cancel-analysis", "n_clicks"),
+        progress=[
+            Output("analysis-progress", "value"),
+            Output("analysis-progress", "label"),
         ],
         prevent_initial_call=True,
     )
-    def change_event(
-        event: str,
-        sat: Sat,
-        data_types: str,
-        local_file: str,
+    def build_velocity(
+        set_progress,
+        n: int,
+        region_site_names: dict[str, int],
         site_data_store: dict[str, int],
+        sat: Sat,
         time_value: list[int],
-        shift: float,
-        projection_value: ProjectionType,
-        show_names_site: bool,
-        site_coords: dict[Site, dict[Coordinate, float]],
-        relayout_data: dict[str, float],
-        scale_map_store: float,
         input_hm: float,
-        region_site_names: dict[str, int],
-        sip_tag_time: dict,
-        new_points: dict[str, dict[str, str | float]],
-        new_trajectories: dict[str, dict[str, float | str]],
-        event_store: str,
-    ) -> list[go.Figure, go.Figure, str, None]:
-        if event_store == event:
-            return [dash.no_update, dash.no_update, dash.no_update, dash.no_update]
-        
-        site_data = create_site_data_with_values(
-            site_data_store,
-            sat,
-            data_types,
-            local_file,
-            time_value,
-            shift,
-            sip_tag_time,
-            None,
-        )
-        colors = {}
-        for data in site_data["data"]:
-            if data["name"] is None:
-                continue
-            colors[data["name"].lower()] = data["marker"]["color"]
+        data_types: str,
+        local_file: str,
+    ) -> go.Figure:
+        if local_file is None or not Path(local_file).exists() or sat is None:
+            return create_analysis_figure()
+        # Станции области, если она выбрана, иначе выбранные станции
+        sites = list(region_site_names or site_data_store or {})
+        if len(sites) < 3:
+            return create_analysis_figure()
+        start, end = _create_limit_xaxis(time_value, Path(local_file))
+        if input_hm is None:
+            input_hm = 300
+        dataproduct = _define_data_type(data_types)
+
+        set_progress((0, ""))
+        with callback_slot("build_velocity"):
+            estimate = estimate_velocity(
+                local_file,
+                sites,
+                sat,
+                dataproduct,
+                input_hm,
+                start,
+                end,
+                progress=lambda done: set_progress((done, f"{done}%")),
+            )
+        return create_velocity_figure(estimate, dataproduct)
 
-        site_map = create_map_with_points(
-            site_coords,
-            projection_value,
-            show_names_site,
-            region_site_names,
-            site_data_store,
-            relayout_data,
-            scale_map_store,
-            new_points,
+    @app.callback(
+        [
+            Output("detected-events-store", "data"),
+            Output("detected-events", "options"),
+            Output("detected-events", "value"),
+        ],
+        [Input("detect-events", "n_clicks")],
+        [State("local-file-store", "data")],
+        background=True,
+        running=[
+            (Output("detect-events", "disabled"), True, False),
+            (Output("cancel-analysis", "disabled"), False, True),
+        ],
+        cancel=Input("cancel-analysis", "n_clicks"),
+        progress=[
+            Output("analysis-progress", "value"),
+            Output("analysis-progress", "label"),
+        ],
+        prevent_initial_call=True,
+    )
+    def detect_events(
+        set_progress,
+        n: int,
+        local_file: str,
+    ) -> list[list[dict] | None]:
+        if local_file is None or not Path(local_file).exists():
+            return [None, [], None]
+        set_progress((0, ""))
+        # Индекс строится один раз на версию файла
+        events = load_event_index(local_file)
+        if events is None:
+            with callback_slot("detect_events"):
+                events = build_event_index(
+                    local_file,
+                    progress=lambda done: set_progress((done, f"{done}%")),
+                )
+        set_progress((100, ""))
+        records = list_events(events)
+        return [records, event_options(records), None]
+
+    @app.callback(
+        [
+            Output("graph-site-map", "figure", allow_duplicate=True),
+            Output("graph-site-data", "figure", allow_duplicate=True),
+            Output("time-slider", "disabled", allow_duplicate=True),
+            Output("site-data-store", "data", allow_duplicate=True),
+            Output("time-slider", "value", allow_duplicate=True),
+            Output("selection-satellites", "value", allow_duplicate=True),
+            Output("selection-data-types", "value", allow_duplicate=True),
+            Output("input-sip-tag-time", "value", allow_duplicate=True),
+        ],
+        [Input("detected-events", "value")],
+        [
+            State("detected-events-store", "data"),
+            State("site-coords-store", "data"),
+            State("site-data-store", "data"),
+            *get_view_states(
+                "local_file",
+                "projection_value",
+                "show_names_site",
+                "region_site_names",
+                "shift",
+                "relayout_data",
+                "scale_map_store",
+                "input_hm",
+                "sip_tag_time",
+                "new_points",
+                "new_trajectories",
+                "all_select_sip_tag",
+            ),
+        ],
+        prevent_initial_call=True,
+    )
+    def go_to_event(
+        idx_event: str,
+        detected_events: list[dict],
+        site_coords: dict[Site, dict[Coordinate, float]],
+        site_data_store: dict[str, int],
+        *view_states,  # читает get_view_state
+    ) -> list:
+        if idx_event is None or not detected_events or site_coords is None:
+            return [dash.no_update] * 8
+        event = detected_events[int(idx_event)]
+        if event["site"] not in site_coords:
+            return [dash.no_update] * 8
+
+        # Станция события добавляется к выбранным
+        if site_data_store is None:
+            site_data_store = {}
+        site_data_store[event["site"]] = list(site_coords.keys()).index(event["site"])
+        time_value = event_time_window(event)
+        render = render_views(
+            get_view_state(
+                site_data_store=site_data_store,
+                time_value=time_value,
+                sat=event["sat"],
+                data_types=event["product"],
+            ),
+            ("site_data_store", "time_value", "sat", "data_types"),
         )
-        site_map = create_map_with_trajectories(
-            site_map,
-            local_file,
+        return [
+            render.site_map,
+            render.site_data,
+            render.disabled,
             site_data_store,
-            site_coords,
-            sat, 
-            colors,
             time_value,
-            input_hm,
-            sip_tag_time,
-            None,
-            new_trajectories,
-        )
-        return site_data, site_map, event, None
+            event["sat"],
+            event["product"],
+            event["time"][11:],
+        ]
 
     @app.callback(
         [
             Output("graph-site-data", "figure", allow_duplicate=True),
-            Output("input-shift-store", "data", allow_duplicate=True),
+            Output("graph-site-map", "figure", allow_duplicate=True),
+            Output("all-select-sip-tag", "data", allow_duplicate=True),
         ],
-        [Input("input-shift", "value")],
+        [Input("add-event-tags", "n_clicks")],
         [
-            State("selection-data-types", "value"),
-            State("local-file-store", "data"),
+            State("detected-events", "value"),
+            State("detected-events-store", "data"),
             State("site-data-store", "data"),
-            State("time-slider", "value"),
-            State("selection-satellites", "value"),
-            State("sip-tag-time-store", "data"),
             State("all-select-sip-tag", "data"),
+            *get_view_states(
+                "sat",
+                "data_types",
+                "local_file",
+                "time_value",
+                "shift",
+                "sip_tag_time",
+                "projection_value",
+                "show_names_site",
+                "site_coords",
+                "region_site_names",
+                "relayout_data",
+                "scale_map_store",
+                "input_hm",
+                "new_points",
+                "new_trajectories",
+            ),
         ],
         prevent_initial_call=True,
     )
-    def change_shift(
-        shift: float,
-        data_types: str,
-        local_file: str,
+    def add_event_tags(
+        n: int,
+        idx_event: str,
+        detected_events: list[dict],
         site_data_store: dict[str, int],
-        time_value: list[int],
-        sat: Sat,
-        sip_tag_time: dict,
         all_select_sip_tag: list[dict],
-    ) -> list[go.Figure, float]:
-        site_data = create_site_data_with_values(
-            site_data_store,
-            sat,
-            data_types,
-            local_file,
-            time_value,
-            shift,
-            sip_tag_time,
-            all_select_sip_tag,
+        *view_states,  # читает get_view_state
+    ) -> list[go.Figure | list[dict]]:
+        if not detected_events:
+            return [dash.no_update] * 3
+        if all_select_sip_tag is None:
+            all_select_sip_tag = []
+
+        # Выбранное событие или все события выбранных станций
+        if idx_event is not None:
+            events = [detected_events[int(idx_event)]]
+        else:
+            events = [
+                event for event in detected_events
+                if site_data_store and event["site"] in site_data_store
+            ]
+        names = {tag["name"] for tag in all_select_sip_tag}
+        for event in events:
+            tag = event_sip_tag(event)
+            if tag["name"] not in names:
+                all_select_sip_tag.append(tag)
+                names.add(tag["name"])
+
+        render = render_views(
+            get_view_state(all_select_sip_tag=all_select_sip_tag),
+            "all_select_sip_tag",
         )
-        return site_data, shift
+        return [render.site_data, render.site_map, all_select_sip_tag]
 
     @app.callback(
         [
@@ -2556,7 +2435,7 @@ def register_callbacks(app: dash.Dash) -> None:
         input_hm: float,
         sip_tag_time: dict,
         new_points: dict[str, dict[str, str | float]],
-        new_trajectories: dict[str, dict[str, float | str]],
+        new_trajectories: dict[str, dict[str, str]],
         is_link: bool,
 
         projection_radio_store: str,
@@ -2570,6 +2449,7 @@ def register_callbacks(app: dash.Dash) -> None:
         all_select_sip_tag: list[dict],
     ) -> list[go.Figure | bool | list[dict[str, str]] | dict[str, str]]:
         no_update = True
+        rendered = None
 
         if is_link:
             projection_value = projection_radio_store
@@ -2582,9 +2462,11 @@ def register_callbacks(app: dash.Dash) -> None:
             input_hm = input_hm_store
         elif not is_link and pathname is not None and pathname != "/":
             is_link = True
+            no_update = False
             session_id = pathname.split("=")[1]
-            file_name = (FILE_FOLDER / "json") / f"{session_id}.json"
-            session_data = load_data_json(file_name)
+            rendered = figure_cache.get(session_id)
+        if not no_update and rendered is None:
+            session_data = load_session(session_id)
 
             projection_value = session_data["projection"]
             show_names_site = session_data["show_names_site"]
@@ -2604,32 +2486,41 @@ def register_callbacks(app: dash.Dash) -> None:
             new_points = session_data["user_points"]
             new_trajectories = session_data["user_trajectories"]
             all_select_sip_tag = session_data["events"]
-            no_update = False
-        
-        dash_update = {
-                "projection_value": projection_value,
-                "show_names_site": show_names_site,
-                "region_site_names": region_site_names,
-                "site_coords": site_coords,
-                "site_data_store": site_data_store,
-                "local_file": local_file,
-                "time_value": time_value,
-                "data_types": data_types,
-                "satellites_options": satellites_options,
-                "events_options": events_options,
-                "sat": sat,
-                "event": event,
-                "shift": shift,
-                "input_hm": input_hm,
-                "sip_tag_time": sip_tag_time,
-                "new_points": new_points,
-                "new_trajectories": new_trajectories,
-                "all_select_sip_tag": all_select_sip_tag,
-        }
 
-        satellites_options, events_options, style_traj_error, site_map, site_data, disabled, scale_map = main_update(
-            dash_update
-        )
+        if rendered is not None:
+            dash_update, update = rendered
+        else:
+            dash_update = {
+                    "projection_value": projection_value,
+                    "show_names_site": show_names_site,
+                    "region_site_names": region_site_names,
+                    "site_coords": site_coords,
+                    "site_data_store": site_data_store,
+                    "local_file": local_file,
+                    "time_value": time_value,
+                    "data_types": data_types,
+                    "satellites_options": satellites_options,
+                    "events_options": events_options,
+                    "sat": sat,
+                    "event": event,
+                    "shift": shift,
+                    "input_hm": input_hm,
+                    "sip_tag_time": sip_tag_time,
+                    "new_points": new_points,
+                    "new_trajectories": new_trajectories,
+                    "all_select_sip_tag": all_select_sip_tag,
+            }
+
+            update = main_update(dash_update)
+            if not no_update:
+                # Состояние сессии неизменно (id - хэш состояния).
+                # Фигуры хранятся словарями: их чтение быстрее, чем go.Figure
+                update = [
+                    value.to_plotly_json() if isinstance(value, go.Figure) else value
+                    for value in update
+                ]
+                figure_cache.set(session_id, (dash_update, update))
+        satellites_options, events_options, style_traj_error, site_map, site_data, disabled, scale_map = update
         return_list = [
             site_map,
             site_data, 
@@ -2668,63 +2559,42 @@ def register_callbacks(app: dash.Dash) -> None:
         else: # обновление в "share" в первую загрузку
             return_list.extend(list(dash_update.values()))
             return_list.extend([  # обновляем store
-                projection_value, 
-                show_names_site, 
-                time_value, 
-                data_types, 
-                sat, 
-                event,
-                shift, 
-                input_hm
+                dash_update["projection_value"], 
+                dash_update["show_names_site"], 
+                dash_update["time_value"], 
+                dash_update["data_types"], 
+                dash_update["sat"], 
+                dash_update["event"],
+                dash_update["shift"], 
+                dash_update["input_hm"]
             ])
             return return_list
 
     def main_update(
         dash_update: dict
     ) -> list:
-        style_traj_error = {"visibility": "hidden"}
-        site_map = create_map_with_points(
-            dash_update["site_coords"],
-            dash_update["projection_value"],
-            dash_update["show_names_site"],
-            dash_update["region_site_names"],
-            dash_update["site_data_store"],
-            None,
-            None,
-            dash_update["new_points"],
-        )
-        site_data = create_site_data_with_values(
-            dash_update["site_data_store"],
-            dash_update["sat"],
-            dash_update["data_types"],
-            dash_update["local_file"],
-            dash_update["time_value"],
-            dash_update["shift"],
-            dash_update["sip_tag_time"],
-            dash_update["all_select_sip_tag"],
-        )
-
-        colors = {}
-        for data in site_data["data"]:
-            if data["name"] is None:
-                continue
-            colors[data["name"].lower()] = data["marker"]["color"]
+        view_state = {
+            key: dash_update[key]
+            for key in [
+                "site_coords",
+                "projection_value",
+                "show_names_site",
+                "region_site_names",
+                "site_data_store",
+                "new_points",
+                "local_file",
+                "sat",
+                "data_types",
+                "time_value",
+                "shift",
+                "input_hm",
+                "sip_tag_time",
+                "all_select_sip_tag",
+                "new_trajectories",
+            ]
+        }
+        render = render_views(view_state, None)
 
-        site_map = create_map_with_trajectories(
-            site_map,
-            dash_update["local_file"],
-            dash_update["site_data_store"],
-            dash_update["site_coords"],
-            dash_update["sat"], 
-            colors,
-            dash_update["time_value"],
-            dash_update["input_hm"],
-            dash_update["sip_tag_time"],
-            dash_update["all_select_sip_tag"],
-            dash_update["new_trajectories"],
-        )
-            
-        disabled = True if len(site_data.data) == 0 else False
         if dash_update["satellites_options"] is None:
             satellites_options = []
         else:
@@ -2736,13 +2606,12 @@ def register_callbacks(app: dash.Dash) -> None:
             events_options = dash_update["events_options"]
         scale_map = 1
 
-        if site_map.layout.geo.projection.type != ProjectionType.ORTHOGRAPHIC.value and \
-        len(site_data.data) != 0:
-            style_traj_error = {
-                "margin-top": "5px",
-                "text-align": "center",
-                "fontSize": "16px",
-                "color": "red",
-            }
-            
-        return satellites_options,events_options,style_traj_error,site_map,site_data,disabled,scale_map
+        return (
+            satellites_options,
+            events_options,
+            render.trajectory_error_style,
+            render.site_map,
+            render.site_data,
+            render.disabled,
+            scale_map,
+        )
@@ -1,13 +1,41 @@
-from spitec.view.visualization import *
-from spitec.processing.data_processing import *
+import plotly.graph_objects as go
+from plotly.colors import qualitative
+from numpy.typing import NDArray
+from spitec.view.visualization import (
+    PointColor,
+    ProjectionType,
+    create_fig_for_map,
+    create_site_data,
+    create_site_map_with_points,
+    create_site_map_with_tag,
+    create_site_map_with_trajectories,
+)
+from spitec.processing.data_processing import (
+    Sat,
+    get_el_az,
+    retrieve_data_cached,
+    timestamps_to_datetimes,
+    timestamps_to_datetime64,
+)
 from spitec.processing.data_products import DataProducts
 from spitec.processing.trajectorie import Trajectorie
-from spitec.processing.site_processing import *
+from spitec.processing.trajectory_store import (
+    load_trajectory,
+    get_trajectories_folder,
+)
+from spitec.processing.site_processing import Site, Coordinate, get_namelatlon_arrays
+from spitec.processing.stage_cache import StageCache, file_version
+from spitec.processing.work_budget import decimation_step
+from spitec.view.languages import languages
 from datetime import datetime, timezone
+import copy
 import numpy as np
-import plotly.express as px
 from pathlib import Path
-import pandas as pd
+
+
+language = languages["en"]
+TRAJECTORY_CACHE_SIZE = 512
+trajectory_cache = StageCache("trajectories", TRAJECTORY_CACHE_SIZE)
 
 
 def create_map_with_points(
@@ -160,30 +188,46 @@ def _get_objs_trajectories(
         sat: Sat,
         hm: float,
     ) -> list[Trajectorie]:
-    list_trajectorie: list[Trajectorie] = []
-    _, lat_array, lon_array = get_namelatlon_arrays(site_coords)
-    
-    # Заполняем список с объектами Trajectorie
-    for name, idx in site_data_store.items():
-        traj = Trajectorie(name, sat, np.radians(lat_array[idx]), np.radians(lon_array[idx]))
-        list_trajectorie.append(traj)
-    
+    version = file_version(local_file)
+    cached_trajectories: dict[str, Trajectorie] = dict()
+    missing_names = []
+    for name in site_data_store.keys():
+        traj = trajectory_cache.get((version, name, sat, hm))
+        if traj is None:
+            missing_names.append(name)
+        else:
+            cached_trajectories[name] = traj
 
-    # Извлекаем значения el и az по станциям
-    site_names = list(site_data_store.keys())
-    site_azimuth, site_elevation, is_satellite = get_el_az(local_file, site_names, sat)
-    
-    # Добавлем долгату и широту для точек траекторий
-    for traj in list_trajectorie:
-        if not is_satellite[traj.site_name]:
-            traj.sat_exist = False
-            continue
-        traj.add_trajectory_points(
-            site_azimuth[traj.site_name][traj.sat_name][DataProducts.azimuth],
-            site_elevation[traj.site_name][traj.sat_name][DataProducts.elevation],
-            site_azimuth[traj.site_name][traj.sat_name][DataProducts.time],
-            hm
+    if len(missing_names) > 0:
+        _, lat_array, lon_array = get_namelatlon_arrays(site_coords)
+
+        # Извлекаем значения el и az по станциям
+        site_azimuth, site_elevation, is_satellite = get_el_az(
+            local_file, missing_names, sat, use_cache=True
         )
+
+        # Добавлем долгату и широту для точек траекторий
+        for name in missing_names:
+            idx = site_data_store[name]
+            traj = Trajectorie(name, sat, np.radians(lat_array[idx]), np.radians(lon_array[idx]))
+            if not is_satellite[traj.site_name]:
+                traj.sat_exist = False
+            else:
+                traj.add_trajectory_points(
+                    site_azimuth[traj.site_name][traj.sat_name][DataProducts.azimuth],
+                    site_elevation[traj.site_name][traj.sat_name][DataProducts.elevation],
+                    timestamps_to_datetimes(
+                        site_azimuth[traj.site_name][traj.sat_name][DataProducts.timestamp]
+                    ),
+                    hm
+                )
+            trajectory_cache.set((version, name, sat, hm), traj)
+            cached_trajectories[name] = traj
+
+    # Копии, т.к. индексы начала и конца меняются при каждой отрисовке
+    list_trajectorie: list[Trajectorie] = [
+        copy.copy(cached_trajectories[name]) for name in site_data_store.keys()
+    ]
     return list_trajectorie
 
 def _find_time(times: NDArray, target_time: datetime, look_more = True):
@@ -223,7 +267,7 @@ def create_map_with_trajectories(
         hm: float,
         sip_tag_time_dict: dict,
         all_select_sip_tag: list[dict],
-        new_trajectory: dict[str, dict[str, float | str]]
+        new_trajectory: dict[str, dict[str, str]]
 ) -> go.Figure:
     
     if sat is None or local_file is None or \
@@ -235,7 +279,8 @@ def create_map_with_trajectories(
     local_file_path = Path(local_file)
 
     new_trajectory_objs, new_trajectory_colors = _get_objs_new_trajectories(
-        new_trajectory
+        new_trajectory,
+        get_trajectories_folder(local_file_path.parent),
     )
     
     # Создаем список с объектом Trajectorie
@@ -293,18 +338,28 @@ def create_map_with_trajectories(
     return site_map
 
 def _get_objs_new_trajectories(
-        new_trajectory: dict[str, dict[str, float | str]]
+        new_trajectory: dict[str, dict[str, str]],
+        trajectories_folder: Path,
     ) -> list[list[Trajectorie], list[str]]:
     new_trajectory_objs = []
     new_trajectory_colors = []
     if new_trajectory is not None:
         for name, data in new_trajectory.items():
-            trajectory = Trajectorie(name, None, None, None)
-            datetime_array = pd.to_datetime(data["times"])
-            trajectory.times = np.array(datetime_array)
-            trajectory.traj_lat = np.array(data["traj_lat"], dtype=object)
-            trajectory.traj_lon = np.array(data["traj_lon"], dtype=object)
-            trajectory.traj_hm = np.array(data["traj_hm"], dtype=object)
+            if "id" in data:
+                # Массивы траектории хранятся на сервере
+                trajectory = load_trajectory(trajectories_folder, data["id"], name)
+                if trajectory is None:
+                    continue
+            else:
+                import pandas as pd
+
+                # Старый формат: траектория целиком в store
+                trajectory = Trajectorie(name, None, None, None)
+                datetime_array = pd.to_datetime(data["times"])
+                trajectory.times = np.array(datetime_array)
+                trajectory.traj_lat = np.array(data["traj_lat"], dtype=object)
+                trajectory.traj_lon = np.array(data["traj_lon"], dtype=object)
+                trajectory.traj_hm = np.array(data["traj_hm"], dtype=object)
             new_trajectory_colors.append(data["color"])
             new_trajectory_objs.append(trajectory)
     return new_trajectory_objs, new_trajectory_colors
@@ -414,7 +469,17 @@ def create_site_data_with_values(
     shift: float,
     sip_tag_time_dict: dict,
     all_select_sip_tag: list[dict],
+    max_samples: int = 0,
+    hidden_sites: int = 0,
 ) -> go.Figure:
+    """
+    Series of the selected stations
+    Parameters:
+        max_samples - samples of all the traces, above it the series
+            are decimated; 0 - without a limit
+        hidden_sites - stations left out by the work budget, shown in
+            a note on the figure
+    """
     site_data = create_site_data()
     
     if site_data_store is not None and site_data_store:
@@ -449,14 +514,16 @@ def create_site_data_with_values(
             if dataproduct in [DataProducts.dtec_2_10, DataProducts.roti, DataProducts.dtec_10_20]:
                 shift = -0.5
         # Добавляем данные        
-        _add_lines(
+        step = _add_lines(
             site_data,
             list(site_data_store.keys()),
             sat,
             dataproduct,
             local_file_path,
             shift,
+            max_samples,
         )
+        _add_budget_note(site_data, len(site_data_store), hidden_sites, step)
         if len(site_data.data) > 0:
             # Ограничиваем вывод данных по времени
             limit = _create_limit_xaxis(time_value, local_file_path) 
@@ -507,20 +574,33 @@ def _add_lines(
     dataproduct: DataProducts,
     local_file: Path,
     shift: float,
-) -> None:
+    max_samples: int = 0,
+) -> int:
+    # Возвращает шаг прореживания рядов
     # Получем все возможные цвета
-    colors = px.colors.qualitative.Plotly
+    colors = qualitative.Plotly
     # Ивлекаем данные
-    site_data_tmp, is_satellite = retrieve_data(
+    site_data_tmp, is_satellite = retrieve_data_cached(
         local_file, sites_name, sat, dataproduct
     )
+    # Все отсчеты фигуры укладываются в max_samples
+    step = decimation_step(
+        sum(
+            len(series[DataProducts.timestamp])
+            for site_series in site_data_tmp.values()
+            for series in site_series.values()
+        ),
+        max_samples,
+    )
     scatters = []
     for i, name in enumerate(sites_name):
         if sat is None or not is_satellite[name]: # Если у станции нет спутника
             sat_tmp = list(site_data_tmp[name].keys())[0]
 
-            vals = site_data_tmp[name][sat_tmp][dataproduct]
-            times = site_data_tmp[name][sat_tmp][DataProducts.time]
+            vals = site_data_tmp[name][sat_tmp][dataproduct][::step]
+            times = timestamps_to_datetime64(
+                site_data_tmp[name][sat_tmp][DataProducts.timestamp][::step]
+            )
             vals_tmp = np.zeros_like(vals)
 
             # Рисуем прямую серую линию
@@ -545,11 +625,13 @@ def _add_lines(
                 dataproduct == DataProducts.azimuth
                 or dataproduct == DataProducts.elevation
             ):
-                vals = np.degrees(site_data_tmp[name][sat][dataproduct])
+                vals = np.degrees(site_data_tmp[name][sat][dataproduct][::step])
             else:
-                vals = site_data_tmp[name][sat][dataproduct]
+                vals = site_data_tmp[name][sat][dataproduct][::step]
 
-            times = site_data_tmp[name][sat][DataProducts.time]
+            times = timestamps_to_datetime64(
+                site_data_tmp[name][sat][DataProducts.timestamp][::step]
+            )
 
             # Определяем цвет данных на графике
             idx_color = i if i < len(colors) else i - len(colors)*(i // len(colors))
@@ -577,6 +659,40 @@ def _add_lines(
         shift * (i + 1) for i in range(len(sites_name))
     ]
     site_data.layout.yaxis.ticktext = list(map(str.upper, sites_name))
+    return step
+
+
+def _add_budget_note(
+    site_data: go.Figure,
+    n_sites: int,
+    hidden_sites: int,
+    step: int,
+) -> None:
+    # Подпись о том, что запрос превысил бюджет и показан не полностью
+    notes = []
+    if hidden_sites > 0:
+        notes.append(
+            language["data-tab"]["graph-site-data"]["limited-sites"].format(
+                shown=n_sites, total=n_sites + hidden_sites
+            )
+        )
+    if step > 1:
+        notes.append(
+            language["data-tab"]["graph-site-data"]["decimated"].format(step=step)
+        )
+    if len(notes) == 0:
+        return
+    site_data.add_annotation(
+        text="; ".join(notes),
+        xref="paper",
+        yref="paper",
+        x=1,
+        y=1,
+        xanchor="right",
+        yanchor="bottom",
+        showarrow=False,
+        font=dict(color="red"),
+    )
 
 
 def _create_limit_xaxis(
@@ -0,0 +1,51 @@
+from pathlib import Path
+from typing import Any
+import diskcache
+from spitec.processing.stage_cache import STAGE_CACHES
+
+
+FIGURE_CACHE_FOLDER_NAME = "figure_cache"
+FIGURE_CACHE_TTL = 24 * 60 * 60  # сек
+FIGURE_CACHE_SIZE_LIMIT = 2**30  # байт
+
+
+class FigureCache:
+    """
+    On-disk cache of the figures rendered for share links
+    Shared by all worker processes; entries expire after ttl seconds and
+    the least recently used ones are evicted above size_limit bytes
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        ttl: float = FIGURE_CACHE_TTL,
+        size_limit: int = FIGURE_CACHE_SIZE_LIMIT,
+        name: str = "figures",
+    ) -> None:
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._cache = diskcache.Cache(
+            str(directory),
+            size_limit=size_limit,
+            eviction_policy="least-recently-used",
+        )
+        STAGE_CACHES[name] = self
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._cache.get(key, default)
+        if value is default:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._cache.set(key, value, expire=self.ttl)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
@@ -0,0 +1,115 @@
+from datetime import datetime
+import base64
+import numbers
+import numpy as np
+import plotly.graph_objects as go
+from numpy.typing import NDArray
+
+
+# Короткие массивы остаются списками: base64 для них не короче
+TYPED_ARRAY_MIN_LENGTH = 32
+# Типы typed array plotly.js (plotly.js >= 2.28)
+TYPED_ARRAY_DTYPES = {
+    np.dtype("float64"): "f8",
+    np.dtype("float32"): "f4",
+    np.dtype("int32"): "i4",
+    np.dtype("uint32"): "u4",
+    np.dtype("int16"): "i2",
+    np.dtype("uint16"): "u2",
+    np.dtype("int8"): "i1",
+    np.dtype("uint8"): "u1",
+}
+
+
+def typed_array(values: NDArray) -> dict[str, str]:
+    """
+    Numeric array in the typed array format of plotly.js: base64 of
+    the little-endian bytes. Types plotly.js does not have (int64,
+    bool) are sent as float64
+    """
+    values = np.asarray(values)
+    dtype = TYPED_ARRAY_DTYPES.get(values.dtype.newbyteorder("="))
+    if dtype is None:
+        values, dtype = values.astype(np.float64), "f8"
+    values = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder("<"))
+    return {"dtype": dtype, "bdata": base64.b64encode(values.data).decode("ascii")}
+
+
+def compact_figure(figure: go.Figure | dict | None) -> dict | None:
+    """
+    Figure for a callback response with the long numeric arrays of the
+    traces as typed arrays and the dates as epoch milliseconds on date
+    axes, so that the values are not written to JSON as text one by one
+    Figures that are already dicts (states of the client) keep their
+    lists as they are
+    """
+    if figure is None:
+        return None
+    if isinstance(figure, go.Figure):
+        figure = figure.to_plotly_json()
+    date_axes = set()
+    data = []
+    for trace in figure.get("data", []):
+        trace = dict(trace)
+        for name in ["x", "y"]:
+            dates = _dates_ms(trace.get(name))
+            if dates is not None:
+                trace[name] = typed_array(dates)
+                date_axes.add(f"{name}axis" + trace.get(f"{name}axis", name)[1:])
+        data.append(_compact_value(trace))
+
+    layout = dict(figure.get("layout", {}))
+    for axis in date_axes:
+        # Числа на оси без типа plotly.js считает линейной осью
+        layout[axis] = {**layout.get(axis, {}), "type": "date"}
+    return {**figure, "data": data, "layout": layout}
+
+
+def _compact_value(value):
+    if isinstance(value, dict):
+        return {key: _compact_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_compact_value(item) for item in value]
+    if not _is_long_array(value):
+        return value
+    if value.dtype.kind in "biuf":
+        return typed_array(value)
+    if value.dtype.kind == "O" and all(_is_number_or_gap(item) for item in value):
+        # Числа с пропусками (None), например траектории с разрывами
+        return typed_array(
+            np.array([np.nan if item is None else item for item in value], dtype=np.float64)
+        )
+    return value
+
+
+def _is_number_or_gap(item) -> bool:
+    # Строки, даже "0012", остаются строками
+    return item is None or isinstance(item, numbers.Real)
+
+
+def _dates_ms(values) -> NDArray | None:
+    # Даты массива в миллисекундах эпохи, None - в массиве не даты
+    if not _is_long_array(values) or values.dtype.kind not in "MO":
+        return None
+    if values.dtype.kind == "O" and not all(isinstance(item, datetime) for item in values):
+        return None
+    import pandas as pd
+
+    try:
+        dates = pd.DatetimeIndex(values)
+    except (TypeError, ValueError):
+        # Например, даты в разных часовых поясах
+        return None
+    if dates.tz is not None:
+        # Время на часах даты: так же, как в ISO строке, которую
+        # plotly.js показывает без учета часового пояса
+        dates = dates.tz_localize(None)
+    milliseconds = dates.as_unit("ms").asi8.astype(np.float64)
+    milliseconds[dates.isna()] = np.nan
+    return milliseconds
+
+
+def _is_long_array(value) -> bool:
+    return isinstance(value, np.ndarray) and value.ndim == 1 and \
+        len(value) >= TYPED_ARRAY_MIN_LENGTH
+
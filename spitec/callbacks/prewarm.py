@@ -0,0 +1,98 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+import gc
+import logging
+import os
+import time
+from spitec.view.visualization import (
+    create_analysis_figure,
+    create_fig_for_map,
+    create_site_data,
+    create_site_map_with_points,
+)
+from spitec.processing.data_products import DataProducts
+from spitec.processing.catalogue import get_file_catalogue, get_events_config
+from spitec.processing.event_detection import load_event_index
+from spitec.processing.pierce_points import get_network_points
+
+
+logger = logging.getLogger(__name__)
+
+# Число последних суточных файлов, прогреваемых при старте; не задано - без прогрева
+PREWARM_FILES_ENV = "SPITEC_PREWARM_FILES"
+# Продукты, для которых строится индекс сети, через запятую
+PREWARM_PRODUCTS_ENV = "SPITEC_PREWARM_PRODUCTS"
+DAILY_FILE_PATTERN = "????-??-??.h5"
+
+
+@dataclass
+class PrewarmReport:
+    files: list[str] = field(default_factory=list)
+    products: list[str] = field(default_factory=list)
+    event_indexes: int = 0
+    seconds: float = 0.0
+
+
+def recent_daily_files(data_folder: str | Path, count: int) -> list[Path]:
+    # Имена файлов - даты, поэтому последние файлы - последние по имени
+    files = sorted(Path(data_folder).glob(DAILY_FILE_PATTERN), reverse=True)
+    return files[:count]
+
+
+def prewarm(
+    data_folder: str | Path,
+    files: int = 1,
+    products: list[DataProducts] | None = None,
+    freeze: bool = True,
+) -> PrewarmReport:
+    """
+    Fills the in-process caches before the first request
+    Meant for the gunicorn master with --preload: main.py builds the
+    layout, this builds the rest, and the forked workers share all of
+    it copy-on-write
+    Parameters:
+        files - number of the most recent daily files of data_folder
+            whose catalogues and event indexes are loaded
+        products - data products whose network indexes are built
+        freeze - moves the objects out of the garbage collector, so
+            that collections in workers do not copy their pages
+    """
+    start = time.perf_counter()
+    report = PrewarmReport(products=[product.name for product in products or []])
+    # Первые фигуры plotly загружают валидаторы свойств
+    create_fig_for_map(create_site_map_with_points())
+    create_site_data()
+    create_analysis_figure()
+    get_events_config()
+
+    for local_file in recent_daily_files(data_folder, files):
+        get_file_catalogue(local_file)
+        if load_event_index(local_file) is not None:
+            report.event_indexes += 1
+        for product in products or []:
+            get_network_points(local_file, product)
+        report.files.append(local_file.name)
+
+    if freeze:
+        gc.collect()
+        gc.freeze()
+    report.seconds = time.perf_counter() - start
+    logger.info(
+        "prewarmed %s (products: %s) in %.1f s",
+        ", ".join(report.files) or "no files",
+        ", ".join(report.products) or "none",
+        report.seconds,
+    )
+    return report
+
+
+def prewarm_from_env(data_folder: str | Path) -> PrewarmReport | None:
+    # Прогрев по переменным окружения, None - прогрев не задан
+    if not os.environ.get(PREWARM_FILES_ENV):
+        return None
+    products = [
+        DataProducts[name.strip()]
+        for name in os.environ.get(PREWARM_PRODUCTS_ENV, "").split(",")
+        if name.strip()
+    ]
+    return prewarm(data_folder, int(os.environ[PREWARM_FILES_ENV]), products)
@@ -0,0 +1,315 @@
+from enum import Enum
+from pathlib import Path
+from typing import Callable, NamedTuple
+import logging
+import time
+import threading
+import plotly.graph_objects as go
+from dash import callback_context
+from dash.dependencies import State
+from dash.exceptions import PreventUpdate
+from spitec.view.visualization import ProjectionType
+from spitec.callbacks.figure import (
+    create_map_with_points,
+    create_site_data_with_values,
+    create_map_with_trajectories,
+    _define_data_type,
+)
+from spitec.callbacks.figure_encoding import compact_figure
+from spitec.processing.data_processing import estimate_read_bytes
+from spitec.processing.work_budget import WorkBudget, plan_sites
+from spitec.monitoring.metrics import render_seconds
+
+
+logger = logging.getLogger(__name__)
+
+# Сообщение о том, что траектории рисуются только в ортографической проекции
+TRAJECTORY_ERROR_HIDDEN_STYLE = {"visibility": "hidden"}
+TRAJECTORY_ERROR_STYLE = {
+    "margin-top": "5px",
+    "text-align": "center",
+    "fontSize": "16px",
+    "color": "red",
+}
+
+
+class RenderStage(Enum):
+    MAP = "map"
+    SITE_DATA = "site_data"
+
+
+# Поля состояния, от которых зависит каждый этап отрисовки.
+# Тяжелые промежуточные результаты (ряды из HDF5, траектории)
+# кэшируются внутри этапов, см. spitec.processing.stage_cache
+STAGE_INPUTS: dict[RenderStage, tuple[str]] = {
+    RenderStage.MAP: (
+        "site_coords",
+        "projection_value",
+        "show_names_site",
+        "region_site_names",
+        "site_data_store",
+        "relayout_data",
+        "scale_map_store",
+        "new_points",
+        "local_file",
+        "sat",
+        "time_value",
+        "input_hm",
+        "sip_tag_time",
+        "all_select_sip_tag",
+        "new_trajectories",
+    ),
+    RenderStage.SITE_DATA: (
+        "site_data_store",
+        "sat",
+        "data_types",
+        "local_file",
+        "time_value",
+        "shift",
+        "sip_tag_time",
+        "all_select_sip_tag",
+    ),
+}
+
+
+# Компоненты Dash, из которых собирается состояние отрисовки
+VIEW_STATE_COMPONENTS: dict[str, str] = {
+    "site-coords-store.data": "site_coords",
+    "projection-radio.value": "projection_value",
+    "hide-show-site.value": "show_names_site",
+    "region-site-names-store.data": "region_site_names",
+    "site-data-store.data": "site_data_store",
+    "relayout-map-store.data": "relayout_data",
+    "scale-map-store.data": "scale_map_store",
+    "new-points-store.data": "new_points",
+    "local-file-store.data": "local_file",
+    "selection-satellites.value": "sat",
+    "selection-data-types.value": "data_types",
+    "time-slider.value": "time_value",
+    "input-shift.value": "shift",
+    "input-hm.value": "input_hm",
+    "sip-tag-time-store.data": "sip_tag_time",
+    "all-select-sip-tag.data": "all_select_sip_tag",
+    "new-trajectories-store.data": "new_trajectories",
+}
+
+
+class RenderResult(NamedTuple):
+    site_map: dict | None
+    site_data: dict | None
+    trajectory_error_style: dict[str, str]
+    disabled: bool
+
+
+class RenderStats:
+    """
+    Response time of the render pipeline per interaction and per stage
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.timings: dict[str, list[float]] = dict()  # [count, total, max]
+
+    def add(self, name: str, seconds: float) -> None:
+        render_seconds.observe(name, seconds)
+        with self._lock:
+            timing = self.timings.setdefault(name, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {
+                name: {
+                    "count": count,
+                    "mean": total / count,
+                    "max": max_seconds,
+                }
+                for name, (count, total, max_seconds) in self.timings.items()
+            }
+
+
+render_stats = RenderStats()
+
+
+def invalidated_stages(changed: str | tuple[str] | None) -> set[RenderStage]:
+    # None - полная перерисовка (открытие ссылки)
+    if changed is None:
+        return set(RenderStage)
+    if isinstance(changed, str):
+        changed = (changed,)
+    return {
+        stage
+        for stage, inputs in STAGE_INPUTS.items()
+        if any(name in inputs for name in changed)
+    }
+
+
+def render_views(
+    view_state: dict,
+    changed: str | tuple[str] | None,
+    site_data: go.Figure | dict | None = None,
+    is_superseded: Callable[[], bool] | None = None,
+) -> RenderResult:
+    """
+    Rebuilds the figures whose inputs are affected by the changed fields
+    Parameters:
+        view_state - current values of the stores and controls,
+            keys as in STAGE_INPUTS
+        changed - name(s) of the changed state fields, None to rebuild all
+        site_data - current time-series figure, used when it does not
+            need to be rebuilt
+        is_superseded - checked between the stages, a newer request
+            of the same client drops the rest of the work (PreventUpdate)
+    """
+    stages = invalidated_stages(changed)
+    if changed is None:
+        interaction = "all"
+    elif isinstance(changed, str):
+        interaction = changed
+    else:
+        interaction = "+".join(changed)
+    start = time.perf_counter()
+    budget = WorkBudget.from_env()
+    view_state, hidden_sites = apply_work_budget(view_state, budget)
+
+    if RenderStage.SITE_DATA in stages:
+        stage_start = time.perf_counter()
+        site_data = create_site_data_with_values(
+            view_state.get("site_data_store"),
+            view_state.get("sat"),
+            view_state.get("data_types"),
+            view_state.get("local_file"),
+            view_state.get("time_value"),
+            view_state.get("shift"),
+            view_state.get("sip_tag_time"),
+            view_state.get("all_select_sip_tag"),
+            budget.max_samples,
+            hidden_sites,
+        )
+        render_stats.add(
+            f"stage:{RenderStage.SITE_DATA.value}",
+            time.perf_counter() - stage_start,
+        )
+    traces = [] if site_data is None else site_data["data"]
+    if is_superseded is not None and is_superseded():
+        raise PreventUpdate
+
+    site_map = None
+    style_traj_error = TRAJECTORY_ERROR_HIDDEN_STYLE
+    if RenderStage.MAP in stages:
+        stage_start = time.perf_counter()
+        site_map = create_map_with_points(
+            view_state.get("site_coords"),
+            view_state.get("projection_value"),
+            view_state.get("show_names_site"),
+            view_state.get("region_site_names"),
+            view_state.get("site_data_store"),
+            view_state.get("relayout_data"),
+            view_state.get("scale_map_store"),
+            view_state.get("new_points"),
+        )
+        site_map = create_map_with_trajectories(
+            site_map,
+            view_state.get("local_file"),
+            view_state.get("site_data_store"),
+            view_state.get("site_coords"),
+            view_state.get("sat"),
+            get_site_colors(traces),
+            view_state.get("time_value"),
+            view_state.get("input_hm"),
+            view_state.get("sip_tag_time"),
+            view_state.get("all_select_sip_tag"),
+            view_state.get("new_trajectories"),
+        )
+        if site_map.layout.geo.projection.type != ProjectionType.ORTHOGRAPHIC.value and \
+        len(traces) != 0:
+            style_traj_error = TRAJECTORY_ERROR_STYLE
+        render_stats.add(
+            f"stage:{RenderStage.MAP.value}", time.perf_counter() - stage_start
+        )
+
+    disabled = True if len(traces) == 0 else False
+
+    duration = time.perf_counter() - start
+    render_stats.add(interaction, duration)
+    logger.debug(
+        "render %s: stages=%s, %.3f s",
+        interaction,
+        sorted(stage.value for stage in stages),
+        duration,
+    )
+    # Фигуры уходят в ответ с массивами в виде typed array
+    return RenderResult(
+        compact_figure(site_map),
+        compact_figure(site_data) if RenderStage.SITE_DATA in stages else site_data,
+        style_traj_error,
+        disabled,
+    )
+
+
+def apply_work_budget(view_state: dict, budget: WorkBudget) -> tuple[dict, int]:
+    """
+    Leaves in the selected stations of view_state the first ones that
+    fit in the budget, the plots and trajectories are built for them only
+    Returns: the new state and the number of the stations left out
+    """
+    site_data_store = view_state.get("site_data_store")
+    local_file = view_state.get("local_file")
+    if not site_data_store or local_file is None or not Path(local_file).exists():
+        return view_state, 0
+    sites = list(site_data_store.keys())
+    read_bytes = dict()
+    if budget.max_read_bytes > 0:
+        read_bytes = estimate_read_bytes(
+            local_file,
+            sites[:budget.max_sites] if budget.max_sites > 0 else sites,
+            view_state.get("sat"),
+            _define_data_type(view_state.get("data_types")),
+        )
+    planned = plan_sites(sites, read_bytes, budget)
+    if len(planned) == len(sites):
+        return view_state, 0
+    logger.info(
+        "work budget: %d of %d sites are drawn", len(planned), len(sites)
+    )
+    view_state = dict(view_state)
+    view_state["site_data_store"] = {site: site_data_store[site] for site in planned}
+    return view_state, len(sites) - len(planned)
+
+
+def get_site_colors(traces: list) -> dict[str, str]:
+    # Цвета станций на графике данных
+    colors = {}
+    for data in traces:
+        if data["name"] is None:
+            continue
+        colors[data["name"].lower()] = data["marker"]["color"]
+    return colors
+
+
+def get_view_states(*names: str) -> list[State]:
+    """
+    States of the render state fields names, see VIEW_STATE_COMPONENTS
+    Callbacks take them as *view_states without reading them:
+    get_view_state collects them from the callback context
+    """
+    components = {name: component for component, name in VIEW_STATE_COMPONENTS.items()}
+    return [State(*components[name].rsplit(".", 1)) for name in names]
+
+
+def get_view_state(**overrides) -> dict:
+    """
+    Collects the render state from the inputs and states of the current
+    Dash callback. Values changed inside the callback are passed as
+    keyword arguments
+    """
+    values = {**callback_context.states, **callback_context.inputs}
+    view_state = {
+        name: values[component]
+        for component, name in VIEW_STATE_COMPONENTS.items()
+        if component in values
+    }
+    view_state.update(overrides)
+    return view_state
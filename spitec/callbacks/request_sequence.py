@@ -0,0 +1,80 @@
+from pathlib import Path
+import diskcache
+from spitec.monitoring.metrics import superseded_requests
+
+
+REQUEST_SEQUENCE_FOLDER_NAME = "request_sequence"
+REQUEST_SEQUENCE_TTL = 60 * 60  # сек
+# Пауза после последнего движения ползунка до запроса к серверу, мс
+SLIDER_DEBOUNCE_MS = 250
+
+# Задержка запроса в браузере: запрос уходит, только если за
+# SLIDER_DEBOUNCE_MS значение больше не менялось. Номер запроса растет
+# в пределах вкладки, client - случайный идентификатор вкладки
+DEBOUNCE_REQUEST_FUNCTION = """
+function(value) {
+    const state = window.spitecRequestSequence = window.spitecRequestSequence || {
+        client: Math.random().toString(36).slice(2) + Date.now().toString(36),
+        seq: 0,
+    };
+    const seq = ++state.seq;
+    return new Promise((resolve) => setTimeout(() => {
+        if (seq !== state.seq) {
+            resolve(window.dash_clientside.no_update);
+        } else {
+            resolve({client: state.client, seq: seq, value: value});
+        }
+    }, SLIDER_DEBOUNCE_MS));
+}
+""".replace("SLIDER_DEBOUNCE_MS", str(SLIDER_DEBOUNCE_MS))
+
+
+class RequestSequence:
+    """
+    Latest sequence numbers of the interactive requests by client
+    Shared by all worker processes: a request whose number is below the
+    latest one of its client was superseded, its work is dropped and
+    its result is not sent
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        ttl: float = REQUEST_SEQUENCE_TTL,
+    ) -> None:
+        self.ttl = ttl
+        self._cache = diskcache.Cache(str(directory))
+
+    def start(self, request: dict | None, callback: str) -> bool:
+        """
+        Registers a request, returns False if a newer one of the same
+        client has already arrived
+        Parameters:
+            request - {"client": ..., "seq": ..., "value": ...}, None for
+                requests without a number (they are never dropped)
+            callback - name of the callback for the metrics
+        """
+        if request is None or request.get("client") is None:
+            return True
+        with self._cache.transact():
+            latest = self._cache.get(request["client"], -1)
+            if request["seq"] >= latest:
+                self._cache.set(request["client"], request["seq"], expire=self.ttl)
+                return True
+        superseded_requests.inc(callback)
+        return False
+
+    def is_superseded(self, request: dict | None, callback: str) -> bool:
+        # Пришел ли более новый запрос, пока выполнялся этот
+        if request is None or request.get("client") is None:
+            return False
+        if self._cache.get(request["client"], -1) > request["seq"]:
+            superseded_requests.inc(callback)
+            return True
+        return False
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
@@ -0,0 +1,491 @@
+from contextlib import closing, contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Iterator
+import inspect
+import logging
+import os
+import sqlite3
+import threading
+import time
+import flask
+import dash
+
+
+logger = logging.getLogger(__name__)
+
+# Процессы копят приращения метрик в памяти и добавляют их в общую базу
+# (MetricsStore): /metrics любого воркера gunicorn отдает суммы по всем
+# процессам, в том числе по фоновым заданиям
+METRICS_DB_NAME = "metrics.sqlite"
+DB_TIMEOUT = 30
+# Как часто процесс обновляет свои gauge в базе, с
+GAUGE_INTERVAL = 10.0
+SECONDS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+BYTES_BUCKETS = (
+    1e3, 1e4, 1e5, 3e5, 1e6, 3e6, 1e7, 3e7, 1e8
+)
+METRICS_ROUTE = "/metrics"
+DASH_UPDATE_ROUTE = "/_dash-update-component"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label: str, buckets: tuple) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        # Приращения с последней выгрузки: [счетчики корзин, сумма, количество]
+        self._values: dict[str, list] = dict()
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float) -> None:
+        with self._lock:
+            counts, total, count = self._values.setdefault(
+                label_value, [[0] * len(self.buckets), 0.0, 0]
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[label_value] = [counts, total + value, count + 1]
+
+    def drain(self) -> list[tuple[str, str, float]]:
+        """
+        Returns: increments since the last call as (label, field, value)
+        """
+        with self._lock:
+            values, self._values = self._values, dict()
+        rows = []
+        for label_value, (counts, total, count) in values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                rows.append((label_value, f"{bound:g}", bucket_count))
+            rows.append((label_value, "sum", total))
+            rows.append((label_value, "count", count))
+        return rows
+
+    def render(self, values: dict[str, dict[str, float]]) -> list[str]:
+        # values - суммы по процессам: метка -> поле -> значение
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for label_value, fields in sorted(values.items()):
+            labels = f'{self.label}="{label_value}"'
+            for bound in self.buckets:
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bound:g}"}} '
+                    f'{fields.get(f"{bound:g}", 0):g}'
+                )
+            count = fields.get("count", 0)
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count:g}')
+            lines.append(f"{self.name}_sum{{{labels}}} {fields.get('sum', 0)}")
+            lines.append(f"{self.name}_count{{{labels}}} {count:g}")
+        return lines
+
+    def _reset(self) -> None:
+        self._values = dict()
+        self._lock = threading.Lock()
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label: str) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values: dict[str, float] = dict()  # приращения с последней выгрузки
+        self._lock = threading.Lock()
+
+    def inc(self, label_value: str, value: float = 1) -> None:
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + value
+
+    def drain(self) -> list[tuple[str, str, float]]:
+        with self._lock:
+            values, self._values = self._values, dict()
+        return [(label_value, "", value) for label_value, value in values.items()]
+
+    def render(self, values: dict[str, dict[str, float]]) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} counter",
+        ]
+        for label_value, fields in sorted(values.items()):
+            lines.append(
+                f'{self.name}{{{self.label}="{label_value}"}} {fields.get("", 0):g}'
+            )
+        return lines
+
+    def _reset(self) -> None:
+        self._values = dict()
+        self._lock = threading.Lock()
+
+
+class MetricsStore:
+    """
+    Metric values of all processes of the host in a sqlite file
+    Counters and histograms are sums of the increments added by the
+    processes; gauges are kept per process and dropped with it
+    Parameters:
+        db_file - None keeps the values in the memory of the process
+    """
+
+    def __init__(self, db_file: str | Path | None = None) -> None:
+        self.db_file = None if db_file is None else Path(db_file)
+        self._memory = None
+        self._lock = threading.Lock()
+        if self.db_file is None:
+            self._memory = sqlite3.connect(":memory:", check_same_thread=False)
+        else:
+            self.db_file.parent.mkdir(parents=True, exist_ok=True)
+            with closing(self._connect()) as connection, connection:
+                connection.execute("PRAGMA journal_mode=WAL")
+        with self._transaction() as connection:
+            # pid = 0 - сумма по процессам, иначе gauge процесса pid
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS metric_values (
+                    name TEXT NOT NULL,
+                    label TEXT NOT NULL,
+                    field TEXT NOT NULL,
+                    pid INTEGER NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (name, label, field, pid)
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_file, timeout=DB_TIMEOUT)
+        # Потеря последних приращений при сбое узла допустима
+        connection.execute("PRAGMA synchronous=OFF")
+        return connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        if self._memory is not None:
+            with self._lock, self._memory:
+                yield self._memory
+            return
+        with closing(self._connect()) as connection, connection:
+            yield connection
+
+    def add(self, rows: list[tuple[str, str, str, float]]) -> None:
+        """
+        Adds increments (name, label, field, value) to the sums
+        """
+        if len(rows) == 0:
+            return
+        with self._transaction() as connection:
+            connection.executemany(
+                """
+                INSERT INTO metric_values (name, label, field, pid, value)
+                VALUES (?, ?, ?, 0, ?)
+                ON CONFLICT (name, label, field, pid)
+                DO UPDATE SET value = value + excluded.value
+                """,
+                rows,
+            )
+
+    def set_gauges(self, pid: int, rows: list[tuple[str, str, float]]) -> None:
+        """
+        Replaces the gauges (name, label, value) of the process pid
+        """
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM metric_values WHERE pid = ?", (pid,))
+            connection.executemany(
+                "INSERT INTO metric_values VALUES (?, ?, '', ?, ?)",
+                [(name, label, pid, value) for name, label, value in rows],
+            )
+
+    def values(self) -> dict[str, dict[str, dict[str, float]]]:
+        """
+        Returns: sums of counters and histograms, name -> label -> field
+        """
+        values = dict()
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT name, label, field, value FROM metric_values WHERE pid = 0"
+            ).fetchall()
+        for name, label, field, value in rows:
+            values.setdefault(name, dict()).setdefault(label, dict())[field] = value
+        return values
+
+    def gauges(self) -> dict[str, list[tuple[str, int, float]]]:
+        """
+        Gauges of the running processes, those of finished ones are removed
+        Returns: name -> (label, pid, value)
+        """
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT name, label, pid, value FROM metric_values WHERE pid != 0"
+            ).fetchall()
+            dead = {pid for _, _, pid, _ in rows if not _process_exists(pid)}
+            connection.executemany(
+                "DELETE FROM metric_values WHERE pid = ?", [(pid,) for pid in dead]
+            )
+        gauges = dict()
+        for name, label, pid, value in sorted(rows):
+            if pid not in dead:
+                gauges.setdefault(name, []).append((label, pid, value))
+        return gauges
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+callback_seconds = Histogram(
+    "spitec_callback_seconds",
+    "Wall time of Dash callbacks",
+    "callback",
+    SECONDS_BUCKETS,
+)
+callback_response_bytes = Histogram(
+    "spitec_callback_response_bytes",
+    "Size of Dash callback responses (figures and stores)",
+    "callback",
+    BYTES_BUCKETS,
+)
+callback_errors = Counter(
+    "spitec_callback_errors_total",
+    "Dash callbacks finished with an exception",
+    "callback",
+)
+function_seconds = Histogram(
+    "spitec_function_seconds",
+    "Wall time of data functions",
+    "function",
+    SECONDS_BUCKETS,
+)
+hdf5_read_bytes = Counter(
+    "spitec_hdf5_read_bytes_total",
+    "Bytes of arrays read from HDF5 files",
+    "function",
+)
+download_bytes = Counter(
+    "spitec_download_bytes_total",
+    "Bytes of daily files downloaded",
+    "function",
+)
+superseded_requests = Counter(
+    "spitec_superseded_requests_total",
+    "Interactive requests dropped because a newer one arrived",
+    "callback",
+)
+rejected_callbacks = Counter(
+    "spitec_rejected_callbacks_total",
+    "Callbacks dropped because their concurrency limit was reached",
+    "callback",
+)
+render_seconds = Histogram(
+    "spitec_render_seconds",
+    "Render pipeline time per interaction and stage",
+    "interaction",
+    SECONDS_BUCKETS,
+)
+cache_hits = Counter("spitec_cache_hits_total", "Stage cache hits", "cache")
+cache_misses = Counter("spitec_cache_misses_total", "Stage cache misses", "cache")
+METRICS = [
+    callback_seconds,
+    callback_response_bytes,
+    callback_errors,
+    function_seconds,
+    hdf5_read_bytes,
+    download_bytes,
+    superseded_requests,
+    rejected_callbacks,
+    render_seconds,
+    cache_hits,
+    cache_misses,
+]
+
+_store = MetricsStore()
+_store_lock = threading.Lock()
+# Счетчики кэшей этапов на момент последней выгрузки: cache -> (hits, misses)
+_flushed_cache_counts: dict[str, tuple[int, int]] = dict()
+_gauges_flushed = 0.0
+# Процесс фонового задания: унаследовал контекст запроса, но after_request
+# в нем не выполняется
+_job_process = False
+
+
+def set_metrics_store(db_file: str | Path | None) -> MetricsStore:
+    """
+    Store shared by the processes started after the call (gunicorn
+    workers, background jobs); None - values of this process only
+    """
+    global _store
+    flush_metrics()
+    _store = MetricsStore(db_file)
+    return _store
+
+
+def flush_metrics(gauges: bool = False) -> None:
+    """
+    Adds the increments of this process since the last call to the store
+    Parameters:
+        gauges - also update the gauges of the process; otherwise they
+            are updated at most every GAUGE_INTERVAL seconds
+    """
+    global _gauges_flushed
+    from spitec.processing.stage_cache import STAGE_CACHES
+
+    with _store_lock:
+        for name, cache in list(STAGE_CACHES.items()):
+            hits, misses = cache.hits, cache.misses
+            last_hits, last_misses = _flushed_cache_counts.get(name, (0, 0))
+            if hits != last_hits:
+                cache_hits.inc(name, hits - last_hits)
+            if misses != last_misses:
+                cache_misses.inc(name, misses - last_misses)
+            _flushed_cache_counts[name] = (hits, misses)
+        rows = [
+            (metric.name, label, field, value)
+            for metric in METRICS
+            for label, field, value in metric.drain()
+        ]
+        try:
+            _store.add(rows)
+            if gauges or time.monotonic() - _gauges_flushed >= GAUGE_INTERVAL:
+                _gauges_flushed = time.monotonic()
+                _store.set_gauges(os.getpid(), [
+                    ("spitec_cache_entries", name, len(cache))
+                    for name, cache in sorted(STAGE_CACHES.items())
+                ])
+        except sqlite3.Error:
+            # Метрики не должны ломать запросы; приращения теряются
+            logger.warning("metrics are not saved", exc_info=True)
+
+
+def _reset_after_fork() -> None:
+    # Приращения родителя выгружает родитель; потомок считает от текущих
+    # значений счетчиков кэшей
+    global _store_lock, _job_process
+    from spitec.processing.stage_cache import STAGE_CACHES
+
+    _job_process = flask.has_request_context()
+    for metric in METRICS:
+        metric._reset()
+    _store_lock = threading.Lock()
+    _flushed_cache_counts.clear()
+    for name, cache in STAGE_CACHES.items():
+        _flushed_cache_counts[name] = (cache.hits, cache.misses)
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def timed(name: str) -> Callable:
+    # Замер времени функции; для генераторов - время всей итерации
+    def decorator(func: Callable) -> Callable:
+        if inspect.isgeneratorfunction(func):
+            @wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    yield from func(*args, **kwargs)
+                finally:
+                    _observe_function(name, time.perf_counter() - start)
+            return generator_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _observe_function(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def _observe_function(name: str, seconds: float) -> None:
+    function_seconds.observe(name, seconds)
+    # Вне запроса (фоновое задание, прогрев) процесс может завершиться
+    # в любой момент; в запросе выгрузка - после ответа
+    if _job_process or not flask.has_request_context():
+        flush_metrics()
+
+
+def instrument_callbacks(app: dash.Dash) -> None:
+    """
+    Wraps every server-side callback registered in app with a timer
+    Must be called after register_callbacks
+    """
+    for callback in app.callback_map.values():
+        func = callback.get("callback")
+        if func is None or getattr(func, "_spitec_timed", False):
+            continue
+        name = getattr(func, "__wrapped__", func).__name__
+        callback["callback"] = _time_callback(func, name)
+
+
+def _time_callback(func: Callable, name: str) -> Callable:
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if flask.has_request_context():
+            flask.g.spitec_callback = name
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except dash.exceptions.PreventUpdate:
+            raise
+        except Exception:
+            callback_errors.inc(name)
+            raise
+        finally:
+            callback_seconds.observe(name, time.perf_counter() - start)
+    wrapper._spitec_timed = True
+    return wrapper
+
+
+def register_metrics(server: flask.Flask, data_folder: str | Path | None = None) -> None:
+    """
+    Adds the /metrics route and the per-request metrics to server
+    Parameters:
+        data_folder - folder of the metrics store shared by the
+            processes, None - metrics of this process only
+    """
+    if data_folder is not None:
+        set_metrics_store(Path(data_folder) / METRICS_DB_NAME)
+
+    @server.after_request
+    def record_response_size(response: flask.Response) -> flask.Response:
+        name = flask.g.get("spitec_callback")
+        if flask.request.path.endswith(DASH_UPDATE_ROUTE) and name is not None:
+            size = response.calculate_content_length()
+            if size is not None:
+                callback_response_bytes.observe(name, size)
+        flush_metrics()
+        return response
+
+    @server.route(METRICS_ROUTE)
+    def metrics() -> flask.Response:
+        return flask.Response(
+            render_metrics(),
+            mimetype="text/plain; version=0.0.4",
+        )
+
+
+def render_metrics() -> str:
+    # Суммы по всем процессам, которые пишут в общую базу метрик
+    flush_metrics(gauges=True)
+    values = _store.values()
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render(values.get(metric.name, dict())))
+
+    gauges = _store.gauges()
+    lines.append("# HELP spitec_cache_entries Entries in stage cache")
+    lines.append("# TYPE spitec_cache_entries gauge")
+    for cache_name, pid, value in gauges.get("spitec_cache_entries", []):
+        lines.append(f'spitec_cache_entries{{cache="{cache_name}",pid="{pid}"}} {value:g}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,92 @@
+from pathlib import Path
+from typing import Callable, NamedTuple
+from datetime import datetime
+import numpy as np
+from numpy.typing import NDArray
+from spitec.processing.site_processing import Site
+from spitec.processing.data_products import DataProducts
+from spitec.processing.pierce_points import iter_pierce_points
+from spitec.monitoring.metrics import timed
+
+
+EPOCH_SECONDS = 30
+MAX_ANIMATION_FRAMES = 240
+# Точность координат (градусы) и значений в кадрах
+COORDS_DECIMALS = 2
+VALUES_DECIMALS = 3
+
+
+class AnimationFrames(NamedTuple):
+    times: NDArray  # unix time кадров
+    # Кадр i - срез offsets[i]:offsets[i + 1] массивов lat, lon, values
+    offsets: NDArray
+    lat: NDArray
+    lon: NDArray
+    values: NDArray
+
+    def frame(self, idx: int) -> tuple[NDArray, NDArray, NDArray]:
+        frame_slice = slice(self.offsets[idx], self.offsets[idx + 1])
+        return self.lat[frame_slice], self.lon[frame_slice], self.values[frame_slice]
+
+
+def frame_step(start: datetime, end: datetime, step: float) -> int:
+    # Шаг кратен эпохе и не дает больше MAX_ANIMATION_FRAMES кадров
+    duration = (end - start).total_seconds()
+    min_step = np.ceil(duration / MAX_ANIMATION_FRAMES / EPOCH_SECONDS) * EPOCH_SECONDS
+    step = np.round(step / EPOCH_SECONDS) * EPOCH_SECONDS
+    return int(max(step, min_step, EPOCH_SECONDS))
+
+
+@timed("compute_animation_frames")
+def compute_animation_frames(
+    local_file: str | Path,
+    dataproduct: DataProducts,
+    hm: float,
+    start: datetime,
+    end: datetime,
+    step: float,
+    sites: list[Site] | None = None,
+    progress: Callable[[int], None] | None = None,
+) -> AnimationFrames:
+    """
+    Pierce points of every station and satellite at the frame epochs
+    of the time window
+    Parameters:
+        hm - ionospheric maximum height (km)
+        step - time between frames in seconds, see frame_step
+        sites - stations, None for the whole network
+        progress - called with the percentage of processed stations
+    """
+    step = frame_step(start, end, step)
+    start_timestamp = start.timestamp()
+    n_frames = int((end.timestamp() - start_timestamp) // step) + 1
+
+    frames, lat, lon, values = [], [], [], []
+    points_by_site = iter_pierce_points(
+        local_file, dataproduct, hm, start, end, sites, progress
+    )
+    for points in points_by_site:
+        # В кадр попадает эпоха в начале шага
+        offset = points.times - start_timestamp
+        in_frame = (offset % step) < EPOCH_SECONDS
+        in_frame &= ~np.isnan(points.values)
+        frames.append((offset[in_frame] // step).astype(np.int64))
+        lat.append(points.lat[in_frame])
+        lon.append(points.lon[in_frame])
+        values.append(points.values[in_frame])
+
+    times = start_timestamp + step * np.arange(n_frames, dtype=np.float64)
+    if len(frames) == 0:
+        empty = np.array([])
+        offsets = np.zeros(n_frames + 1, dtype=np.int64)
+        return AnimationFrames(times, offsets, empty, empty, empty)
+    frames = np.concatenate(frames)
+    order = np.argsort(frames, kind="stable")
+    counts = np.bincount(frames, minlength=n_frames)[:n_frames]
+    return AnimationFrames(
+        times,
+        np.concatenate(([0], np.cumsum(counts))),
+        np.round(np.concatenate(lat)[order], COORDS_DECIMALS),
+        np.round(np.concatenate(lon)[order], COORDS_DECIMALS),
+        np.round(np.concatenate(values)[order].astype(np.float64), VALUES_DECIMALS),
+    )
@@ -0,0 +1,159 @@
+from enum import Enum
+from typing import NamedTuple
+import numpy as np
+from numpy.typing import NDArray
+
+
+class BinStatistic(Enum):
+    MEAN = "mean"
+    MEDIAN = "median"
+    COUNT = "count"
+    MAX = "max"
+
+
+class Grid2D(NamedTuple):
+    x_edges: NDArray
+    y_edges: NDArray
+    values: NDArray  # [y, x], NaN в пустых ячейках
+    counts: NDArray  # [y, x]
+
+    def centers(self) -> tuple[NDArray, NDArray]:
+        return (
+            (self.x_edges[:-1] + self.x_edges[1:]) / 2,
+            (self.y_edges[:-1] + self.y_edges[1:]) / 2,
+        )
+
+
+def make_edges(start: float, stop: float, step: float) -> NDArray:
+    # Границы ячеек с шагом step, последняя ячейка накрывает stop
+    n_bins = max(int(np.ceil((stop - start) / step - 1e-9)), 1)
+    return start + step * np.arange(n_bins + 1)
+
+
+def bin_indices(values: NDArray, edges: NDArray) -> NDArray:
+    """
+    Cell index of every value for uniform edges, -1 outside of the edges
+    The right edge belongs to the last cell
+    """
+    n_bins = len(edges) - 1
+    step = (edges[-1] - edges[0]) / n_bins
+    with np.errstate(invalid="ignore"):
+        idx = np.floor((values - edges[0]) / step)
+    idx = np.where(values == edges[-1], n_bins - 1, idx)
+    outside = ~((idx >= 0) & (idx < n_bins))
+    return np.where(outside, -1, idx).astype(np.int64)
+
+
+def bin_2d(
+    x: NDArray,
+    y: NDArray,
+    values: NDArray,
+    x_edges: NDArray,
+    y_edges: NDArray,
+    statistic: BinStatistic = BinStatistic.MEAN,
+) -> Grid2D:
+    """
+    Aggregates values of the (x, y) points onto a grid of uniform cells
+    Points outside of the grid and NaN values are skipped
+    Parameters:
+        x_edges, y_edges - uniform cell edges
+        statistic - mean, median, maximum or count of the values in a cell
+    """
+    if statistic is not BinStatistic.MEDIAN:
+        accumulator = GridAccumulator(x_edges, y_edges)
+        accumulator.add(x, y, values)
+        return accumulator.result(statistic)
+
+    nx = len(x_edges) - 1
+    ny = len(y_edges) - 1
+    cells, values = _cells(x, y, values, x_edges, y_edges)
+    counts = np.bincount(cells, minlength=nx * ny)
+    result = _grouped_median(cells, values, counts)
+    return Grid2D(
+        np.asarray(x_edges),
+        np.asarray(y_edges),
+        result.reshape(ny, nx),
+        counts.reshape(ny, nx),
+    )
+
+
+class GridAccumulator:
+    """
+    Aggregation of points onto a grid added in chunks (e.g. per station)
+    Memory is bounded by the grid; the median needs all points at once
+    and is not supported, see bin_2d
+    """
+
+    def __init__(self, x_edges: NDArray, y_edges: NDArray) -> None:
+        self.x_edges = np.asarray(x_edges)
+        self.y_edges = np.asarray(y_edges)
+        size = (len(x_edges) - 1) * (len(y_edges) - 1)
+        self.counts = np.zeros(size, dtype=np.int64)
+        self.sums = np.zeros(size)
+        self.maximums = np.full(size, -np.inf)
+
+    def add(self, x: NDArray, y: NDArray, values: NDArray) -> None:
+        cells, values = _cells(x, y, values, self.x_edges, self.y_edges)
+        size = len(self.counts)
+        self.counts += np.bincount(cells, minlength=size)
+        self.sums += np.bincount(cells, weights=values, minlength=size)
+        np.maximum.at(self.maximums, cells, values)
+
+    def merge(self, other: "GridAccumulator") -> None:
+        # Сложение частей сетки, набранных, например, в разных процессах
+        self.counts += other.counts
+        self.sums += other.sums
+        np.maximum(self.maximums, other.maximums, out=self.maximums)
+
+    def result(self, statistic: BinStatistic) -> Grid2D:
+        empty = self.counts == 0
+        if statistic is BinStatistic.COUNT:
+            result = self.counts.astype(np.float64)
+        elif statistic is BinStatistic.MEAN:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result = self.sums / self.counts
+        elif statistic is BinStatistic.MAX:
+            result = self.maximums.copy()
+        else:
+            raise ValueError(f"Unsupported statistic: {statistic}")
+        if statistic is not BinStatistic.COUNT:
+            result[empty] = np.nan
+        shape = (len(self.y_edges) - 1, len(self.x_edges) - 1)
+        return Grid2D(
+            self.x_edges,
+            self.y_edges,
+            result.reshape(shape),
+            self.counts.reshape(shape),
+        )
+
+
+def _cells(
+    x: NDArray,
+    y: NDArray,
+    values: NDArray,
+    x_edges: NDArray,
+    y_edges: NDArray,
+) -> tuple[NDArray, NDArray]:
+    # Номера ячеек (строка y, столбец x) точек внутри сетки и их значения
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    ix = bin_indices(x, x_edges)
+    iy = bin_indices(y, y_edges)
+    mask = (ix >= 0) & (iy >= 0) & ~np.isnan(values)
+    return iy[mask] * (len(x_edges) - 1) + ix[mask], values[mask]
+
+
+def _grouped_median(cells: NDArray, values: NDArray, counts: NDArray) -> NDArray:
+    # Сортировка по (ячейка, значение): медиана - середина группы ячейки
+    result = np.full(len(counts), np.nan)
+    if len(cells) == 0:
+        return result
+    order = np.lexsort((values, cells))
+    sorted_values = values[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    filled = counts > 0
+    lower = starts[filled] + (counts[filled] - 1) // 2
+    upper = starts[filled] + counts[filled] // 2
+    result[filled] = (sorted_values[lower] + sorted_values[upper]) / 2
+    return result
@@ -0,0 +1,60 @@
+from pathlib import Path
+from typing import NamedTuple
+from spitec.processing.site_processing import (
+    Site,
+    Coordinate,
+    get_sites_coords,
+    load_data_json,
+)
+from spitec.processing.data_processing import Sat, get_satellites
+from spitec.processing.stage_cache import StageCache, file_version
+
+
+CATALOGUE_CACHE_SIZE = 32
+catalogue_cache = StageCache("catalogue", CATALOGUE_CACHE_SIZE)
+# Описание событий (геоструктур) в рабочей папке приложения
+EVENTS_CONFIG_FILE = Path("events.json")
+events_config_cache = StageCache("events_config", 1)
+
+
+class FileCatalogue(NamedTuple):
+    site_coords: dict[Site, dict[Coordinate, float]]
+    satellites: list[Sat]
+
+    def site_indices(self, site_names: list[Site]) -> dict[Site, int]:
+        # Индексы станций на карте в порядке site_names
+        indices = {site: idx for idx, site in enumerate(self.site_coords)}
+        return {site: indices[site] for site in site_names if site in indices}
+
+    def satellites_options(self) -> list[dict[str, str]]:
+        return [{"label": sat, "value": sat} for sat in self.satellites]
+
+
+def get_file_catalogue(local_file: str | Path) -> FileCatalogue:
+    """
+    Station coordinates and satellites of a daily file
+    Read once per file version and kept in memory
+    """
+    version = file_version(local_file)
+    catalogue = catalogue_cache.get(version)
+    if catalogue is None:
+        catalogue = FileCatalogue(
+            get_sites_coords(local_file),
+            [str(sat) for sat in get_satellites(local_file)],
+        )
+        catalogue_cache.set(version, catalogue)
+    return catalogue
+
+
+def get_events_config(config_file: str | Path = EVENTS_CONFIG_FILE) -> dict | None:
+    """
+    Events and their geostructures from events.json, None without the file
+    Read once per file version; the result is shared, do not modify it
+    """
+    version = file_version(config_file)
+    config = events_config_cache.get(version)
+    if config is None:
+        config = load_data_json(config_file)
+        if config is not None:
+            events_config_cache.set(version, config)
+    return config
@@ -0,0 +1,231 @@
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Sequence
+import itertools
+import os
+import threading
+import time
+import numpy as np
+from numpy.typing import NDArray
+
+
+# Число процессов пула; не задано - по числу процессоров
+COMPUTE_WORKERS_ENV = "SPITEC_COMPUTE_WORKERS"
+# Сегменты называются по процессу-владельцу: сегменты погибших процессов
+# (отмененные задания фоновых callback) можно найти и удалить
+SEGMENT_PREFIX = "spitec_"
+SHARED_MEMORY_FOLDER = Path("/dev/shm")
+# Как часто процесс пула проверяет, жив ли создавший его процесс, с
+PARENT_POLL_INTERVAL = 0.5
+_segment_counter = itertools.count()
+
+
+class SharedArray(NamedTuple):
+    # Ссылка на массив в разделяемой памяти, передается в процесс пула
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+
+class SharedArrays:
+    """
+    Owner of shared memory segments with the input arrays of a job
+    Segments are removed when the owner is closed
+    """
+
+    def __init__(self) -> None:
+        self._segments: list[shared_memory.SharedMemory] = []
+
+    def share(self, array: NDArray) -> SharedArray:
+        array = np.ascontiguousarray(array)
+        name = f"{SEGMENT_PREFIX}{os.getpid()}_{next(_segment_counter)}"
+        segment = shared_memory.SharedMemory(name, create=True, size=max(array.nbytes, 1))
+        self._segments.append(segment)
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)
+        shared[...] = array
+        return SharedArray(segment.name, array.shape, array.dtype.str)
+
+    def close(self) -> None:
+        for segment in self._segments:
+            segment.close()
+            segment.unlink()
+        self._segments.clear()
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def remove_stale_segments() -> int:
+    """
+    Removes shared memory segments left by killed processes
+    Returns: number of removed segments
+    """
+    if not SHARED_MEMORY_FOLDER.is_dir():
+        return 0
+    removed = 0
+    for path in SHARED_MEMORY_FOLDER.glob(f"{SEGMENT_PREFIX}*"):
+        owner = path.name[len(SEGMENT_PREFIX):].split("_")[0]
+        if not owner.isdigit() or _process_exists(int(owner)):
+            continue
+        try:
+            path.unlink()
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def compute_workers() -> int:
+    if os.environ.get(COMPUTE_WORKERS_ENV):
+        return max(int(os.environ[COMPUTE_WORKERS_ENV]), 1)
+    return os.cpu_count() or 1
+
+
+# Пул создается в каждом процессе заново: пул родителя после fork не работает
+_executors: dict[int, tuple[int, ProcessPoolExecutor]] = dict()
+_executors_lock = threading.Lock()
+
+
+def get_executor(workers: int | None = None) -> ProcessPoolExecutor:
+    """
+    Process pool of the current process, created on first use
+    Parameters:
+        workers - number of processes, see compute_workers
+    """
+    workers = workers or compute_workers()
+    pid = os.getpid()
+    with _executors_lock:
+        pool_workers, executor = _executors.get(pid, (None, None))
+        if executor is None or pool_workers != workers:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+            executor = ProcessPoolExecutor(
+                max_workers=workers, initializer=_watch_parent, initargs=(pid,)
+            )
+            _executors[pid] = (workers, executor)
+        return executor
+
+
+def shutdown_executor() -> None:
+    with _executors_lock:
+        _, executor = _executors.pop(os.getpid(), (None, None))
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _watch_parent(parent_pid: int) -> None:
+    # Процесс пула завершается вместе с создавшим его процессом: задание
+    # отмененного фонового callback убивается сигналом, и пул без этого
+    # остался бы выполнять его задачи
+    def watch() -> None:
+        while os.getppid() == parent_pid:
+            time.sleep(PARENT_POLL_INTERVAL)
+        os._exit(1)
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def _attach(segment: shared_memory.SharedMemory, array: SharedArray) -> NDArray:
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)
+    view.flags.writeable = False
+    return view
+
+
+def _run_task(
+    fn: Callable[..., Any],
+    task: tuple,
+    arrays: dict[str, SharedArray],
+) -> Any:
+    # Массивы задания - представления разделяемой памяти без копирования
+    segments = {
+        name: shared_memory.SharedMemory(name=array.name)
+        for name, array in arrays.items()
+    }
+    try:
+        return fn(*task, **{
+            name: _attach(segments[name], array) for name, array in arrays.items()
+        })
+    finally:
+        for segment in segments.values():
+            segment.close()
+
+
+def map_tasks(
+    fn: Callable[..., Any],
+    tasks: Sequence[tuple],
+    arrays: dict[str, NDArray] | None = None,
+    workers: int | None = None,
+    progress: Callable[[int], None] | None = None,
+) -> list[Any]:
+    """
+    Runs fn(*task, **arrays) for every task on the process pool
+    Large input arrays are passed through shared memory instead of being
+    pickled with every task; fn must not keep references to them
+    When the job is cancelled (the calling process of a background
+    callback is killed) the pool processes exit within
+    PARENT_POLL_INTERVAL seconds
+    Parameters:
+        fn - function of the module level
+        arrays - read-only arrays shared by all tasks
+        workers - number of processes, 1 - in the calling process
+        progress - called with the percentage of finished tasks
+            when it changes
+    Returns: results in the order of the tasks
+    """
+    arrays = arrays or dict()
+    workers = workers or compute_workers()
+    results = [None] * len(tasks)
+    percent = 0
+
+    def report(done: int) -> None:
+        nonlocal percent
+        if progress is not None and int(100 * done / len(tasks)) != percent:
+            percent = int(100 * done / len(tasks))
+            progress(percent)
+
+    if workers <= 1 or len(tasks) <= 1:
+        for idx, task in enumerate(tasks):
+            results[idx] = fn(*task, **arrays)
+            report(idx + 1)
+        return results
+
+    remove_stale_segments()
+    executor = get_executor(workers)
+    with SharedArrays() as shared:
+        refs = {name: shared.share(array) for name, array in arrays.items()}
+        futures: dict[Future, int] = {
+            executor.submit(_run_task, fn, task, refs): idx
+            for idx, task in enumerate(tasks)
+        }
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[futures[future]] = future.result()
+                report(len(tasks) - len(pending))
+        except BrokenProcessPool:
+            # Процесс пула погиб: следующее задание получит новый пул
+            shutdown_executor()
+            raise
+        finally:
+            # Ошибка в задании: остальные задания не запускаются
+            for future in pending:
+                future.cancel()
+            wait(pending)
+    return results
@@ -0,0 +1,227 @@
+from pathlib import Path
+from typing import Any
+import json
+import logging
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+import numpy as np
+from numpy.typing import NDArray
+
+
+logger = logging.getLogger(__name__)
+
+# Путь Unix сокета сервера данных; не задан - файлы читаются в процессе
+DATA_SERVER_ENV = "SPITEC_DATA_SERVER"
+DATA_SERVER_TIMEOUT = 60
+# После ошибки сервер не опрашивается это время, данные читаются локально
+DATA_SERVER_RETRY_SECONDS = 30
+SHARED_MEMORY_FOLDER = Path("/dev/shm")
+_LENGTH = struct.Struct("!I")
+
+
+class DataServerError(Exception):
+    pass
+
+
+def send_message(
+    sock: socket.socket,
+    header: dict[str, Any],
+    arrays: list[NDArray] | None = None,
+) -> None:
+    # Сообщение: длина заголовка, JSON заголовок и байты массивов подряд
+    body = json.dumps(header).encode()
+    sock.sendall(_LENGTH.pack(len(body)) + body)
+    for array in arrays or []:
+        sock.sendall(memoryview(np.ascontiguousarray(array)).cast("B"))
+
+
+def receive_message(sock: socket.socket) -> dict[str, Any] | None:
+    # None - соединение закрыто до начала сообщения
+    prefix = _receive_bytes(sock, _LENGTH.size, allow_eof=True)
+    if prefix is None:
+        return None
+    (length,) = _LENGTH.unpack(prefix)
+    return json.loads(_receive_bytes(sock, length))
+
+
+def receive_array(sock: socket.socket, ref: dict[str, Any]) -> NDArray:
+    # Массив из сокета или из сегмента разделяемой памяти сервера
+    dtype = np.dtype(ref["dtype"])
+    if ref.get("shm") is not None:
+        return attach_segment(ref["shm"], ref["shape"], dtype)
+    size = int(np.prod(ref["shape"])) * dtype.itemsize
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise DataServerError("connection closed by the data server")
+        received += count
+    return np.frombuffer(buffer, dtype=dtype).reshape(ref["shape"])
+
+
+def attach_segment(name: str, shape: list[int], dtype: np.dtype) -> NDArray:
+    """
+    Read-only view of a shared memory segment of the data server
+    The mapping stays valid after the server removes the segment,
+    so the server may evict it while clients still use the array
+    """
+    if np.prod(shape) == 0:
+        return np.empty(shape, dtype=dtype)
+    try:
+        with open(SHARED_MEMORY_FOLDER / name, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except OSError as e:
+        raise DataServerError(f"shared memory segment {name}: {e}") from e
+    count = int(np.prod(shape))
+    return np.frombuffer(buffer, dtype=dtype, count=count).reshape(shape)
+
+
+def _receive_bytes(
+    sock: socket.socket,
+    size: int,
+    allow_eof: bool = False,
+) -> bytes | None:
+    chunks = []
+    received = 0
+    while received < size:
+        chunk = sock.recv(size - received)
+        if not chunk:
+            if allow_eof and received == 0:
+                return None
+            raise DataServerError("connection closed by the data server")
+        chunks.append(chunk)
+        received += len(chunk)
+    return b"".join(chunks)
+
+
+class DataClient:
+    """
+    Client of the data server (see data_server)
+    Every request opens a new connection, so the client can be shared
+    by threads and survives fork of the worker
+    """
+
+    def __init__(self, socket_path: str | Path, timeout: float = DATA_SERVER_TIMEOUT) -> None:
+        self.socket_path = str(socket_path)
+        self.timeout = timeout
+        self._failed_at: float | None = None
+
+    def available(self) -> bool:
+        return (
+            self._failed_at is None
+            or time.monotonic() - self._failed_at > DATA_SERVER_RETRY_SECONDS
+        )
+
+    def request(self, method: str, **params) -> tuple[dict[str, Any], dict[str, NDArray]]:
+        """
+        Sends a request and waits for the answer
+        Returns: result fields and arrays by name
+        Raises DataServerError when the server is unreachable or fails
+        """
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                send_message(sock, {"method": method, "params": params})
+                header = receive_message(sock)
+                if header is None:
+                    raise DataServerError("connection closed by the data server")
+                if header["ok"]:
+                    arrays = {
+                        ref["name"]: receive_array(sock, ref) for ref in header["arrays"]
+                    }
+        except (OSError, ValueError, DataServerError) as e:
+            # Сервер недоступен: запросы идут мимо него до повторной попытки
+            if self.available():
+                logger.warning("data server %s: %s", self.socket_path, e)
+            self._failed_at = time.monotonic()
+            raise DataServerError(str(e)) from e
+        if not header["ok"]:
+            # Ошибка запроса (нет файла, неверный продукт) - сервер работает
+            raise DataServerError(header["error"])
+        self._failed_at = None
+        return header["result"], arrays
+
+    def ping(self) -> bool:
+        try:
+            self.request("ping")
+        except DataServerError:
+            return False
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        return self.request("stats")[0]
+
+    def read_series(
+        self,
+        local_file: str | Path,
+        sites: list[str],
+        sat: str | None,
+        product: str,
+        start: float | None = None,
+        end: float | None = None,
+    ) -> list[tuple[str, str, bool, NDArray, NDArray]]:
+        """
+        Series of the sites as stored in the daily file
+        Parameters:
+            product - name of DataProducts
+            start, end - unix time of the window, None - whole day
+        Returns: (site, sat, is_satellite, timestamps, values) of the
+            sites that have data
+        """
+        result, arrays = self.request(
+            "series", local_file=str(local_file), sites=list(sites),
+            sat=sat, product=product, start=start, end=end,
+        )
+        return [
+            (
+                item["site"], item["sat"], item["is_satellite"],
+                arrays[f"{item['site']}/timestamps"], arrays[f"{item['site']}/values"],
+            )
+            for item in result["series"]
+        ]
+
+    def missing_series(
+        self,
+        local_file: str | Path,
+        sites: list[str],
+        sat: str | None,
+        product: str,
+    ) -> list[str]:
+        # Станции, рядов которых нет в кэше сервера
+        result, _ = self.request(
+            "missing_series", local_file=str(local_file), sites=list(sites),
+            sat=sat, product=product,
+        )
+        return result["sites"]
+
+    def network_points(self, local_file: str | Path, product: str) -> dict[str, Any]:
+        # Поля NetworkPoints; большие массивы - сегменты разделяемой памяти
+        result, arrays = self.request(
+            "network_points", local_file=str(local_file), product=product
+        )
+        return {**result, **arrays}
+
+
+_clients: dict[str, DataClient] = dict()
+_clients_lock = threading.Lock()
+
+
+def get_data_client() -> DataClient | None:
+    """
+    Client of the data server set by SPITEC_DATA_SERVER
+    Returns None when the server is not configured or was unreachable
+    recently; callers then read the files themselves
+    """
+    socket_path = os.environ.get(DATA_SERVER_ENV)
+    if not socket_path:
+        return None
+    with _clients_lock:
+        client = _clients.setdefault(socket_path, DataClient(socket_path))
+    return client if client.available() else None
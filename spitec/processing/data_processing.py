@@ -1,64 +1,295 @@
-import h5py
 from pathlib import Path
+from typing import NamedTuple
 from datetime import datetime, timezone
 import numpy as np
 from numpy.typing import NDArray
 from spitec.processing.site_processing import Site 
 from spitec.processing.data_products import DataProduct, DataProducts
+from spitec.processing.stage_cache import StageCache, file_version
+from spitec.processing.data_client import get_data_client, DataServerError
+from spitec.processing.shared_cache import SharedArrayCache, get_shared_cache
+from spitec.monitoring.metrics import timed, hdf5_read_bytes
+
+
+SERIES_CACHE_SIZE = 2048
+series_cache = StageCache("series", SERIES_CACHE_SIZE)
 
 
 class Sat(str):
     pass
 
 
+class SiteSeries(NamedTuple):
+    sat: Sat  # спутник ряда: запрошенный или первый спутник станции
+    is_satellite: bool  # запрошенный спутник есть у станции
+    timestamps: NDArray
+    values: NDArray
+
+
+def read_series(
+    local_file: str | Path,
+    sites: list[Site],
+    sat: Sat,
+    dataproduct: DataProducts,
+) -> dict[Site, SiteSeries]:
+    import h5py
+
+    # Ряды станций как они хранятся в файле; станций без данных нет в ответе
+    series = dict()
+    read_bytes = 0
+    with h5py.File(local_file, "r") as f:
+        for site in sites:
+            if not site in f:
+                continue
+            satellites = list(f[site].keys())
+            if sat is None or sat not in satellites:
+                sat_tmp, is_satellite = satellites[0], False
+            else:
+                sat_tmp, is_satellite = sat, True
+            group = f[site][sat_tmp]
+            timestamps = group[DataProducts.timestamp.hdf_name][:]
+            values = group[dataproduct.hdf_name][:]
+            series[site] = SiteSeries(Sat(sat_tmp), is_satellite, timestamps, values)
+            read_bytes += timestamps.nbytes + values.nbytes
+    hdf5_read_bytes.inc("retrieve_data", read_bytes)
+    return series
+
+
+def series_to_data(
+    series: dict[Site, SiteSeries],
+    dataproduct: DataProducts,
+) -> list[dict[Site, dict[Sat, dict[DataProduct, NDArray]]], dict[str, bool]]:
+    # Время остается массивом секунд эпохи (DataProducts.timestamp), как в
+    # файле и в общем кэше; в даты переводится при построении графиков
+    data = dict()
+    is_satellite = dict()
+    for site, site_series in series.items():
+        data[site] = {
+            site_series.sat: {
+                DataProducts.timestamp: site_series.timestamps,
+                dataproduct: site_series.values,
+            }
+        }
+        is_satellite[site] = site_series.is_satellite
+    return data, is_satellite
+
+
+def timestamps_to_datetimes(timestamps: NDArray) -> NDArray:
+    # Объекты datetime в UTC, например для траекторий
+    return np.array([datetime.fromtimestamp(t, timezone.utc) for t in timestamps])
+
+
+def timestamps_to_datetime64(timestamps: NDArray) -> NDArray:
+    # Время UTC как datetime64 с точностью до мс, без объектов на отсчет
+    milliseconds = np.round(np.asarray(timestamps, dtype=np.float64) * 1000)
+    return milliseconds.astype(np.int64).astype("datetime64[ms]")
+
+
+@timed("retrieve_data")
 def retrieve_data(
     local_file: str | Path,
     sites: list[Site],
     sat: Sat,
     dataproduct: DataProducts,
 ) -> list[dict[Site, dict[Sat, dict[DataProduct, NDArray]]], dict[str, bool]]:
-    f = h5py.File(local_file)
+    return series_to_data(
+        read_series(local_file, sites, sat, dataproduct), dataproduct
+    )
+
+
+def retrieve_data_cached(
+    local_file: str | Path,
+    sites: list[Site],
+    sat: Sat,
+    dataproduct: DataProducts,
+) -> list[dict[Site, dict[Sat, dict[DataProduct, NDArray]]], dict[str, bool]]:
+    # То же, что retrieve_data, но ряды каждой станции кэшируются: в общем
+    # кэше узла, если он задан, на сервере данных, если задан он, иначе в
+    # кэше процесса. Ряды общего кэша и сервера в кэше процесса не хранятся,
+    # иначе их копии множились бы по числу процессов
+    cache = get_shared_cache()
+    if cache is not None:
+        series = _read_series_shared(cache, local_file, sites, sat, dataproduct)
+        return series_to_data(
+            {site: series[site] for site in sites if site in series}, dataproduct
+        )
+    if get_data_client() is not None:
+        series = _fetch_series(local_file, sites, sat, dataproduct)
+        return series_to_data(
+            {site: series[site] for site in sites if site in series}, dataproduct
+        )
+    version = file_version(local_file)
     data = dict()
     is_satellite = dict()
+    missing_sites = []
     for site in sites:
-        if not site in f:
+        cached = series_cache.get((version, site, sat, dataproduct.name))
+        if cached is None:
+            missing_sites.append(site)
             continue
-        data[site] = dict()
-        satellites = list(f[site].keys())
-        sat_tmp = sat
-        if sat is None or sat not in satellites:
-            sat_tmp = satellites[0]
-            is_satellite[site] = False
-        else:
-            is_satellite[site] = True
-        timestamps = f[site][sat_tmp][DataProducts.timestamp.hdf_name][:]
-        times = [datetime.fromtimestamp(t, timezone.utc) for t in timestamps]
-        data[site][sat_tmp] = {DataProducts.time: np.array(times)}
-        data[site][sat_tmp][dataproduct] = f[site][sat_tmp][
-            dataproduct.hdf_name
-        ][:]
-    f.close()
+        _add_cached_site(data, is_satellite, site, cached)
+
+    if len(missing_sites) > 0:
+        new_data, new_is_satellite = series_to_data(
+            _fetch_series(local_file, missing_sites, sat, dataproduct),
+            dataproduct,
+        )
+        for site in missing_sites:
+            # (None, None) - станции нет в файле
+            cached = (new_data.get(site), new_is_satellite.get(site))
+            series_cache.set((version, site, sat, dataproduct.name), cached)
+            _add_cached_site(data, is_satellite, site, cached)
+
+    # Сохраняем порядок станций как в retrieve_data
+    data = {site: data[site] for site in sites if site in data}
     return data, is_satellite
 
 
+def estimate_read_bytes(
+    local_file: str | Path,
+    sites: list[Site],
+    sat: Sat,
+    dataproduct: DataProducts,
+) -> dict[Site, int]:
+    """
+    Bytes retrieve_data_cached would read for every station of sites
+    Only the sizes of the datasets are read; cached stations and
+    stations without data are not in the result
+    """
+    version = file_version(local_file)
+    cache = get_shared_cache()
+    client = get_data_client()
+    if cache is None and client is not None:
+        try:
+            missing_sites = client.missing_series(local_file, sites, sat, dataproduct.name)
+        except DataServerError:
+            missing_sites = list(sites)
+    else:
+        if cache is None:
+            cache = series_cache
+        missing_sites = [
+            site for site in sites
+            if (version, site, sat, dataproduct.name) not in cache
+        ]
+    if len(missing_sites) == 0:
+        return dict()
+    import h5py
+
+    read_bytes = dict()
+    with h5py.File(local_file, "r") as f:
+        for site in missing_sites:
+            if not site in f:
+                continue
+            satellites = list(f[site].keys())
+            group = f[site][sat if sat in satellites else satellites[0]]
+            read_bytes[site] = (
+                group[DataProducts.timestamp.hdf_name].nbytes
+                + group[dataproduct.hdf_name].nbytes
+            )
+    return read_bytes
+
+
+def _read_series_shared(
+    cache: SharedArrayCache,
+    local_file: str | Path,
+    sites: list[Site],
+    sat: Sat,
+    dataproduct: DataProducts,
+) -> dict[Site, SiteSeries]:
+    # Ряды из общего кэша узла; недостающие читаются и кладутся в него
+    # одной пачкой, чтобы другие процессы их не читали
+    version = file_version(local_file)
+    keys = {site: (version, site, sat, dataproduct.name) for site in sites}
+    entries = cache.get_many(list(keys.values()))
+    series = dict()
+    missing_sites = []
+    for site in sites:
+        entry = entries.get(keys[site])
+        if entry is None:
+            missing_sites.append(site)
+        elif entry[0]["sat"] is not None:
+            series[site] = _shared_site_series(*entry)
+    if len(missing_sites) > 0:
+        new_series = _fetch_series(local_file, missing_sites, sat, dataproduct)
+        items = []
+        for site in missing_sites:
+            site_series = new_series.get(site)
+            # Станции нет в файле: запись без массивов
+            meta = {"sat": None, "is_satellite": None}
+            arrays = dict()
+            if site_series is not None:
+                meta = {"sat": site_series.sat, "is_satellite": site_series.is_satellite}
+                arrays = {"timestamps": site_series.timestamps, "values": site_series.values}
+            items.append((keys[site], meta, arrays))
+        for site, entry in zip(missing_sites, cache.set_many(items)):
+            if entry[0]["sat"] is not None:
+                series[site] = _shared_site_series(*entry)
+    return series
+
+
+def _shared_site_series(meta: dict, arrays: dict[str, NDArray]) -> SiteSeries:
+    return SiteSeries(
+        Sat(meta["sat"]), meta["is_satellite"], arrays["timestamps"], arrays["values"]
+    )
+
+
+def _fetch_series(
+    local_file: str | Path,
+    sites: list[Site],
+    sat: Sat,
+    dataproduct: DataProducts,
+) -> dict[Site, SiteSeries]:
+    # Через сервер данных, если он задан; иначе или при его ошибке - из файла
+    client = get_data_client()
+    if client is not None:
+        try:
+            return {
+                Site(site): SiteSeries(Sat(site_sat), is_satellite, timestamps, values)
+                for site, site_sat, is_satellite, timestamps, values in client.read_series(
+                    local_file, sites, sat, dataproduct.name
+                )
+            }
+        except DataServerError:
+            pass
+    return read_series(local_file, sites, sat, dataproduct)
+
+
+def _add_cached_site(
+    data: dict[Site, dict[Sat, dict[DataProduct, NDArray]]],
+    is_satellite: dict[str, bool],
+    site: Site,
+    cached: tuple[dict | None, bool | None],
+) -> None:
+    site_data, site_is_satellite = cached
+    if site_data is None:
+        return
+    data[site] = site_data
+    is_satellite[site] = site_is_satellite
+
+
+@timed("get_el_az")
 def get_el_az(
         local_file: str,
         site_names: list[Site],
-        sat
+        sat,
+        use_cache: bool = False,
     ) -> list[dict, dict, dict[str, bool]]:
     dataproduct_az = DataProducts.azimuth
     dataproduct_el = DataProducts.elevation
+    retrieve = retrieve_data_cached if use_cache else retrieve_data
 
-    site_azimuth, is_satellite = retrieve_data(
+    site_azimuth, is_satellite = retrieve(
         local_file, site_names, sat, dataproduct_az
     )
-    site_elevation, _ = retrieve_data(
+    site_elevation, _ = retrieve(
         local_file, site_names, sat, dataproduct_el
     )
     return site_azimuth, site_elevation, is_satellite
 
 
 def get_satellites(local_file: str | Path) -> NDArray:
+    import h5py
+
     satellites = []
     f = h5py.File(local_file)
     for site in f:
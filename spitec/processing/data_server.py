@@ -0,0 +1,304 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable
+import argparse
+import logging
+import os
+import signal
+import socketserver
+import sys
+import threading
+import numpy as np
+from numpy.typing import NDArray
+from spitec.processing.data_processing import (
+    SiteSeries,
+    Sat,
+    read_series,
+    SERIES_CACHE_SIZE,
+)
+from spitec.processing.data_products import DataProducts
+from spitec.processing.pierce_points import (
+    NetworkPoints,
+    read_network_points,
+    NETWORK_CACHE_SIZE,
+    NETWORK_ARRAYS,
+)
+from spitec.processing.stage_cache import StageCache, STAGE_CACHES, file_version
+from spitec.processing.compute_executor import SharedArrays, remove_stale_segments
+from spitec.processing.data_client import (
+    SHARED_MEMORY_FOLDER,
+    DataServerError,
+    send_message,
+    receive_message,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Сервер один на все процессы gunicorn, поэтому кэши больше, чем в процессе
+SERVER_SERIES_CACHE_SIZE = 4 * SERIES_CACHE_SIZE
+SERVER_NETWORK_CACHE_SIZE = 2 * NETWORK_CACHE_SIZE
+
+raw_series_cache = StageCache("server_series", SERVER_SERIES_CACHE_SIZE)
+
+
+class SharedNetworkCache:
+    """
+    LRU of NetworkPoints placed in shared memory
+    Segments of evicted entries are removed; clients that attached them
+    keep their mappings
+    """
+
+    def __init__(self, maxsize: int, use_shared_memory: bool = True) -> None:
+        self.maxsize = maxsize
+        self.use_shared_memory = use_shared_memory
+        self._data: OrderedDict[Hashable, tuple[NetworkPoints, dict, SharedArrays]] = OrderedDict()
+        self._lock = threading.Lock()
+        # Один индекс сети читается одним потоком, остальные ждут его
+        self._build_lock = threading.Lock()
+
+    def get(
+        self,
+        local_file: Path,
+        product: DataProducts,
+    ) -> tuple[NetworkPoints, dict[str, str | None]]:
+        key = (file_version(local_file), product.name)
+        entry = self._lookup(key)
+        if entry is None:
+            with self._build_lock:
+                entry = self._lookup(key)
+                if entry is None:
+                    entry = self._share(read_network_points(local_file, product))
+                    self._insert(key, entry)
+        points, segments, _ = entry
+        return points, segments
+
+    def _lookup(self, key: Hashable) -> tuple | None:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def _share(self, points: NetworkPoints) -> tuple:
+        owner = SharedArrays()
+        segments = dict.fromkeys(NETWORK_ARRAYS)
+        if self.use_shared_memory:
+            for name in NETWORK_ARRAYS:
+                segments[name] = owner.share(getattr(points, name)).name
+        return points, segments, owner
+
+    def _insert(self, key: Hashable, entry: tuple) -> None:
+        with self._lock:
+            self._data[key] = entry
+            while len(self._data) > self.maxsize:
+                _, (_, _, owner) = self._data.popitem(last=False)
+                owner.close()
+
+    def clear(self) -> None:
+        with self._lock:
+            for _, _, owner in self._data.values():
+                owner.close()
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class DataServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Local data server shared by the Dash workers
+    Owns the daily files of data_folder and the caches of raw series and
+    network indexes, so that a file is read once for all workers
+    Requests and answers are described in data_client
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str | Path, data_folder: str | Path) -> None:
+        self.socket_path = Path(socket_path)
+        self.data_folder = Path(data_folder).resolve()
+        self.network_cache = SharedNetworkCache(
+            SERVER_NETWORK_CACHE_SIZE, SHARED_MEMORY_FOLDER.is_dir()
+        )
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        super().__init__(str(self.socket_path), DataRequestHandler)
+        os.chmod(self.socket_path, 0o660)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.network_cache.clear()
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+
+    def daily_file(self, local_file: str) -> Path:
+        # Сервер отдает только файлы своей папки с данными
+        path = Path(local_file).resolve()
+        if not path.is_relative_to(self.data_folder) or not path.is_file():
+            raise DataServerError(f"unknown file {local_file}")
+        return path
+
+    def handle_request_message(
+        self,
+        method: str,
+        params: dict[str, Any],
+    ) -> tuple[dict[str, Any], list[tuple[str, NDArray, str | None]]]:
+        # Возвращает поля ответа и массивы: (имя, массив, сегмент или None)
+        if method == "ping":
+            return {"pid": os.getpid()}, []
+        if method == "stats":
+            return {
+                name: {"hits": cache.hits, "misses": cache.misses, "size": len(cache)}
+                for name, cache in STAGE_CACHES.items()
+            } | {"shared_networks": len(self.network_cache)}, []
+        if method == "series":
+            return self.series(**params)
+        if method == "missing_series":
+            return self.missing_series(**params)
+        if method == "network_points":
+            return self.network_points(**params)
+        raise DataServerError(f"unknown method {method}")
+
+    def series(
+        self,
+        local_file: str,
+        sites: list[str],
+        sat: str | None,
+        product: str,
+        start: float | None = None,
+        end: float | None = None,
+    ) -> tuple[dict[str, Any], list[tuple[str, NDArray, None]]]:
+        path = self.daily_file(local_file)
+        dataproduct = DataProducts[product]
+        sat = Sat(sat) if sat is not None else None
+        version = file_version(path)
+        series: dict[str, SiteSeries | None] = dict()
+        missing_sites = []
+        for site in sites:
+            cached = raw_series_cache.get((version, site, sat, product), False)
+            if cached is False:
+                missing_sites.append(site)
+            else:
+                series[site] = cached
+        if len(missing_sites) > 0:
+            new_series = read_series(path, missing_sites, sat, dataproduct)
+            for site in missing_sites:
+                # None - станции нет в файле
+                series[site] = new_series.get(site)
+                raw_series_cache.set((version, site, sat, product), series[site])
+
+        items, arrays = [], []
+        for site in sites:
+            site_series = series[site]
+            if site_series is None:
+                continue
+            window = slice(None)
+            if start is not None or end is not None:
+                window = slice(
+                    np.searchsorted(
+                        site_series.timestamps, -np.inf if start is None else start, side="left"
+                    ),
+                    np.searchsorted(
+                        site_series.timestamps, np.inf if end is None else end, side="right"
+                    ),
+                )
+            items.append({
+                "site": site,
+                "sat": site_series.sat,
+                "is_satellite": site_series.is_satellite,
+            })
+            arrays.append((f"{site}/timestamps", site_series.timestamps[window], None))
+            arrays.append((f"{site}/values", site_series.values[window], None))
+        return {"series": items}, arrays
+
+    def missing_series(
+        self,
+        local_file: str,
+        sites: list[str],
+        sat: str | None,
+        product: str,
+    ) -> tuple[dict[str, Any], list]:
+        version = file_version(self.daily_file(local_file))
+        missing_sites = [
+            site for site in sites if (version, site, sat, product) not in raw_series_cache
+        ]
+        return {"sites": missing_sites}, []
+
+    def network_points(
+        self,
+        local_file: str,
+        product: str,
+    ) -> tuple[dict[str, Any], list[tuple[str, NDArray, str | None]]]:
+        points, segments = self.network_cache.get(
+            self.daily_file(local_file), DataProducts[product]
+        )
+        result = {
+            "site_names": list(points.site_names),
+            "sat_names": list(points.sat_names),
+            "start_time": points.start_time,
+        }
+        return result, [
+            (name, getattr(points, name), segments[name]) for name in NETWORK_ARRAYS
+        ]
+
+
+class DataRequestHandler(socketserver.BaseRequestHandler):
+
+    def handle(self) -> None:
+        message = receive_message(self.request)
+        if message is None:
+            return
+        try:
+            result, arrays = self.server.handle_request_message(
+                message["method"], message.get("params", dict())
+            )
+        except Exception as e:
+            # Любая ошибка запроса (в том числе чтения файла) - ответ с
+            # ошибкой; иначе поток закрыл бы соединение без ответа
+            expected = isinstance(e, DataServerError)
+            error = str(e) if expected else f"{type(e).__name__}: {e}"
+            logger.warning(
+                "data server request %s: %s", message.get("method"), error,
+                exc_info=not expected,
+            )
+            send_message(self.request, {"ok": False, "error": error})
+            return
+        refs = [
+            {"name": name, "dtype": array.dtype.str, "shape": list(array.shape), "shm": shm}
+            for name, array, shm in arrays
+        ]
+        send_message(
+            self.request,
+            {"ok": True, "result": result, "arrays": refs},
+            [array for _, array, shm in arrays if shm is None],
+        )
+
+
+def main(argv: list[str] | None = None) -> None:
+    from spitec.callbacks.callbacks import set_data_folder
+
+    parser = argparse.ArgumentParser(
+        description="Serve the daily files of spitec to the Dash workers"
+    )
+    parser.add_argument("--socket", type=Path, required=True,
+                        help="Unix socket, the same path goes to SPITEC_DATA_SERVER")
+    parser.add_argument("--data-folder", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    # Сегменты прошлого запуска, завершенного без server_close
+    remove_stale_segments()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    server = DataServer(args.socket, args.data_folder or set_data_folder())
+    logger.info("data server on %s for %s", server.socket_path, server.data_folder)
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
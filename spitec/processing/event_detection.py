@@ -0,0 +1,317 @@
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Callable
+import argparse
+import json
+import numpy as np
+from numpy.typing import NDArray
+from spitec.processing.site_processing import Site
+from spitec.processing.data_products import DataProducts
+from spitec.processing.stage_cache import StageCache, file_version
+from spitec.processing.compute_executor import map_tasks
+from spitec.monitoring.metrics import timed
+
+
+EVENTS_INDEX_SUFFIX = ".events.npz"
+EPOCH_SECONDS = 30
+# Станций в одном задании пула процессов
+SITES_PER_TASK = 16
+DETECTION_PRODUCTS = [
+    DataProducts.roti,
+    DataProducts.dtec_2_10,
+    DataProducts.dtec_10_20,
+    DataProducts.dtec_20_60,
+]
+EVENT_DTYPE = np.dtype(
+    [
+        ("time", "f8"),  # unix time максимума
+        ("start", "f8"),
+        ("end", "f8"),
+        ("site", "U16"),
+        ("sat", "U8"),
+        ("product", "U16"),
+        ("detector", "U16"),
+        ("magnitude", "f4"),
+    ]
+)
+events_cache = StageCache("events", 8)
+
+
+@dataclass
+class DetectionConfig:
+    # Пороги по абсолютному значению продукта
+    thresholds: dict[str, float] = field(
+        default_factory=lambda: {
+            DataProducts.roti.name: 0.5,
+            DataProducts.dtec_2_10.name: 0.4,
+            DataProducts.dtec_10_20.name: 0.6,
+            DataProducts.dtec_20_60.name: 1.0,
+        }
+    )
+    z_score: float = 6.0
+    # Окно (отсчеты) и кратность СКО для скользящего детектора
+    rolling_window: int = 10
+    rolling_factor: float = 3.0
+    # Минимальная длительность события, отсчеты
+    min_samples: int = 2
+
+
+class Detector:
+    THRESHOLD = "threshold"
+    ROBUST_Z = "robust_z"
+    ROLLING = "rolling"
+
+
+def detect_series(
+    times: NDArray,
+    values: NDArray,
+    threshold: float,
+    config: DetectionConfig,
+) -> dict[str, tuple[NDArray, NDArray]]:
+    """
+    Runs the detectors on the series of several satellites at once
+    Parameters:
+        times, values - arrays [satellite, sample] padded with NaN
+        threshold - threshold of the absolute value
+    Returns: detector -> (flagged samples, magnitude of the samples)
+    """
+    with np.errstate(invalid="ignore"):
+        magnitude = np.abs(values)
+        flagged = {Detector.THRESHOLD: (magnitude >= threshold, magnitude)}
+
+        # Робастная z-оценка: медиана и MAD каждого ряда
+        median = _nanmedian_rows(values)
+        sigma = 1.4826 * _nanmedian_rows(np.abs(values - median))
+        sigma[~(sigma > 0)] = np.nan
+        z = np.abs(values - median) / sigma
+        flagged[Detector.ROBUST_Z] = (z >= config.z_score, z)
+
+        # СКО в скользящем окне относительно робастного СКО ряда
+        window = config.rolling_window
+        valid = ~np.isnan(values)
+        squares = np.where(valid, (values - median) ** 2, 0)
+        sums = _rolling_sum(squares, window)
+        counts = _rolling_sum(valid.astype(np.float64), window)
+        rms = np.sqrt(sums / counts) / sigma
+        flagged[Detector.ROLLING] = (
+            (rms >= config.rolling_factor) & (counts >= window // 2) & valid,
+            rms,
+        )
+    for detector, (mask, strength) in flagged.items():
+        flagged[detector] = (mask & ~np.isnan(strength), strength)
+    return flagged
+
+
+def _nanmedian_rows(values: NDArray) -> NDArray:
+    # Медиана строк без NaN: np.nanmedian по оси обходит строки в цикле
+    counts = np.sum(~np.isnan(values), axis=1)
+    ordered = np.sort(values, axis=1)  # NaN в конце строки
+    rows = np.arange(len(values))
+    lower = np.maximum((counts - 1) // 2, 0)
+    upper = np.maximum(counts // 2, 0)
+    median = (ordered[rows, lower] + ordered[rows, upper]) / 2
+    median[counts == 0] = np.nan
+    return median[:, np.newaxis]
+
+
+def _rolling_sum(values: NDArray, window: int) -> NDArray:
+    # Сумма по окну из window отсчетов, заканчивающемуся на отсчете
+    cumsum = np.cumsum(values, axis=1)
+    result = cumsum.copy()
+    result[:, window:] -= cumsum[:, :-window]
+    return result
+
+
+def find_runs(
+    times: NDArray,
+    mask: NDArray,
+    strength: NDArray,
+    min_samples: int,
+) -> tuple[NDArray, ...]:
+    """
+    Groups flagged samples of each row into events
+    A run is broken by an unflagged sample or by a time gap
+    Returns: row, start, end, peak time and peak strength of the events
+    """
+    with np.errstate(invalid="ignore"):
+        gap = np.diff(times, axis=1) > 2 * EPOCH_SECONDS
+    before = np.zeros_like(mask)
+    before[:, 1:] = mask[:, :-1] & ~gap
+    after = np.zeros_like(mask)
+    after[:, :-1] = mask[:, 1:] & ~gap
+    # Начала и концы идут попарно в порядке обхода по строкам
+    rows, starts = np.nonzero(mask & ~before)
+    _, ends = np.nonzero(mask & ~after)
+    long_enough = ends - starts + 1 >= min_samples
+    rows, starts, ends = rows[long_enough], starts[long_enough], ends[long_enough]
+    if len(rows) == 0:
+        empty = np.array([])
+        return rows, empty, empty, empty, empty
+
+    # Все отсчеты событий подряд: номер события и позиция в плоском массиве
+    n_cols = mask.shape[1]
+    flat = np.where(mask, strength, -np.inf).ravel()
+    lengths = ends - starts + 1
+    run_ids = np.repeat(np.arange(len(rows)), lengths)
+    run_offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    positions = (
+        np.repeat(rows * n_cols + starts - run_offsets, lengths)
+        + np.arange(lengths.sum())
+    )
+    peaks = np.maximum.reduceat(flat[positions], run_offsets)
+    # Первый отсчет события, на котором достигается максимум
+    at_peak = flat[positions] == peaks[run_ids]
+    _, first = np.unique(run_ids[at_peak], return_index=True)
+    peak_idx = positions[at_peak][first] - rows * n_cols
+    return (
+        rows,
+        times[rows, starts],
+        times[rows, ends],
+        times[rows, peak_idx],
+        peaks,
+    )
+
+
+def scan_sites(
+    local_file: str | Path,
+    sites: list[Site],
+    config: DetectionConfig,
+) -> NDArray:
+    import h5py
+
+    # Ряды всех спутников станции обрабатываются одной матрицей
+    events = []
+    with h5py.File(local_file, "r") as f:
+        for site in sites:
+            if site not in f:
+                continue
+            sats, series = [], {product: [] for product in DETECTION_PRODUCTS}
+            timestamps = []
+            for sat, group in f[site].items():
+                if not all(product.hdf_name in group for product in DETECTION_PRODUCTS):
+                    continue
+                sats.append(sat)
+                timestamps.append(group[DataProducts.timestamp.hdf_name][:])
+                for product in DETECTION_PRODUCTS:
+                    series[product].append(group[product.hdf_name][:])
+            if len(sats) == 0:
+                continue
+            times = _padded(timestamps)
+            for product in DETECTION_PRODUCTS:
+                values = _padded(series[product])
+                threshold = config.thresholds.get(product.name, np.inf)
+                flagged = detect_series(times, values, threshold, config)
+                for detector, (mask, strength) in flagged.items():
+                    rows, starts, ends, peaks, magnitudes = find_runs(
+                        times, mask, strength, config.min_samples
+                    )
+                    site_events = np.empty(len(rows), dtype=EVENT_DTYPE)
+                    site_events["time"] = peaks
+                    site_events["start"] = starts
+                    site_events["end"] = ends
+                    site_events["site"] = site
+                    site_events["sat"] = np.array(sats)[rows]
+                    site_events["product"] = product.name
+                    site_events["detector"] = detector
+                    site_events["magnitude"] = magnitudes
+                    events.append(site_events)
+    if len(events) == 0:
+        return np.empty(0, dtype=EVENT_DTYPE)
+    return np.concatenate(events)
+
+
+def _padded(arrays: list[NDArray]) -> NDArray:
+    # Ряды разной длины -> матрица, дополненная NaN
+    result = np.full((len(arrays), max(len(a) for a in arrays)), np.nan)
+    for row, array in enumerate(arrays):
+        result[row, :len(array)] = array
+    return result
+
+
+@timed("build_event_index")
+def build_event_index(
+    local_file: str | Path,
+    config: DetectionConfig | None = None,
+    workers: int | None = None,
+    progress: Callable[[int], None] | None = None,
+) -> NDArray:
+    """
+    Scans every (site, satellite) series of ROTI and the dTEC bands and
+    writes the index of candidate events next to the daily file
+    Parameters:
+        workers - number of processes, 1 - in the calling process,
+            None - see compute_workers
+        progress - called with the percentage of processed stations
+    Returns: events sorted by magnitude within each detector
+    """
+    import h5py
+
+    local_file = Path(local_file)
+    config = config or DetectionConfig()
+    with h5py.File(local_file, "r") as f:
+        sites = list(f.keys())
+    tasks = [
+        (local_file, sites[i:i + SITES_PER_TASK], config)
+        for i in range(0, len(sites), SITES_PER_TASK)
+    ]
+    results = map_tasks(scan_sites, tasks, workers=workers, progress=progress)
+
+    events = np.concatenate(results) if results else np.empty(0, dtype=EVENT_DTYPE)
+    events = events[np.lexsort((-events["magnitude"], events["detector"]))]
+    save_event_index(local_file, events, config)
+    return events
+
+
+def event_index_file(local_file: str | Path) -> Path:
+    local_file = Path(local_file)
+    return local_file.with_name(local_file.stem + EVENTS_INDEX_SUFFIX)
+
+
+def save_event_index(
+    local_file: str | Path,
+    events: NDArray,
+    config: DetectionConfig,
+) -> None:
+    index_file = event_index_file(local_file)
+    tmp_file = index_file.with_name(index_file.name + ".tmp")
+    with open(tmp_file, "wb") as f:
+        np.savez_compressed(
+            f,
+            events=events,
+            source_mtime=np.array(file_version(local_file)[1]),
+            config=np.array(json.dumps(asdict(config))),
+        )
+    tmp_file.replace(index_file)
+
+
+def load_event_index(local_file: str | Path) -> NDArray | None:
+    # None - индекса нет или он построен по другой версии файла
+    version = file_version(local_file)
+    events = events_cache.get(version)
+    if events is not None:
+        return events
+    index_file = event_index_file(local_file)
+    if not index_file.exists():
+        return None
+    with np.load(index_file) as index:
+        if int(index["source_mtime"]) != version[1]:
+            return None
+        events = index["events"]
+    events_cache.set(version, events)
+    return events
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Build the index of candidate events of daily files"
+    )
+    parser.add_argument("files", type=Path, nargs="+")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+    for local_file in args.files:
+        events = build_event_index(local_file, workers=args.workers)
+        print(f"{local_file}: {len(events)} events")
+
+
+if __name__ == "__main__":
+    main()
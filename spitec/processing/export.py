@@ -0,0 +1,170 @@
+from pathlib import Path
+from typing import BinaryIO, Iterator
+from datetime import datetime
+import io
+import json
+import tempfile
+import zipfile
+import numpy as np
+from spitec.processing.site_processing import Site
+from spitec.processing.data_processing import Sat
+from spitec.processing.data_products import DataProducts
+
+
+EXPORT_FORMATS = {
+    "h5": "application/x-hdf5",
+    "npz": "application/octet-stream",
+    "csv": "text/csv",
+}
+EXPORT_CHUNK_SIZE = 1024 * 1024
+# Продукты, которые можно выгрузить (время выгружается всегда)
+EXPORT_PRODUCTS = [
+    product
+    for product in DataProducts
+    if product not in (DataProducts.timestamp, DataProducts.time)
+]
+
+
+class ExportError(ValueError):
+    pass
+
+
+def parse_export_products(names: str | list[str]) -> list[DataProducts]:
+    if isinstance(names, str):
+        names = [name for name in names.split(",") if name]
+    products = []
+    for name in names:
+        if name not in DataProducts.__members__ or \
+            DataProducts[name] not in EXPORT_PRODUCTS:
+            raise ExportError(f"Unknown data product: {name}")
+        products.append(DataProducts[name])
+    if len(products) == 0:
+        raise ExportError("No data products to export")
+    return products
+
+
+def iter_site_series(
+    local_file: str | Path,
+    sites: list[Site],
+    sat: Sat | None,
+    products: list[DataProducts],
+    start: datetime,
+    end: datetime,
+) -> Iterator[tuple[Site, Sat, dict[DataProducts, np.ndarray]]]:
+    """
+    Reads the series of one station and satellite at a time
+    Parameters:
+        sat - satellite, None for all satellites of the station
+        start, end - time window (inclusive)
+    Yields: station, satellite and arrays of the window, the timestamp
+        array is under DataProducts.timestamp
+    """
+    import h5py
+
+    start_timestamp = start.timestamp()
+    end_timestamp = end.timestamp()
+    with h5py.File(local_file, "r") as f:
+        for site in sites:
+            if site not in f:
+                continue
+            satellites = list(f[site].keys()) if sat is None else [sat]
+            for site_sat in satellites:
+                if site_sat not in f[site]:
+                    continue
+                group = f[site][site_sat]
+                timestamps = group[DataProducts.timestamp.hdf_name][:]
+                window = (timestamps >= start_timestamp) & (timestamps <= end_timestamp)
+                if not window.any():
+                    continue
+                # Окно непрерывно: читаем из HDF5 только его срез
+                idx = np.flatnonzero(window)
+                window_slice = slice(idx[0], idx[-1] + 1)
+                series = {DataProducts.timestamp: timestamps[window_slice]}
+                for product in products:
+                    if product.hdf_name in group:
+                        series[product] = group[product.hdf_name][window_slice]
+                yield site, site_sat, series
+
+
+def iter_export(
+    export_format: str,
+    local_file: str | Path,
+    sites: list[Site],
+    sat: Sat | None,
+    products: list[DataProducts],
+    start: datetime,
+    end: datetime,
+    metadata: dict,
+) -> Iterator[bytes]:
+    """
+    Export of the selected data in export_format, produced in chunks
+    Only the series of one station are kept in memory at a time
+    """
+    series = iter_site_series(local_file, sites, sat, products, start, end)
+    if export_format == "csv":
+        yield from _iter_csv(series, products, metadata)
+    elif export_format == "h5":
+        yield from _iter_tmp_file(_write_h5, series, metadata)
+    elif export_format == "npz":
+        yield from _iter_tmp_file(_write_npz, series, metadata)
+    else:
+        raise ExportError(f"Unknown export format: {export_format}")
+
+
+def _iter_csv(series, products: list[DataProducts], metadata: dict) -> Iterator[bytes]:
+    for key, value in metadata.items():
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value)
+        yield f"# {key}: {value}\n".encode()
+    columns = ["site", "sat", "time"] + [product.name for product in products]
+    yield (",".join(columns) + "\n").encode()
+    for site, sat, arrays in series:
+        times = np.array(arrays[DataProducts.timestamp], dtype="datetime64[s]")
+        columns = [np.datetime_as_string(times).astype(object)]
+        for product in products:
+            values = arrays.get(product)
+            if values is None:
+                values = np.full(len(times), np.nan)
+            columns.append(np.asarray(values, dtype=np.float64).astype(str).astype(object))
+        buffer = io.StringIO()
+        for row in zip(*columns):
+            buffer.write(f"{site},{sat},{','.join(row)}\n")
+        yield buffer.getvalue().encode()
+
+
+def _write_h5(file: BinaryIO, series, metadata: dict) -> None:
+    import h5py
+
+    # Структура как у исходных файлов: станция / спутник / продукт
+    with h5py.File(file, "w") as f:
+        for key, value in metadata.items():
+            f.attrs[key] = json.dumps(value) if isinstance(value, (dict, list)) else value
+        for site, sat, arrays in series:
+            group = f.require_group(site).create_group(sat)
+            for product, values in arrays.items():
+                group.create_dataset(product.hdf_name, data=values)
+
+
+def _write_npz(file: BinaryIO, series, metadata: dict) -> None:
+    # Массивы "станция/спутник/продукт.npy", читается через np.load
+    with zipfile.ZipFile(file, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+        with archive.open("metadata.npy", "w") as entry:
+            np.lib.format.write_array(entry, np.array(json.dumps(metadata)))
+        for site, sat, arrays in series:
+            for product, values in arrays.items():
+                with archive.open(f"{site}/{sat}/{product.hdf_name}.npy", "w", force_zip64=True) as entry:
+                    np.lib.format.write_array(entry, np.asarray(values))
+
+
+def _iter_tmp_file(write, series, metadata: dict) -> Iterator[bytes]:
+    # HDF5 и zip требуют произвольного доступа к файлу, поэтому выгрузка
+    # пишется во временный файл на диске и отдается частями
+    with tempfile.TemporaryFile() as file:
+        write(file, series, metadata)
+        file.seek(0)
+        while True:
+            chunk = file.read(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
@@ -0,0 +1,120 @@
+from pathlib import Path
+from typing import Callable
+from datetime import datetime
+from enum import Enum
+import numpy as np
+from numpy.typing import NDArray
+from spitec.processing.site_processing import Site
+from spitec.processing.data_products import DataProducts
+from spitec.processing.pierce_points import iter_pierce_points
+from spitec.processing.binning import (
+    BinStatistic,
+    Grid2D,
+    GridAccumulator,
+    make_edges,
+)
+from spitec.processing.compute_executor import map_tasks
+from spitec.monitoring.metrics import timed
+
+
+EPOCH_SECONDS = 30
+MAX_KEOGRAM_COLUMNS = 720
+# Станций в одном задании пула процессов
+SITES_PER_TASK = 16
+
+
+class KeogramAxis(Enum):
+    LAT = "lat"
+    LON = "lon"
+
+
+def keogram_time_step(start: datetime, end: datetime) -> int:
+    # Шаг по времени кратен эпохе, столбцов не больше MAX_KEOGRAM_COLUMNS
+    duration = (end - start).total_seconds()
+    epochs = np.ceil(duration / MAX_KEOGRAM_COLUMNS / EPOCH_SECONDS)
+    return int(max(epochs, 1) * EPOCH_SECONDS)
+
+
+@timed("compute_keogram")
+def compute_keogram(
+    local_file: str | Path,
+    dataproduct: DataProducts,
+    hm: float,
+    start: datetime,
+    end: datetime,
+    axis: KeogramAxis,
+    band: tuple[float, float],
+    step: float,
+    statistic: BinStatistic = BinStatistic.MEAN,
+    sites: list[Site] | None = None,
+    workers: int | None = None,
+    progress: Callable[[int], None] | None = None,
+) -> Grid2D:
+    """
+    Keogram of the data product: latitude (or longitude) of the pierce
+    points of all stations and satellites against time
+    Groups of stations are read on the process pool, memory of every
+    process is bounded by the grid
+    Parameters:
+        axis - latitude or longitude on the vertical axis
+        band - longitude (or latitude) range of the pierce points
+            in degrees, the other coordinate
+        step - cell size of the vertical axis in degrees
+        statistic - mean, maximum or count of the values in a cell
+        workers - number of processes, see compute_workers
+        progress - called with the percentage of processed stations
+    Returns: grid with x - unix time, y - latitude (or longitude)
+    """
+    import h5py
+
+    time_step = keogram_time_step(start, end)
+    x_edges = make_edges(
+        start.timestamp(), end.timestamp() + EPOCH_SECONDS, time_step
+    )
+    if axis is KeogramAxis.LAT:
+        y_edges = make_edges(-90, 90, step)
+    else:
+        y_edges = make_edges(-180, 180, step)
+    if sites is None:
+        with h5py.File(local_file, "r") as f:
+            sites = list(f.keys())
+    tasks = [
+        (
+            local_file, dataproduct, hm, start, end, axis, band,
+            x_edges, y_edges, sites[i:i + SITES_PER_TASK],
+        )
+        for i in range(0, len(sites), SITES_PER_TASK)
+    ]
+    # Части сетки считаются по группам станций в процессах пула
+    accumulator = GridAccumulator(x_edges, y_edges)
+    for part in map_tasks(_keogram_task, tasks, workers=workers, progress=progress):
+        accumulator.merge(part)
+    return accumulator.result(statistic)
+
+
+def _keogram_task(
+    local_file: str | Path,
+    dataproduct: DataProducts,
+    hm: float,
+    start: datetime,
+    end: datetime,
+    axis: KeogramAxis,
+    band: tuple[float, float],
+    x_edges: NDArray,
+    y_edges: NDArray,
+    sites: list[Site],
+) -> GridAccumulator:
+    band_min, band_max = min(band), max(band)
+    accumulator = GridAccumulator(x_edges, y_edges)
+    for site_points in iter_pierce_points(local_file, dataproduct, hm, start, end, sites):
+        if axis is KeogramAxis.LAT:
+            y, other = site_points.lat, site_points.lon
+        else:
+            y, other = site_points.lon, site_points.lat
+        in_band = (other >= band_min) & (other <= band_max)
+        accumulator.add(
+            site_points.times[in_band],
+            y[in_band],
+            site_points.values[in_band],
+        )
+    return accumulator
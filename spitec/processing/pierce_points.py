@@ -0,0 +1,297 @@
+from pathlib import Path
+from typing import Callable, Iterator, NamedTuple
+from datetime import datetime
+import numpy as np
+from numpy.typing import NDArray
+from spitec.processing.site_processing import Site
+from spitec.processing.data_processing import Sat
+from spitec.processing.data_products import DataProducts
+from spitec.processing.trajectorie import sub_ionospheric_points
+from spitec.processing.stage_cache import StageCache, file_version
+from spitec.processing.data_client import get_data_client, DataServerError
+from spitec.processing.shared_cache import SharedArrayCache, get_shared_cache
+from spitec.monitoring.metrics import timed, hdf5_read_bytes
+
+
+# Индекс сети занимает 19 байт на отсчет, поэтому хранится мало версий
+NETWORK_CACHE_SIZE = 2
+network_cache = StageCache("network_points", NETWORK_CACHE_SIZE)
+# Массивы NetworkPoints, общие для процессов; остальные поля - метаданные
+NETWORK_ARRAYS = [
+    "site_lat", "site_lon", "time_offsets", "sites",
+    "sats", "azimuth", "elevation", "values",
+]
+
+
+class SitePiercePoints(NamedTuple):
+    site: Site
+    times: NDArray  # unix time, с
+    lat: NDArray  # градусы
+    lon: NDArray  # градусы
+    values: NDArray
+    sats: NDArray  # имена спутников
+
+
+class PiercePoints(NamedTuple):
+    times: NDArray  # unix time, с
+    lat: NDArray  # градусы
+    lon: NDArray  # градусы
+    values: NDArray
+    sites: NDArray  # индексы в NetworkPoints.site_names
+    sats: NDArray  # индексы в NetworkPoints.sat_names
+
+
+class NetworkPoints(NamedTuple):
+    """
+    All samples of one data product of a daily file sorted by time
+    Any time window of the whole network is a contiguous slice
+    """
+    site_names: list[Site]
+    sat_names: list[Sat]
+    site_lat: NDArray  # радианы, по станциям
+    site_lon: NDArray  # радианы, по станциям
+    start_time: float  # unix time первого отсчета
+    time_offsets: NDArray  # uint32, с от start_time
+    sites: NDArray  # uint16
+    sats: NDArray  # uint8
+    azimuth: NDArray  # float32
+    elevation: NDArray  # float32
+    values: NDArray  # float32
+
+    def window(self, start: datetime, end: datetime) -> slice:
+        # Отсчеты start <= t <= end; границы приводятся к типу массива,
+        # иначе searchsorted преобразует весь массив во float64
+        first = np.ceil(start.timestamp() - self.start_time)
+        last = np.floor(end.timestamp() - self.start_time)
+        if last < 0 or first > last:
+            return slice(0, 0)
+        offsets = np.array([max(first, 0), last], dtype=self.time_offsets.dtype)
+        first = np.searchsorted(self.time_offsets, offsets[0], side="left")
+        last = np.searchsorted(self.time_offsets, offsets[1], side="right")
+        return slice(first, last)
+
+    def times(self, window: slice = slice(None)) -> NDArray:
+        return self.start_time + self.time_offsets[window].astype(np.float64)
+
+    def pierce_points(
+        self,
+        hm: float,
+        start: datetime,
+        end: datetime,
+    ) -> PiercePoints:
+        """
+        Pierce points of every station and satellite in the time window
+        Parameters:
+            hm - ionospheric maximum height (km)
+            start, end - time window (inclusive)
+        """
+        window = self.window(start, end)
+        sites = self.sites[window]
+        lat, lon = sub_ionospheric_points(
+            self.site_lat[sites],
+            self.site_lon[sites],
+            hm,
+            self.azimuth[window].astype(np.float64),
+            self.elevation[window].astype(np.float64),
+        )
+        return PiercePoints(
+            self.times(window),
+            np.degrees(lat),
+            np.degrees(lon),
+            self.values[window],
+            sites,
+            self.sats[window],
+        )
+
+
+def iter_pierce_points(
+    local_file: str | Path,
+    product: DataProducts,
+    hm: float,
+    start: datetime,
+    end: datetime,
+    sites: list[Site] | None = None,
+    progress: Callable[[int], None] | None = None,
+) -> Iterator[SitePiercePoints]:
+    """
+    Pierce points of all satellites of every station in the time window
+    Stations are read one at a time, so memory is bounded by one station
+    Parameters:
+        product - data product for the values of the points
+        hm - ionospheric maximum height (km)
+        start, end - time window (inclusive)
+        sites - stations, None for the whole network
+        progress - called with the percentage of processed stations
+            when it changes
+    """
+    import h5py
+
+    start_timestamp = start.timestamp()
+    end_timestamp = end.timestamp()
+    with h5py.File(local_file, "r") as f:
+        if sites is None:
+            sites = list(f.keys())
+        percent = 0
+        for done, site in enumerate(sites, 1):
+            if progress is not None and int(100 * done / len(sites)) != percent:
+                percent = int(100 * done / len(sites))
+                progress(percent)
+            if site not in f:
+                continue
+            site_group = f[site]
+            times, azimuths, elevations, values, sats = [], [], [], [], []
+            for sat, group in site_group.items():
+                if product.hdf_name not in group:
+                    continue
+                timestamps = group[DataProducts.timestamp.hdf_name][:]
+                # Время отсортировано: окно - непрерывный срез
+                first = np.searchsorted(timestamps, start_timestamp, side="left")
+                last = np.searchsorted(timestamps, end_timestamp, side="right")
+                if first >= last:
+                    continue
+                window = slice(first, last)
+                times.append(timestamps[window])
+                azimuths.append(group[DataProducts.azimuth.hdf_name][window])
+                elevations.append(group[DataProducts.elevation.hdf_name][window])
+                values.append(group[product.hdf_name][window])
+                sats.append(np.full(last - first, sat))
+            if len(times) == 0:
+                continue
+            lat, lon = sub_ionospheric_points(
+                site_group.attrs["lat"],
+                site_group.attrs["lon"],
+                hm,
+                np.concatenate(azimuths),
+                np.concatenate(elevations),
+            )
+            yield SitePiercePoints(
+                site,
+                np.concatenate(times),
+                np.degrees(lat),
+                np.degrees(lon),
+                np.concatenate(values),
+                np.concatenate(sats),
+            )
+
+
+@timed("read_network_points")
+def read_network_points(
+    local_file: str | Path,
+    product: DataProducts,
+) -> NetworkPoints:
+    import h5py
+
+    # Один проход по файлу; время - целые секунды от первого отсчета
+    site_names, site_lat, site_lon = [], [], []
+    sat_indices: dict[Sat, int] = dict()
+    times, sites, sats, azimuths, elevations, values = [], [], [], [], [], []
+    read_bytes = 0
+    with h5py.File(local_file, "r") as f:
+        for site_idx, (site, site_group) in enumerate(f.items()):
+            site_names.append(site)
+            site_lat.append(site_group.attrs["lat"])
+            site_lon.append(site_group.attrs["lon"])
+            for sat, group in site_group.items():
+                if product.hdf_name not in group:
+                    continue
+                timestamps = group[DataProducts.timestamp.hdf_name][:]
+                sat_idx = sat_indices.setdefault(sat, len(sat_indices))
+                times.append(timestamps)
+                sites.append(np.full(len(timestamps), site_idx, dtype=np.uint16))
+                sats.append(np.full(len(timestamps), sat_idx, dtype=np.uint8))
+                for arrays, name in [
+                    (azimuths, DataProducts.azimuth.hdf_name),
+                    (elevations, DataProducts.elevation.hdf_name),
+                    (values, product.hdf_name),
+                ]:
+                    arrays.append(group[name][:].astype(np.float32))
+                read_bytes += timestamps.nbytes * 4
+    hdf5_read_bytes.inc("read_network_points", read_bytes)
+
+    if len(times) == 0:
+        times = [np.array([])]
+        sites = [np.array([], dtype=np.uint16)]
+        sats = [np.array([], dtype=np.uint8)]
+        azimuths = elevations = values = [np.array([], dtype=np.float32)]
+    times = np.concatenate(times)
+    start_time = float(np.floor(times.min())) if len(times) > 0 else 0.0
+    time_offsets = np.round(times - start_time).astype(np.uint32)
+    order = np.argsort(time_offsets, kind="stable")
+    return NetworkPoints(
+        site_names,
+        list(sat_indices),
+        np.array(site_lat, dtype=np.float64),
+        np.array(site_lon, dtype=np.float64),
+        start_time,
+        time_offsets[order],
+        np.concatenate(sites)[order],
+        np.concatenate(sats)[order],
+        np.concatenate(azimuths)[order],
+        np.concatenate(elevations)[order],
+        np.concatenate(values)[order],
+    )
+
+
+def get_network_points(
+    local_file: str | Path,
+    product: DataProducts,
+) -> NetworkPoints:
+    """
+    Time-sorted samples of the whole network for a data product
+    Read once per file version and product and kept in memory; with
+    the data server the arrays are shared by all workers
+    """
+    cache = get_shared_cache()
+    if cache is not None:
+        # Запись общего кэша не держится в кэше процесса, чтобы ее можно
+        # было вытеснить
+        return _network_points_shared(cache, local_file, product)
+    key = (file_version(local_file), product.name)
+    points = network_cache.get(key)
+    if points is None:
+        points = _fetch_network_points(local_file, product)
+        network_cache.set(key, points)
+    return points
+
+
+def _network_points_shared(
+    cache: SharedArrayCache,
+    local_file: str | Path,
+    product: DataProducts,
+) -> NetworkPoints:
+    # Из общего кэша узла; при промахе от сервера данных или из файла
+    key = ("network_points", file_version(local_file), product.name)
+    entry = cache.get(key)
+    if entry is None:
+        points = _fetch_network_points(local_file, product)
+        meta = {
+            "site_names": list(points.site_names),
+            "sat_names": list(points.sat_names),
+            "start_time": points.start_time,
+        }
+        entry = cache.set(
+            key, meta, {name: getattr(points, name) for name in NETWORK_ARRAYS}
+        )
+    meta, arrays = entry
+    return _network_points_from_fields({**meta, **arrays})
+
+
+def _fetch_network_points(
+    local_file: str | Path,
+    product: DataProducts,
+) -> NetworkPoints:
+    client = get_data_client()
+    if client is not None:
+        try:
+            return _network_points_from_fields(
+                client.network_points(local_file, product.name)
+            )
+        except DataServerError:
+            pass
+    return read_network_points(local_file, product)
+
+
+def _network_points_from_fields(fields: dict) -> NetworkPoints:
+    fields["site_names"] = [Site(site) for site in fields["site_names"]]
+    fields["sat_names"] = [Sat(sat) for sat in fields["sat_names"]]
+    return NetworkPoints(**fields)
@@ -0,0 +1,139 @@
+from dataclasses import dataclass, asdict
+from pathlib import Path
+import argparse
+import json
+import logging
+import threading
+import time
+from spitec.processing.site_processing import load_data_json
+from spitec.processing.session_store import (
+    SessionStore,
+    SESSIONS_DB_NAME,
+    LEGACY_SESSIONS_FOLDER_NAME,
+    slim_session,
+)
+from spitec.processing.trajectory_store import TRAJECTORIES_FOLDER_NAME
+
+
+logger = logging.getLogger(__name__)
+
+SESSION_MAX_AGE_DAYS = 365
+GC_INTERVAL_HOURS = 24
+# Интервал фоновой очистки в часах; не задан - очистка только из CLI
+GC_INTERVAL_ENV = "SPITEC_SESSION_GC_HOURS"
+DAY_SECONDS = 24 * 60 * 60
+
+
+@dataclass
+class GcReport:
+    legacy_compacted: int = 0
+    legacy_invalid: int = 0
+    sessions_expired: int = 0
+    sessions_orphaned: int = 0
+    sessions_left: int = 0
+    trajectories_removed: int = 0
+    bytes_reclaimed: int = 0
+
+
+def collect_garbage(
+    data_folder: str | Path,
+    max_age_days: float = SESSION_MAX_AGE_DAYS,
+) -> GcReport:
+    """
+    Maintenance of the share sessions in data_folder
+    - moves <uuid>.json sessions into the session store (links keep working)
+    - removes sessions not opened for max_age_days
+    - removes sessions whose daily file no longer exists
+    - removes uploaded trajectories that no session refers to and
+        that are older than max_age_days
+    """
+    data_folder = Path(data_folder)
+    report = GcReport()
+    store = SessionStore(data_folder / SESSIONS_DB_NAME)
+    size_before = store.size()
+    reclaimed = 0
+
+    legacy_folder = data_folder / LEGACY_SESSIONS_FOLDER_NAME
+    if legacy_folder.exists():
+        for file_name in legacy_folder.glob("*.json"):
+            session_data = load_data_json(file_name)
+            file_size = file_name.stat().st_size
+            try:
+                store.put(file_name.stem, slim_session(session_data))
+                report.legacy_compacted += 1
+            except (TypeError, KeyError):
+                report.legacy_invalid += 1
+            file_name.unlink()
+            reclaimed += file_size
+
+    report.sessions_expired = store.expire(time.time() - max_age_days * DAY_SECONDS)
+
+    orphaned = []
+    trajectory_ids = set()
+    for session_id, session_data in store.items():
+        file_name = session_data.get("file_name")
+        if file_name is not None and not (data_folder / Path(file_name).name).exists():
+            orphaned.append(session_id)
+            continue
+        for trajectory in (session_data.get("user_trajectories") or {}).values():
+            if "id" in trajectory:
+                trajectory_ids.add(trajectory["id"])
+    report.sessions_orphaned = store.remove(orphaned)
+
+    # Траектории без ссылок могут быть у открытых сейчас вкладок,
+    # поэтому удаляются только старые
+    trajectories_folder = data_folder / TRAJECTORIES_FOLDER_NAME
+    if trajectories_folder.exists():
+        modified_before = time.time() - max_age_days * DAY_SECONDS
+        for file_name in trajectories_folder.glob("*.npz"):
+            stat = file_name.stat()
+            if file_name.stem in trajectory_ids or stat.st_mtime >= modified_before:
+                continue
+            file_name.unlink()
+            report.trajectories_removed += 1
+            reclaimed += stat.st_size
+
+    store.vacuum()
+    report.sessions_left = len(store)
+    report.bytes_reclaimed = reclaimed + max(size_before - store.size(), 0)
+    logger.info("session gc: %s", report)
+    return report
+
+
+def start_periodic_gc(
+    data_folder: str | Path,
+    interval_hours: float = GC_INTERVAL_HOURS,
+    max_age_days: float = SESSION_MAX_AGE_DAYS,
+) -> threading.Thread:
+    # Фоновая очистка в процессе приложения
+    def run() -> None:
+        while True:
+            try:
+                collect_garbage(data_folder, max_age_days)
+            except Exception:
+                logger.exception("session gc failed")
+            time.sleep(interval_hours * 60 * 60)
+
+    thread = threading.Thread(target=run, name="session-gc", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv: list[str] | None = None) -> None:
+    from spitec.callbacks.callbacks import set_data_folder
+
+    parser = argparse.ArgumentParser(
+        description="Expire, clean up and compact spitec share sessions"
+    )
+    parser.add_argument("--data-folder", type=Path, default=None)
+    parser.add_argument("--max-age-days", type=float, default=SESSION_MAX_AGE_DAYS,
+                        help="remove sessions not opened for this many days")
+    args = parser.parse_args(argv)
+
+    data_folder = args.data_folder or set_data_folder()
+    report = collect_garbage(data_folder, args.max_age_days)
+    print(json.dumps(asdict(report), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+from contextlib import closing
+from pathlib import Path
+from typing import Iterator
+import json
+import re
+import sqlite3
+import time
+import zlib
+from spitec.processing.site_processing import calculate_json_hash, load_data_json
+from spitec.processing.catalogue import get_file_catalogue
+
+
+SESSIONS_DB_NAME = "sessions.sqlite"
+LEGACY_SESSIONS_FOLDER_NAME = "json"
+SESSION_ID_PATTERN = re.compile(r"^[0-9a-f-]{1,64}$")
+DB_TIMEOUT = 30
+# 2 - ссылки на файл и имена станций вместо каталога станций
+SESSION_FORMAT_VERSION = 2
+
+
+class SessionStore:
+    """
+    Content-addressed storage of share sessions
+    The session id is the hash of the session state, so identical states
+    from different users are stored once. Payloads are zlib-compressed JSON
+    """
+
+    def __init__(self, db_file: str | Path, legacy_folder: str | Path | None = None) -> None:
+        self.db_file = Path(db_file)
+        # Папка с сессиями старого формата <uuid>.json
+        self.legacy_folder = None if legacy_folder is None else Path(legacy_folder)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as connection, connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id TEXT PRIMARY KEY,
+                    payload BLOB NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+                """
+            )
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(sessions)")]
+            if "accessed" not in columns:
+                connection.execute("ALTER TABLE sessions ADD COLUMN accessed REAL")
+                connection.execute("UPDATE sessions SET accessed = created")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_accessed ON sessions (accessed)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Отдельное соединение на операцию: воркеры gunicorn - разные процессы
+        return sqlite3.connect(self.db_file, timeout=DB_TIMEOUT)
+
+    def save(self, data: dict) -> str:
+        session_id = calculate_json_hash(data)
+        self.put(session_id, data)
+        return session_id
+
+    def put(self, session_id: str, data: dict) -> None:
+        # Сохранение под заданным id (перенос сессий старого формата)
+        payload = zlib.compress(json.dumps(data).encode("utf-8"))
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                """
+                INSERT INTO sessions (id, payload, created, accessed) VALUES (?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET accessed = excluded.accessed
+                """,
+                (session_id, payload, now, now),
+            )
+
+    def load(self, session_id: str) -> dict | None:
+        if session_id is None or not SESSION_ID_PATTERN.match(session_id):
+            return None
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT payload FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE sessions SET accessed = ? WHERE id = ?",
+                    (time.time(), session_id),
+                )
+        if row is not None:
+            return json.loads(zlib.decompress(row[0]))
+        if self.legacy_folder is not None:
+            return load_data_json(self.legacy_folder / f"{session_id}.json")
+        return None
+
+    def items(self) -> Iterator[tuple[str, dict]]:
+        with closing(self._connect()) as connection:
+            for session_id, payload in connection.execute(
+                "SELECT id, payload FROM sessions"
+            ):
+                yield session_id, json.loads(zlib.decompress(payload))
+
+    def expire(self, accessed_before: float) -> int:
+        # Удаляет сессии, которые не открывались с accessed_before
+        with closing(self._connect()) as connection, connection:
+            return connection.execute(
+                "DELETE FROM sessions WHERE accessed < ?", (accessed_before,)
+            ).rowcount
+
+    def remove(self, session_ids: list[str]) -> int:
+        with closing(self._connect()) as connection, connection:
+            return connection.executemany(
+                "DELETE FROM sessions WHERE id = ?",
+                [(session_id,) for session_id in session_ids],
+            ).rowcount
+
+    def vacuum(self) -> None:
+        # Возвращает место удаленных сессий файловой системе
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            connection.execute("VACUUM")
+
+    def size(self) -> int:
+        # Байт на диске, включая журнал WAL
+        return sum(
+            path.stat().st_size
+            for path in [self.db_file, Path(f"{self.db_file}-wal")]
+            if path.exists()
+        )
+
+    def __contains__(self, session_id: str) -> bool:
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT 1 FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with closing(self._connect()) as connection:
+            return connection.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def slim_session(session_data: dict) -> dict:
+    """
+    Session in the stored format: the daily file is referenced by name and
+    only the names of the selected stations are kept. Station coordinates
+    and satellite options are rebuilt from the file catalogue on load
+    """
+    session_data = dict(session_data)
+    session_data.pop("site_coords", None)
+    session_data.pop("satellites_options", None)
+    if session_data["file_name"] is not None:
+        session_data["file_name"] = Path(session_data["file_name"]).name
+    for key in ["site_data_store", "region_site_names"]:
+        if session_data[key] is not None:
+            session_data[key] = list(session_data[key].keys())
+    session_data["version"] = SESSION_FORMAT_VERSION
+    return session_data
+
+
+def expand_session(session_data: dict, data_folder: str | Path) -> dict:
+    # Обратное к slim_session; сессии старого формата возвращаются как есть
+    if session_data.get("version") != SESSION_FORMAT_VERSION:
+        return session_data
+    session_data = dict(session_data)
+    session_data.pop("version")
+    catalogue = None
+    if session_data["file_name"] is not None:
+        local_file = Path(data_folder) / session_data["file_name"]
+        session_data["file_name"] = str(local_file)
+        if local_file.exists():
+            catalogue = get_file_catalogue(local_file)
+
+    if catalogue is None:
+        session_data["site_coords"] = None
+        session_data["satellites_options"] = None
+    else:
+        session_data["site_coords"] = catalogue.site_coords
+        session_data["satellites_options"] = catalogue.satellites_options()
+    for key in ["site_data_store", "region_site_names"]:
+        if session_data[key] is not None:
+            session_data[key] = (
+                dict() if catalogue is None
+                else catalogue.site_indices(session_data[key])
+            )
+    return session_data
@@ -0,0 +1,365 @@
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Hashable
+import fcntl
+import hashlib
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import numpy as np
+from numpy.typing import NDArray
+from spitec.processing.stage_cache import STAGE_CACHES
+
+
+logger = logging.getLogger(__name__)
+
+# Объем кэша в МиБ на весь узел; не задан или 0 - кэш отключен
+SHARED_CACHE_ENV = "SPITEC_SHARED_CACHE_MB"
+# Папка записей; по умолчанию в памяти (/dev/shm), иначе во временной папке
+SHARED_CACHE_FOLDER_ENV = "SPITEC_SHARED_CACHE_FOLDER"
+SHARED_CACHE_FOLDER_NAME = "spitec-shared-cache"
+ENTRY_SUFFIX = ".arrays"
+INDEX_DB_NAME = "index.sqlite"
+DB_TIMEOUT = 30
+ALIGNMENT = 64
+_MAGIC = b"SPAC"
+_HEADER = struct.Struct("!4sI")
+
+
+class SharedArrayCache:
+    """
+    Cache of decoded arrays shared by all worker processes of the host
+    Every entry is a file in folder that workers map read-only, so
+    the arrays exist once per host however many workers use them
+    An attached entry holds a shared flock until its arrays are
+    garbage collected: the lock is the reference count, the kernel
+    drops it when a worker dies. Sizes of the entries, their total and
+    the LRU order are kept in a sqlite index in the same folder; least
+    recently used entries without references are removed above max_bytes
+    """
+
+    def __init__(self, folder: str | Path, max_bytes: int, name: str = "shared_arrays") -> None:
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        with closing(self._connect()) as connection, connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    name TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    used INTEGER NOT NULL
+                )
+                """
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS total (id INTEGER PRIMARY KEY, size INTEGER NOT NULL)"
+            )
+            connection.execute("BEGIN IMMEDIATE")
+            if connection.execute(
+                "INSERT OR IGNORE INTO total (id, size) VALUES (0, 0)"
+            ).rowcount == 1:
+                self._index_files(connection)
+        STAGE_CACHES[name] = self
+
+    def _connect(self) -> sqlite3.Connection:
+        # Отдельное соединение на операцию: индекс общий для процессов узла
+        connection = sqlite3.connect(self.folder / INDEX_DB_NAME, timeout=DB_TIMEOUT)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _index_files(self, connection: sqlite3.Connection) -> None:
+        # Записи, оставшиеся в папке от версии без индекса
+        total = 0
+        for path in self.folder.glob(f"*{ENTRY_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            connection.execute(
+                "INSERT OR IGNORE INTO entries (name, size, used) VALUES (?, ?, ?)",
+                (path.stem, stat.st_size, stat.st_mtime_ns),
+            )
+            total += stat.st_size
+        connection.execute("UPDATE total SET size = ? WHERE id = 0", (total,))
+
+    def entry_name(self, key: Hashable) -> str:
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def entry_path(self, key: Hashable) -> Path:
+        return self.folder / f"{self.entry_name(key)}{ENTRY_SUFFIX}"
+
+    def get(self, key: Hashable) -> tuple[dict[str, Any], dict[str, NDArray]] | None:
+        """
+        Returns: metadata and read-only arrays of the entry or None
+        """
+        return self.get_many([key]).get(key)
+
+    def get_many(
+        self,
+        keys: list[Hashable],
+    ) -> dict[Hashable, tuple[dict[str, Any], dict[str, NDArray]]]:
+        """
+        Attaches the entries of keys, the LRU order is updated once
+        Returns: metadata and read-only arrays of the found entries by key
+        """
+        entries = dict()
+        for key in keys:
+            try:
+                entries[key] = _attach(self.entry_path(key))
+            except (OSError, ValueError):
+                self.misses += 1
+                continue
+            self.hits += 1
+        if len(entries) > 0:
+            used = time.time_ns()
+            try:
+                with closing(self._connect()) as connection, connection:
+                    connection.executemany(
+                        "UPDATE entries SET used = ? WHERE name = ?",
+                        [(used, self.entry_name(key)) for key in entries],
+                    )
+            except sqlite3.Error as e:
+                # Записи подключены, не обновлен только порядок вытеснения
+                logger.warning("shared cache index %s: %s", self.folder, e)
+        return entries
+
+    def set(
+        self,
+        key: Hashable,
+        meta: dict[str, Any],
+        arrays: dict[str, NDArray],
+    ) -> tuple[dict[str, Any], dict[str, NDArray]]:
+        """
+        Stores the entry and returns it attached from the cache;
+        when the folder is full or the entries in it are referenced
+        the given arrays are returned as is
+        """
+        return self.set_many([(key, meta, arrays)])[0]
+
+    def set_many(
+        self,
+        items: list[tuple[Hashable, dict[str, Any], dict[str, NDArray]]],
+    ) -> list[tuple[dict[str, Any], dict[str, NDArray]]]:
+        """
+        Stores the entries (key, meta, arrays), evicting once for all of them
+        Returns: the entries attached from the cache in the order of items;
+            entries that do not fit are returned with the given arrays
+        """
+        entries = []
+        written = []
+        for key, meta, arrays in items:
+            arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+            entries.append((meta, arrays))
+            try:
+                tmp_name, size = self._write_entry(meta, arrays)
+            except (OSError, ValueError):
+                # Запись больше кэша или нет места в папке: массивы
+                # остаются в процессе
+                continue
+            written.append((len(entries) - 1, self.entry_name(key), tmp_name, size))
+        if len(written) == 0:
+            return entries
+
+        try:
+            with closing(self._connect()) as connection, connection:
+                # Вытеснение и добавление - одна транзакция на весь узел
+                connection.execute("BEGIN IMMEDIATE")
+                total = self._total(connection)
+                stored = self._sizes(connection, [name for _, name, _, _ in written])
+                reserve = sum(size for _, _, _, size in written) - sum(stored.values())
+                total -= self._evict(connection, total + reserve)
+                for idx, name, tmp_name, size in written:
+                    stored_size = self._sizes(connection, [name]).get(name, 0)
+                    if total - stored_size + size > self.max_bytes:
+                        # Места не освободилось: записи держат другие обращения
+                        continue
+                    path = self.folder / f"{name}{ENTRY_SUFFIX}"
+                    # Запись появляется целиком; одновременная запись того же
+                    # ключа другим процессом просто заменяет файл. Вытеснить ее
+                    # до подключения нельзя: индекс занят этой транзакцией
+                    os.replace(tmp_name, path)
+                    entries[idx] = _attach(path)
+                    connection.execute(
+                        """
+                        INSERT INTO entries (name, size, used) VALUES (?, ?, ?)
+                        ON CONFLICT (name) DO UPDATE SET
+                            size = excluded.size, used = excluded.used
+                        """,
+                        (name, size, time.time_ns()),
+                    )
+                    total += size - stored_size
+                connection.execute("UPDATE total SET size = ? WHERE id = 0", (total,))
+        except (sqlite3.Error, OSError, ValueError) as e:
+            logger.warning("shared cache %s: %s", self.folder, e)
+        finally:
+            for _, _, tmp_name, _ in written:
+                Path(tmp_name).unlink(missing_ok=True)
+        return entries
+
+    def _write_entry(self, meta: dict[str, Any], arrays: dict[str, NDArray]) -> tuple[str, int]:
+        # Временный файл записи; возвращает его имя и размер
+        refs, offset = [], 0
+        for name, array in arrays.items():
+            refs.append({
+                "name": name, "dtype": array.dtype.str,
+                "shape": list(array.shape), "offset": offset,
+            })
+            offset = _aligned(offset + array.nbytes)
+        header = json.dumps({"meta": meta, "arrays": refs}).encode()
+        data_start = _aligned(_HEADER.size + len(header))
+        size = data_start + offset
+        if size > self.max_bytes:
+            raise ValueError(f"entry of {size} bytes is larger than the cache")
+
+        fd, tmp_name = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+        try:
+            with open(fd, "wb") as f:
+                f.write(_HEADER.pack(_MAGIC, len(header)) + header)
+                for ref, array in zip(refs, arrays.values()):
+                    f.seek(data_start + ref["offset"])
+                    f.write(memoryview(array).cast("B"))
+                f.truncate(size)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        return tmp_name, size
+
+    def evict(self, reserve: int = 0) -> int:
+        """
+        Removes unreferenced entries, oldest first, until the entries
+        and reserve bytes fit into max_bytes
+        Returns: number of removed entries
+        """
+        with closing(self._connect()) as connection, connection:
+            connection.execute("BEGIN IMMEDIATE")
+            total = self._total(connection)
+            before = connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            total -= self._evict(connection, total + reserve)
+            connection.execute("UPDATE total SET size = ? WHERE id = 0", (total,))
+            return before - connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _evict(self, connection: sqlite3.Connection, required: int) -> int:
+        # Удаляет записи, пока required байт не поместятся; возвращает
+        # освобожденные байты. Строки читаются, пока не хватит места
+        freed = 0
+        removed = []
+        if required > self.max_bytes:
+            for name, size in connection.execute(
+                "SELECT name, size FROM entries ORDER BY used"
+            ):
+                if required - freed <= self.max_bytes:
+                    break
+                if _remove_unreferenced(self.folder / f"{name}{ENTRY_SUFFIX}"):
+                    removed.append((name,))
+                    freed += size
+        connection.executemany("DELETE FROM entries WHERE name = ?", removed)
+        return freed
+
+    @staticmethod
+    def _total(connection: sqlite3.Connection) -> int:
+        return connection.execute("SELECT size FROM total WHERE id = 0").fetchone()[0]
+
+    @staticmethod
+    def _sizes(connection: sqlite3.Connection, names: list[str]) -> dict[str, int]:
+        sizes = dict()
+        for name in set(names):
+            row = connection.execute(
+                "SELECT size FROM entries WHERE name = ?", (name,)
+            ).fetchone()
+            if row is not None:
+                sizes[name] = row[0]
+        return sizes
+
+    def clear(self) -> None:
+        self.evict(self.max_bytes + 1)
+
+    def size(self) -> int:
+        with closing(self._connect()) as connection:
+            return self._total(connection)
+
+    def __contains__(self, key: Hashable) -> bool:
+        # Без учета в статистике и без подключения записи
+        return self.entry_path(key).exists()
+
+    def __len__(self) -> int:
+        with closing(self._connect()) as connection:
+            return connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _attach(path: Path) -> tuple[dict[str, Any], dict[str, NDArray]]:
+    with open(path, "rb") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+        # mmap дублирует дескриптор файла: блокировка держится, пока
+        # существует отображение, т.е. пока живы массивы записи
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, header_size = _HEADER.unpack_from(buffer)
+    if magic != _MAGIC:
+        raise ValueError(f"not a cache entry: {path}")
+    header = json.loads(buffer[_HEADER.size:_HEADER.size + header_size])
+    data_start = _aligned(_HEADER.size + header_size)
+    arrays = dict()
+    for ref in header["arrays"]:
+        dtype = np.dtype(ref["dtype"])
+        count = int(np.prod(ref["shape"]))
+        arrays[ref["name"]] = np.frombuffer(
+            buffer, dtype=dtype, count=count, offset=data_start + ref["offset"]
+        ).reshape(ref["shape"])
+    return header["meta"], arrays
+
+
+def _remove_unreferenced(path: Path) -> bool:
+    # Запись удаляется, только если ее не держит ни один процесс;
+    # True - записи больше нет в папке
+    try:
+        with open(path, "rb") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            path.unlink()
+    except BlockingIOError:
+        return False
+    except FileNotFoundError:
+        pass
+    return True
+
+
+_shared_cache: SharedArrayCache | None = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache() -> SharedArrayCache | None:
+    """
+    Cache of the host set by SPITEC_SHARED_CACHE_MB, None when disabled
+    """
+    global _shared_cache
+    size_mb = float(os.environ.get(SHARED_CACHE_ENV) or 0)
+    if size_mb <= 0:
+        return None
+    folder = os.environ.get(SHARED_CACHE_FOLDER_ENV)
+    if not folder:
+        memory = Path("/dev/shm")
+        folder = (memory if memory.is_dir() else Path(tempfile.gettempdir())) / (
+            f"{SHARED_CACHE_FOLDER_NAME}-{os.getuid()}"
+        )
+    max_bytes = int(size_mb * 2**20)
+    with _shared_cache_lock:
+        if (
+            _shared_cache is None
+            or _shared_cache.folder != Path(folder)
+            or _shared_cache.max_bytes != max_bytes
+        ):
+            _shared_cache = SharedArrayCache(folder, max_bytes)
+        return _shared_cache
@@ -1,12 +1,11 @@
 from pathlib import Path
-import h5py
 from enum import Enum
 import numpy as np
 from numpy.typing import NDArray
 from numpy import pi, sin, cos, arccos
-import requests
 import json
 import hashlib
+from spitec.monitoring.metrics import timed, download_bytes
 
 
 DOWNLOAD_URL = "https://simurg.space/gen_file?data=obs&date="
@@ -22,7 +21,10 @@ class Coordinate(Enum):
     lon = "longitude"
 
 
+@timed("load_data")
 def load_data(filename: str, local_file: str | Path):
+    import requests
+
     url = DOWNLOAD_URL + filename
     max_load_per = 100
     with open(local_file, "wb") as f:
@@ -33,6 +35,7 @@ def load_data(filename: str, local_file: str | Path):
 
         if total_length is None:
             f.write(response.content)
+            download_bytes.inc("load_data", len(response.content))
         else:
             dl = 0
             previous = 0
@@ -40,6 +43,7 @@ def load_data(filename: str, local_file: str | Path):
             for chunk in response.iter_content(chunk_size=4096):
                 dl += len(chunk)
                 f.write(chunk)
+                download_bytes.inc("load_data", len(chunk))
                 done = int(max_load_per * dl / total_length)
                 if done > previous:
                     yield done
@@ -47,6 +51,8 @@ def load_data(filename: str, local_file: str | Path):
                 
 
 def сheck_file_size(filename: str) -> int:
+    import requests
+
     url = DOWNLOAD_URL + filename
     response = requests.get(url, stream=True)
     if response.status_code != 200:
@@ -83,9 +89,12 @@ def load_data_json(file_name: Path | str) -> dict:
         return None
 
 
+@timed("get_sites_coords")
 def get_sites_coords(
     local_file: str | Path,
 ) -> dict[Site, dict[Coordinate, float]]:
+    import h5py
+
     f = h5py.File(local_file)
     sites = list(f.keys())
     coords = dict()
@@ -0,0 +1,61 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable
+import threading
+
+
+class StageCache:
+    """
+    In-process LRU cache for intermediate results of the render pipeline
+    Counts hits and misses so that cache efficiency can be measured
+    """
+
+    def __init__(self, name: str, maxsize: int) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        STAGE_CACHES[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        # Без учета в статистике и без обновления порядка LRU
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+STAGE_CACHES: dict[str, StageCache] = dict()
+
+
+def file_version(local_file: str | Path) -> tuple[str, int]:
+    # Ключ версии файла: путь и время изменения
+    local_file = Path(local_file)
+    try:
+        mtime = local_file.stat().st_mtime_ns
+    except OSError:
+        mtime = 0
+    return str(local_file), mtime
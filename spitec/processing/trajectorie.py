@@ -1,7 +1,8 @@
 from spitec.processing.site_processing import Site
 from spitec.processing.data_processing import Sat
 import numpy as np
-from datetime import timedelta
+from numpy.typing import NDArray
+from datetime import timedelta, timezone
 from numpy import sin, cos, arcsin, pi
 
 RE_km = 6371
@@ -26,6 +27,24 @@ def sub_ionospheric(s_lat, s_lon, hm, az, el, R=RE_km):
     return lat, lon
 
 
+def sub_ionospheric_points(s_lat, s_lon, hm, az, el, R=RE_km):
+    """
+    Vectorized sub_ionospheric for arrays of azimuth and elevation
+    of one site
+    Parameters:
+        s_lat, s_lon - site latitude and longitude in radians
+        hm - ionposheric maximum height (km)
+        az, el - arrays of azimuth and elevation in radians
+    """
+    psi = pi / 2 - el - arcsin(cos(el) * R / (R + hm))
+    lat = arcsin(sin(s_lat) * cos(psi) + cos(s_lat) * sin(psi) * cos(az))
+    lon = s_lon + arcsin(sin(psi) * sin(az) / cos(lat))
+
+    lon = np.where(lon > pi, lon - 2 * pi, lon)
+    lon = np.where(lon < -pi, lon + 2 * pi, lon)
+    return lat, lon
+
+
 class Trajectorie:
     
     def __init__(
@@ -74,7 +93,24 @@ class Trajectorie:
         self.idx_start_point = 0
         self.idx_end_point = len(self.traj_lon) - 1 if len(self.traj_lat) != 0 else 0
 
- 
+    def add_user_points(
+            self,
+            times: NDArray,
+            lats: NDArray,
+            lons: NDArray,
+            hms: NDArray
+        ) -> None:
+        import pandas as pd
+
+        # times - datetime64 в UTC, остальные - float64
+        times_utc = pd.DatetimeIndex(times).tz_localize(timezone.utc)
+        self.times = np.array(times_utc.to_pydatetime())
+        self.traj_lat = np.asarray(lats).astype(object)
+        self.traj_lon = np.asarray(lons).astype(object)
+        self.traj_hm = np.asarray(hms).astype(object)
+
+        self.adding_artificial_value()
+
     def adding_artificial_value(self, minutes: int = 10) -> None:
         # Добавлеем в lat и lon значение None там, где разрыв во времени больше minutes мин
         interval = timedelta(minutes=minutes)
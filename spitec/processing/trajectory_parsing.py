@@ -0,0 +1,108 @@
+from io import BytesIO
+import base64
+import numpy as np
+from numpy.typing import NDArray
+
+
+MAX_TRAJECTORY_FILE_SIZE = 64 * 1024 * 1024  # байт
+TRAJECTORY_CHUNK_ROWS = 100_000
+TRAJECTORY_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+TRAJECTORY_COLUMNS = ["time", "lon", "lat", "hm"]
+_HEADER_LINES = 1
+
+
+class TrajectoryFileError(ValueError):
+    def __init__(self, message: str, row: int | None = None) -> None:
+        super().__init__(message)
+        self.row = row  # номер строки в файле, начиная с 1
+
+
+class TrajectoryFileSizeError(TrajectoryFileError):
+    pass
+
+
+def decode_trajectory_upload(
+    contents: str, max_size: int = MAX_TRAJECTORY_FILE_SIZE
+) -> bytes:
+    """
+    Decodes dcc.Upload contents ("data:<type>;base64,<data>")
+    Raises TrajectoryFileSizeError before decoding if the payload
+    exceeds max_size bytes
+    """
+    _, content_string = contents.split(",", 1)
+    # base64 увеличивает размер в 4/3 раза
+    if len(content_string) * 3 // 4 > max_size:
+        raise TrajectoryFileSizeError(
+            f"trajectory file is larger than {max_size} bytes"
+        )
+    return base64.b64decode(content_string)
+
+
+def parse_trajectory_csv(
+    data: bytes,
+    date: str,
+    chunk_rows: int = TRAJECTORY_CHUNK_ROWS,
+) -> tuple[NDArray, NDArray, NDArray, NDArray]:
+    """
+    Parses a "Time, Longitude, Latitude, Hm" file in chunks
+    Parameters:
+        data - file contents with a header line
+        date - date of the opened daily file, 'YYYY-MM-DD'
+        chunk_rows - number of rows converted at once
+    Returns times (datetime64[s], UTC), lon, lat, hm (float64)
+    """
+    import pandas as pd
+
+    reader = pd.read_csv(
+        BytesIO(data),
+        header=None,
+        skiprows=_HEADER_LINES,
+        names=TRAJECTORY_COLUMNS,
+        usecols=range(len(TRAJECTORY_COLUMNS)),
+        dtype={TRAJECTORY_COLUMNS[0]: str},
+        skipinitialspace=True,
+        chunksize=chunk_rows,
+    )
+    times, lons, lats, hms = [], [], [], []
+    try:
+        for chunk in reader:
+            if len(chunk) == 0:
+                continue
+            first_row = int(chunk.index[0]) + _HEADER_LINES + 1
+
+            chunk_times = pd.to_datetime(
+                date + " " + chunk["time"].str.strip(),
+                format=TRAJECTORY_TIME_FORMAT,
+                errors="coerce",
+            ).to_numpy(dtype="datetime64[s]")
+            invalid = np.isnat(chunk_times)
+
+            values = []
+            for column in TRAJECTORY_COLUMNS[1:]:
+                column_values = pd.to_numeric(
+                    chunk[column], errors="coerce"
+                ).to_numpy(dtype=np.float64)
+                invalid |= ~np.isfinite(column_values)
+                values.append(column_values)
+
+            if invalid.any():
+                row = first_row + int(np.argmax(invalid))
+                raise TrajectoryFileError(f"invalid value in row {row}", row)
+
+            times.append(chunk_times)
+            lons.append(values[0])
+            lats.append(values[1])
+            hms.append(values[2])
+    except (pd.errors.ParserError, ValueError) as err:
+        if isinstance(err, TrajectoryFileError):
+            raise
+        raise TrajectoryFileError(str(err)) from err
+
+    if len(times) == 0:
+        raise TrajectoryFileError("trajectory file has no data rows")
+    return (
+        np.concatenate(times),
+        np.concatenate(lons),
+        np.concatenate(lats),
+        np.concatenate(hms),
+    )
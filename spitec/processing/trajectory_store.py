@@ -0,0 +1,93 @@
+from pathlib import Path
+from functools import lru_cache
+import hashlib
+import os
+import tempfile
+import numpy as np
+from numpy.typing import NDArray
+from spitec.processing.trajectorie import Trajectorie
+
+
+TRAJECTORIES_FOLDER_NAME = "trajectories"
+TRAJECTORY_CACHE_SIZE = 8
+
+
+def get_trajectories_folder(data_folder: Path | str) -> Path:
+    folder = Path(data_folder) / TRAJECTORIES_FOLDER_NAME
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder
+
+
+def save_trajectory(
+    folder: Path | str,
+    times: NDArray,
+    lats: NDArray,
+    lons: NDArray,
+    hms: NDArray,
+) -> str:
+    """
+    Saves trajectory arrays to <folder>/<id>.npz and returns id
+    The id is a hash of the arrays, so the same file uploaded
+    several times is stored once
+    """
+    arrays = {
+        "times": np.asarray(times, dtype="datetime64[s]"),
+        "lat": np.asarray(lats, dtype=np.float64),
+        "lon": np.asarray(lons, dtype=np.float64),
+        "hm": np.asarray(hms, dtype=np.float64),
+    }
+    hash_object = hashlib.sha256()
+    for name, values in arrays.items():
+        hash_object.update(name.encode("utf-8"))
+        hash_object.update(np.ascontiguousarray(values).tobytes())
+    trajectory_id = hash_object.hexdigest()[:32]
+
+    file_name = Path(folder) / f"{trajectory_id}.npz"
+    if not file_name.exists():
+        # Свое временное имя у каждой записи: тот же файл могут
+        # одновременно сохранять несколько процессов
+        fd, tmp_name = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        try:
+            with open(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_name, file_name)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+    return trajectory_id
+
+
+def load_trajectory(
+    folder: Path | str,
+    trajectory_id: str,
+    name: str,
+) -> Trajectorie | None:
+    file_name = Path(folder) / f"{trajectory_id}.npz"
+    if not file_name.exists():
+        return None
+    arrays = _load_trajectory_points(str(file_name))
+    if arrays is None:
+        return None
+    trajectory = Trajectorie(name, None, None, None)
+    trajectory.times, trajectory.traj_lat, trajectory.traj_lon, trajectory.traj_hm = arrays
+    return trajectory
+
+
+@lru_cache(maxsize=TRAJECTORY_CACHE_SIZE)
+def _load_trajectory_points(file_name: str) -> tuple[NDArray] | None:
+    # Файлы не изменяются после записи, поэтому кэшируем по имени
+    try:
+        with np.load(file_name) as data:
+            times, lats, lons, hms = (
+                data["times"], data["lat"], data["lon"], data["hm"]
+            )
+    except (OSError, KeyError, ValueError):
+        return None
+    trajectory = Trajectorie(None, None, None, None)
+    trajectory.add_user_points(times, lats, lons, hms)
+    return (
+        trajectory.times,
+        trajectory.traj_lat,
+        trajectory.traj_lon,
+        trajectory.traj_hm,
+    )
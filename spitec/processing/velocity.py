@@ -0,0 +1,335 @@
+from pathlib import Path
+from typing import Callable, NamedTuple
+from datetime import datetime
+import numpy as np
+from numpy.typing import NDArray
+from spitec.processing.site_processing import Site
+from spitec.processing.data_processing import Sat
+from spitec.processing.data_products import DataProducts
+from spitec.processing.trajectorie import RE_km, sub_ionospheric_points
+from spitec.processing.compute_executor import map_tasks
+from spitec.monitoring.metrics import timed
+
+
+EPOCH_SECONDS = 30
+MAX_LAG_SECONDS = 30 * 60
+# Пар в одном векторизованном пакете и в одном задании пула процессов
+PAIRS_PER_BATCH = 256
+PAIRS_PER_TASK = 4096
+MIN_CORRELATION = 0.6
+# Доля общих отсчетов пары, ниже которой пара не используется
+MIN_OVERLAP = 0.5
+
+
+class SatelliteSeries(NamedTuple):
+    sites: list[Site]
+    times: NDArray  # unix time эпох окна
+    values: NDArray  # [site, epoch], NaN без данных
+    # Средняя подыоносферная точка станции, градусы
+    lat: NDArray
+    lon: NDArray
+
+
+class PairLags(NamedTuple):
+    first: NDArray  # номера станций пары
+    second: NDArray
+    lags: NDArray  # с, запаздывание второй станции относительно первой
+    correlation: NDArray
+
+
+class VelocityEstimate(NamedTuple):
+    velocity: float  # м/с
+    azimuth: float  # направление распространения, градусы от севера
+    slowness: NDArray  # (восток, север), с/км
+    pairs: PairLags
+    baselines: NDArray  # [pair, (восток, север)], км
+    used: NDArray  # пары, вошедшие в оценку
+    rms: float  # с, невязка запаздываний
+
+
+def read_satellite_series(
+    local_file: str | Path,
+    sites: list[Site],
+    sat: Sat,
+    product: DataProducts,
+    hm: float,
+    start: datetime,
+    end: datetime,
+) -> SatelliteSeries:
+    """
+    Series of one satellite at the stations on a common grid of epochs
+    Parameters:
+        sites - stations, those without the satellite are skipped
+        product - data product, dTEC of one of the bands
+        hm - ionospheric maximum height (km)
+        start, end - time window (inclusive)
+    """
+    import h5py
+
+    first_epoch = np.ceil(start.timestamp() / EPOCH_SECONDS) * EPOCH_SECONDS
+    times = np.arange(first_epoch, end.timestamp() + 1, EPOCH_SECONDS)
+    names, rows, lat, lon = [], [], [], []
+    with h5py.File(local_file, "r") as f:
+        for site in sites:
+            if site not in f or sat not in f[site]:
+                continue
+            group = f[site][sat]
+            if product.hdf_name not in group:
+                continue
+            timestamps = group[DataProducts.timestamp.hdf_name][:]
+            first = np.searchsorted(timestamps, times[0], side="left")
+            last = np.searchsorted(timestamps, times[-1], side="right")
+            if first >= last:
+                continue
+            window = slice(first, last)
+            epochs = np.round((timestamps[window] - times[0]) / EPOCH_SECONDS)
+            row = np.full(len(times), np.nan)
+            row[epochs.astype(np.int64)] = group[product.hdf_name][window]
+            site_lat, site_lon = sub_ionospheric_points(
+                f[site].attrs["lat"],
+                f[site].attrs["lon"],
+                hm,
+                group[DataProducts.azimuth.hdf_name][window],
+                group[DataProducts.elevation.hdf_name][window],
+            )
+            names.append(site)
+            rows.append(row)
+            lat.append(np.degrees(np.mean(site_lat)))
+            lon.append(np.degrees(np.mean(site_lon)))
+    values = np.array(rows) if rows else np.empty((0, len(times)))
+    return SatelliteSeries(names, times, values, np.array(lat), np.array(lon))
+
+
+def local_baselines(series: SatelliteSeries, first: NDArray, second: NDArray) -> NDArray:
+    # Базы пар в плоскости, касательной в центре группы точек, км
+    lat0 = np.radians(np.mean(series.lat))
+    lon = np.radians(series.lon)
+    dlon = np.angle(np.exp(1j * (lon[second] - lon[first])))
+    east = RE_km * dlon * np.cos(lat0)
+    north = RE_km * np.radians(series.lat[second] - series.lat[first])
+    return np.column_stack((east, north))
+
+
+class SeriesSpectra(NamedTuple):
+    # Спектры рядов, их квадратов и масок наличия данных
+    values: NDArray
+    squares: NDArray
+    masks: NDArray
+    counts: NDArray  # число отсчетов ряда
+    n_fft: int
+    max_lag: int
+
+
+def series_spectra(values: NDArray, max_lag: int) -> SeriesSpectra:
+    # Ряды без среднего, пропуски - нули; длина FFT без циклического наложения
+    valid = ~np.isnan(values)
+    counts = valid.sum(axis=1)
+    centered = np.where(valid, values, 0)
+    means = centered.sum(axis=1, keepdims=True) / np.maximum(counts, 1)[:, np.newaxis]
+    centered = np.where(valid, centered - means, 0)
+    n_fft = _fft_size(values.shape[1] + max_lag)
+    return SeriesSpectra(
+        np.fft.rfft(centered, n_fft, axis=1),
+        np.fft.rfft(centered ** 2, n_fft, axis=1),
+        np.fft.rfft(valid.astype(np.float64), n_fft, axis=1),
+        counts,
+        n_fft,
+        max_lag,
+    )
+
+
+def _fft_size(size: int) -> int:
+    # Ближайшая сверху длина вида 2^a 3^b 5^c: FFT такой длины быстрое
+    best = 1 << int(np.ceil(np.log2(size)))
+    power5 = 1
+    while power5 < best:
+        power35 = power5
+        while power35 < best:
+            candidate = power35 * (1 << max(int(np.ceil(np.log2(size / power35))), 0))
+            best = min(best, candidate)
+            power35 *= 3
+        power5 *= 5
+    return best
+
+
+def _correlate_task(
+    first: NDArray,
+    second: NDArray,
+    n_fft: int,
+    max_lag: int,
+    **arrays: NDArray,
+) -> tuple[NDArray, NDArray]:
+    # Спектры приходят в процесс пула через разделяемую память
+    spectra = SeriesSpectra(n_fft=n_fft, max_lag=max_lag, **arrays)
+    return correlate_pairs(spectra, first, second)
+
+
+def correlate_pairs(
+    spectra: SeriesSpectra,
+    first: NDArray,
+    second: NDArray,
+) -> tuple[NDArray, NDArray]:
+    """
+    Lags of the maximum of the normalized cross-correlation of the pairs
+    Energies are taken over the common samples at every lag, otherwise
+    the shrinking overlap of the passes biases the lags towards zero
+    Pairs are processed in batches of PAIRS_PER_BATCH: one inverse FFT
+    for the whole batch
+    Returns: lags in samples (with parabolic refinement) and correlation
+    """
+    n_fft, max_lag = spectra.n_fft, spectra.max_lag
+    lags = np.empty(len(first))
+    correlation = np.empty(len(first))
+    # Запаздывания -max_lag..max_lag в порядке возрастания
+    shifts = np.r_[n_fft - max_lag:n_fft, 0:max_lag + 1]
+    for batch_start in range(0, len(first), PAIRS_PER_BATCH):
+        batch = slice(batch_start, batch_start + PAIRS_PER_BATCH)
+        i, j = first[batch], second[batch]
+        # c[k] = sum x_i(t) x_j(t + k): максимум при k > 0 - j запаздывает
+        products = np.empty((4, len(i), spectra.values.shape[1]), dtype=np.complex128)
+        np.multiply(np.conj(spectra.values[i]), spectra.values[j], out=products[0])
+        np.multiply(np.conj(spectra.squares[i]), spectra.masks[j], out=products[1])
+        np.multiply(np.conj(spectra.masks[i]), spectra.squares[j], out=products[2])
+        np.multiply(np.conj(spectra.masks[i]), spectra.masks[j], out=products[3])
+        cross, energy_i, energy_j, overlap = np.fft.irfft(
+            products, n_fft, axis=2
+        )[:, :, shifts]
+        min_overlap = MIN_OVERLAP * np.minimum(
+            spectra.counts[i], spectra.counts[j]
+        )[:, np.newaxis]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cross /= np.sqrt(np.maximum(energy_i * energy_j, 0))
+        cross[(overlap < min_overlap - 0.5) | ~np.isfinite(cross)] = -np.inf
+        peak = np.argmax(cross, axis=1)
+        rows = np.arange(len(peak))
+        # Уточнение максимума по параболе через три соседних отсчета
+        left = cross[rows, np.maximum(peak - 1, 0)]
+        center = cross[rows, peak]
+        right = cross[rows, np.minimum(peak + 1, cross.shape[1] - 1)]
+        denominator = left - 2 * center + right
+        with np.errstate(invalid="ignore", divide="ignore"):
+            offset = np.where(
+                np.isfinite(denominator) & (denominator < 0),
+                0.5 * (left - right) / denominator,
+                0,
+            )
+        lags[batch] = peak - max_lag + np.clip(offset, -0.5, 0.5)
+        correlation[batch] = np.where(np.isfinite(center), center, np.nan)
+    return lags, correlation
+
+
+def compute_pair_lags(
+    series: SatelliteSeries,
+    max_lag_seconds: float = MAX_LAG_SECONDS,
+    workers: int | None = None,
+    progress: Callable[[int], None] | None = None,
+) -> PairLags:
+    """
+    Cross-correlation lags of all pairs of stations with enough common
+    samples
+    Parameters:
+        workers - number of processes, 1 - in the calling process,
+            None - see compute_workers
+        progress - called with the percentage of processed pairs
+    """
+    max_lag = int(max_lag_seconds // EPOCH_SECONDS)
+    valid = (~np.isnan(series.values)).astype(np.float64)
+    # Число общих отсчетов всех пар одним матричным произведением
+    overlap = valid @ valid.T
+    counts = valid.sum(axis=1)
+    first, second = np.triu_indices(len(series.sites), k=1)
+    enough = overlap[first, second] >= MIN_OVERLAP * np.minimum(counts[first], counts[second])
+    enough &= overlap[first, second] > 2 * max_lag
+    first, second = first[enough], second[enough]
+    if len(first) == 0:
+        empty = np.array([])
+        return PairLags(first, second, empty, empty)
+
+    # Эпохи без данных ни на одной станции не участвуют в FFT
+    has_data = np.flatnonzero(valid.any(axis=0))
+    values = series.values[:, has_data[0]:has_data[-1] + 1]
+    spectra = series_spectra(values, max_lag)
+    tasks = [
+        (
+            first[i:i + PAIRS_PER_TASK],
+            second[i:i + PAIRS_PER_TASK],
+            spectra.n_fft,
+            spectra.max_lag,
+        )
+        for i in range(0, len(first), PAIRS_PER_TASK)
+    ]
+    arrays = dict(
+        values=spectra.values,
+        squares=spectra.squares,
+        masks=spectra.masks,
+        counts=spectra.counts,
+    )
+    results = map_tasks(_correlate_task, tasks, arrays, workers, progress)
+    lags = np.concatenate([result[0] for result in results]) * EPOCH_SECONDS
+    correlation = np.concatenate([result[1] for result in results])
+    return PairLags(first, second, lags, correlation)
+
+
+def fit_velocity(
+    series: SatelliteSeries,
+    pairs: PairLags,
+    min_correlation: float = MIN_CORRELATION,
+) -> VelocityEstimate | None:
+    """
+    Plane-wave fit of the lags: lag = baseline * slowness
+    Weighted least squares over the pairs with correlation above the
+    threshold, a second pass drops pairs with residuals above 3 sigma
+    Returns: None if there are not enough correlated pairs
+    """
+    baselines = local_baselines(series, pairs.first, pairs.second)
+    used = pairs.correlation >= min_correlation
+    for _ in range(2):
+        if used.sum() < 3:
+            return None
+        weights = np.sqrt(pairs.correlation[used])
+        slowness, *_ = np.linalg.lstsq(
+            baselines[used] * weights[:, np.newaxis],
+            pairs.lags[used] * weights,
+            rcond=None,
+        )
+        residuals = pairs.lags - baselines @ slowness
+        rms = float(np.sqrt(np.mean(residuals[used] ** 2)))
+        used &= np.abs(residuals) <= max(3 * rms, EPOCH_SECONDS)
+    speed = np.hypot(*slowness)
+    return VelocityEstimate(
+        float(1000 / speed) if speed > 0 else np.inf,
+        float(np.degrees(np.arctan2(slowness[0], slowness[1])) % 360),
+        slowness,
+        pairs,
+        baselines,
+        used,
+        rms,
+    )
+
+
+@timed("estimate_velocity")
+def estimate_velocity(
+    local_file: str | Path,
+    sites: list[Site],
+    sat: Sat,
+    product: DataProducts,
+    hm: float,
+    start: datetime,
+    end: datetime,
+    workers: int | None = None,
+    progress: Callable[[int], None] | None = None,
+) -> VelocityEstimate | None:
+    """
+    Velocity and azimuth of a traveling ionospheric disturbance seen by
+    one satellite at a group of stations
+    Parameters:
+        sites - stations, e.g. selected with select_sites_in_circle
+        product - dTEC of one of the bands
+        hm - ionospheric maximum height (km)
+        start, end - time window
+        workers - number of processes for the pairs
+        progress - called with the percentage of processed pairs
+    """
+    series = read_satellite_series(local_file, sites, sat, product, hm, start, end)
+    pairs = compute_pair_lags(series, workers=workers, progress=progress)
+    return fit_velocity(series, pairs)
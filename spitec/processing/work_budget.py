@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+import math
+import os
+
+
+# Бюджеты одного запроса; 0 - без ограничения
+MAX_SITES_ENV = "SPITEC_MAX_SITES"
+MAX_SAMPLES_ENV = "SPITEC_MAX_SAMPLES"
+MAX_READ_MB_ENV = "SPITEC_MAX_READ_MB"
+DEFAULT_MAX_SITES = 100
+DEFAULT_MAX_SAMPLES = 500_000
+DEFAULT_MAX_READ_MB = 256
+
+
+@dataclass(frozen=True)
+class WorkBudget:
+    """
+    Work allowed to a single request. Requests above the budget are
+    degraded instead of refused: the first stations that fit are drawn
+    and the series are decimated
+    Parameters:
+        max_sites - stations drawn on the plots
+        max_samples - samples of all the traces of a figure
+        max_read_bytes - bytes read from the daily file
+    """
+    max_sites: int = DEFAULT_MAX_SITES
+    max_samples: int = DEFAULT_MAX_SAMPLES
+    max_read_bytes: int = DEFAULT_MAX_READ_MB * 2**20
+
+    @classmethod
+    def from_env(cls) -> "WorkBudget":
+        def value(name: str, default: float) -> float:
+            return float(os.environ.get(name) or default)
+
+        return cls(
+            max_sites=int(value(MAX_SITES_ENV, DEFAULT_MAX_SITES)),
+            max_samples=int(value(MAX_SAMPLES_ENV, DEFAULT_MAX_SAMPLES)),
+            max_read_bytes=int(value(MAX_READ_MB_ENV, DEFAULT_MAX_READ_MB) * 2**20),
+        )
+
+
+def plan_sites(
+    sites: list[str],
+    read_bytes: dict[str, int],
+    budget: WorkBudget,
+) -> list[str]:
+    """
+    Leading stations of sites that fit in the budget, at least one
+    Parameters:
+        read_bytes - bytes to be read for the station, stations that
+            are not in it cost nothing (cached or without data)
+    """
+    if budget.max_sites > 0:
+        sites = sites[:budget.max_sites]
+    if budget.max_read_bytes <= 0:
+        return sites
+    total = 0
+    for idx, site in enumerate(sites):
+        total += read_bytes.get(site, 0)
+        if total > budget.max_read_bytes and idx > 0:
+            return sites[:idx]
+    return sites
+
+
+def decimation_step(n_samples: int, max_samples: int) -> int:
+    # Шаг прореживания, при котором отсчетов не больше max_samples
+    if max_samples <= 0 or n_samples <= max_samples:
+        return 1
+    return math.ceil(n_samples / max_samples)
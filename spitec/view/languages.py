@@ -14,6 +14,10 @@ languages = {
             "share": "Поделиться",
             "cancel": "Отмена",
             "upload-data": "Выгрузить данные",
+            "build": "Построить",
+            "detect-events": "Найти события",
+            "add-event-tags": "Добавить метки",
+            "estimate-velocity": "Оценить скорость",
         },
         "graph-site-map": {
             "title": "Карта",
@@ -29,6 +33,8 @@ languages = {
             "graph-site-data": {
                 "title": "Данные",
                 "xaxis": "Время",
+                "limited-sites": "Показаны {shown} из {total} станций",
+                "decimated": "ряды прорежены с шагом {step}",
             },
             "selection-satellites": "Спутник",
             "selection-events": "Событие",
@@ -70,6 +76,39 @@ languages = {
             "example": "Пример:",
             "format": "Time, Longitude, Latitude, Hm",
             "format-example": "02:41:30, 24.8, -15.4, 300",
+            "error-row": " (строка {row})",
+            "error-size": "Размер файла превышает {size} Мб",
+        },
+        "tab-analysis": {
+            "label": "Анализ",
+            "title-grid-map": "Карта подионосферных точек по сетке",
+            "graph-analysis": "Анализ",
+            "epoch": "Эпоха",
+            "window": "Окно",
+            "mean": "Среднее",
+            "median": "Медиана",
+            "count": "Число точек",
+            "grid-step": "Шаг (°)",
+            "title-animation": "Анимация подионосферных точек",
+            "animation-step": "Шаг (с)",
+            "frame": "Кадр",
+            "title-keogram": "Кеограмма",
+            "keogram-lat": "Широта",
+            "keogram-lon": "Долгота",
+            "keogram-band": "Полоса (°)",
+            "max": "Максимум",
+            "time": "Время",
+            "title-events": "Обнаруженные события",
+            "no-events": "Событий нет",
+            "title-velocity": "Скорость перемещающегося возмущения",
+            "velocity-hint": "Выбранные станции или станции области, выбранный спутник",
+            "no-velocity": "Недостаточно коррелированных пар станций",
+            "velocity-unit": "м/с",
+            "azimuth": "азимут",
+            "pairs": "пар",
+            "correlation": "Корреляция",
+            "lag": "Запаздывание (с)",
+            "fitted-lag": "Запаздывание плоской волны (с)",
         },
         "download_window": {
             "label": "Дата",
@@ -111,6 +150,10 @@ languages = {
             "share": "Share",
             "cancel": "Cancel",
             "upload-data": "Upload data",
+            "build": "Build",
+            "detect-events": "Detect events",
+            "add-event-tags": "Add tags",
+            "estimate-velocity": "Estimate velocity",
         },
         "graph-site-map": {
             "title": "Sites Map",
@@ -126,6 +169,8 @@ languages = {
             "graph-site-data": {
                 "title": "Data products series",
                 "xaxis": "Time",
+                "limited-sites": "Showing {shown} of {total} sites",
+                "decimated": "series decimated with step {step}",
             },
             "selection-satellites": "Satellite",
             "selection-events": "Event",
@@ -167,6 +212,39 @@ languages = {
             "example": "Example:",
             "format": "Time, Longitude, Latitude, Hm",
             "format-example": "02:41:30, 24.8, -15.4, 300",
+            "error-row": " (line {row})",
+            "error-size": "File size exceeds {size} MB",
+        },
+        "tab-analysis": {
+            "label": "Analysis",
+            "title-grid-map": "Gridded map of pierce points",
+            "graph-analysis": "Analysis",
+            "epoch": "Epoch",
+            "window": "Window",
+            "mean": "Mean",
+            "median": "Median",
+            "count": "Number of points",
+            "grid-step": "Step (°)",
+            "title-animation": "Animation of pierce points",
+            "animation-step": "Step (s)",
+            "frame": "Frame",
+            "title-keogram": "Keogram",
+            "keogram-lat": "Latitude",
+            "keogram-lon": "Longitude",
+            "keogram-band": "Band (°)",
+            "max": "Maximum",
+            "time": "Time",
+            "title-events": "Detected events",
+            "no-events": "No events",
+            "title-velocity": "Velocity of a traveling disturbance",
+            "velocity-hint": "Selected stations or stations of the region, selected satellite",
+            "no-velocity": "Not enough correlated pairs of stations",
+            "velocity-unit": "m/s",
+            "azimuth": "azimuth",
+            "pairs": "pairs",
+            "correlation": "Correlation",
+            "lag": "Lag (s)",
+            "fitted-lag": "Plane wave lag (s)",
         },
         "download_window": {
             "label": "Date",
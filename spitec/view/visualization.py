@@ -5,6 +5,7 @@ from enum import Enum
 from datetime import datetime, date, timedelta
 from spitec.view.languages import languages
 from spitec.processing.data_products import DataProducts
+from spitec.processing.trajectory_parsing import MAX_TRAJECTORY_FILE_SIZE
 
 
 language = languages["en"]
@@ -30,6 +31,7 @@ def create_layout() -> html.Div:
     tab_sampling_region.extend(form_great_circle_distance)
     tab_add_points = _create_add_points_tab()
     tab_add_trajectories = _create_add_trajectory_tab()
+    tab_analysis = _create_analysis_tab()
 
     size_map = 5
     size_data = 7
@@ -52,11 +54,19 @@ def create_layout() -> html.Div:
             dcc.Store(id="all-select-sip-tag", storage_type="session"),
             dcc.Store(id="current-session-id", storage_type="session"),
             dcc.Store(id="events-options-store", storage_type="session"),
+            dcc.Store(id="detected-events-store", storage_type="session"),
             dcc.Location(id="url", refresh=False),
 
             dcc.Store(id="projection-radio-store", storage_type="session"),
+            # Смена проекции, которую нельзя выполнить в браузере
+            dcc.Store(id="map-projection-request-store"),
             dcc.Store(id="checkbox-site-store", storage_type="session"),
             dcc.Store(id="time-slider-store", storage_type="session"),
+            # Последнее окно времени после остановки ползунка
+            dcc.Store(id="time-slider-request-store"),
+            # Имена и цвета рядов без массивов данных: колбэкам сервера
+            # не нужно отправлять всю фигуру графика
+            dcc.Store(id="site-data-traces-store"),
             dcc.Store(id="selection-data-types-store", storage_type="session"),
             dcc.Store(id="satellite-store", storage_type="session"),
             dcc.Store(id="event-store", storage_type="session"),
@@ -112,6 +122,16 @@ def create_layout() -> html.Div:
                                     },
                                     style={"text-align": "center"},
                                 ),
+                                dbc.Tab(
+                                    tab_analysis,
+                                    label=language["tab-analysis"]["label"],
+                                    label_style={"color": "gray"},
+                                    active_label_style={
+                                        "font-weight": "bold",
+                                        "color": "#2C3E50",
+                                    },
+                                    style={"text-align": "center"},
+                                ),
                             ],
                         ),
                         width={"size": size_data},
@@ -418,13 +438,24 @@ def _create_share_window() -> html.Div:
                             ),
                             html.Div(
                                 [
+                                    dbc.RadioItems(
+                                        options=[
+                                            {"label": "HDF5", "value": "h5"},
+                                            {"label": "NPZ", "value": "npz"},
+                                            {"label": "CSV", "value": "csv"},
+                                        ],
+                                        value="h5",
+                                        id="export-format",
+                                        inline=True,
+                                        style={"margin-bottom": "10px"},
+                                    ),
                                     dbc.Button(
                                         language["buttons"][
                                             "upload-data"
                                         ],
                                         id="upload-data",
                                     ),
-                                    dcc.Download(id="download-data")
+                                    dcc.Location(id="export-location", refresh=True),
                                 ],
                                 style={"text-align": "center", "margin-top": "20px"},
                             ),
@@ -1074,7 +1105,8 @@ def _create_add_trajectory_tab() -> list[dbc.Row]:
                             "border": "1px solid #DEE2E6",
                             "border-radius": "7px",
                         },
-                        multiple=False
+                        multiple=False,
+                        max_size=MAX_TRAJECTORY_FILE_SIZE,
                     ),
                     width=4,
                     style={"margin-left": "-30px"},
@@ -1148,6 +1180,263 @@ def _create_add_trajectory_tab() -> list[dbc.Row]:
     ]
     return tab_add_trajectories
 
+def _create_analysis_tab() -> list[dbc.Row]:
+    analysis_figure = create_analysis_figure()
+    tab_analysis = [
+        dbc.Row(
+            html.Div(
+                language["tab-analysis"]["title-grid-map"],
+            ),
+            style={"margin-top": "30px", "font-size": "20px"},
+        ),
+        dbc.Row(
+            [
+                dbc.Col(
+                    [
+                        dbc.RadioItems(
+                            id="grid-time-mode",
+                            options=[
+                                {
+                                    "label": language["tab-analysis"]["epoch"],
+                                    "value": "epoch",
+                                },
+                                {
+                                    "label": language["tab-analysis"]["window"],
+                                    "value": "window",
+                                },
+                            ],
+                            value="epoch",
+                            inline=True,
+                            persistence=True,
+                            persistence_type="session",
+                            style={"margin-right": "20px", "margin-top": "6px"},
+                        ),
+                        dbc.Select(
+                            id="grid-statistic",
+                            options=[
+                                {
+                                    "label": language["tab-analysis"][statistic],
+                                    "value": statistic,
+                                }
+                                for statistic in ["mean", "median", "count"]
+                            ],
+                            value="mean",
+                            persistence=True,
+                            persistence_type="session",
+                            style={"width": "130px", "margin-right": "20px"},
+                        ),
+                        dbc.Label(language["tab-analysis"]["grid-step"]),
+                        dbc.Input(
+                            id="grid-step",
+                            type="number",
+                            min=0.5,
+                            max=30,
+                            step=0.5,
+                            value=2,
+                            persistence=True,
+                            persistence_type="session",
+                            style={"width": "80px", "margin": "0px 20px 0px 10px"},
+                        ),
+                        dbc.Button(
+                            language["buttons"]["build"],
+                            id="build-grid-map",
+                        ),
+                    ],
+                    style={"display": "flex", "justify-content": "center"},
+                ),
+            ],
+            style={"margin-top": "20px"},
+        ),
+        dbc.Row(
+            html.Div(
+                language["tab-analysis"]["title-animation"],
+            ),
+            style={"margin-top": "30px", "font-size": "20px"},
+        ),
+        dbc.Row(
+            [
+                dbc.Col(
+                    [
+                        dbc.Label(language["tab-analysis"]["animation-step"]),
+                        dbc.Input(
+                            id="animation-step",
+                            type="number",
+                            min=30,
+                            step=30,
+                            value=60,
+                            persistence=True,
+                            persistence_type="session",
+                            style={"width": "90px", "margin": "0px 20px 0px 10px"},
+                        ),
+                        dbc.Button(
+                            language["buttons"]["build"],
+                            id="build-animation",
+                        ),
+                    ],
+                    style={"display": "flex", "justify-content": "center"},
+                ),
+            ],
+            style={"margin-top": "20px"},
+        ),
+        dbc.Row(
+            html.Div(
+                language["tab-analysis"]["title-keogram"],
+            ),
+            style={"margin-top": "30px", "font-size": "20px"},
+        ),
+        dbc.Row(
+            [
+                dbc.Col(
+                    [
+                        dbc.RadioItems(
+                            id="keogram-axis",
+                            options=[
+                                {
+                                    "label": language["tab-analysis"]["keogram-lat"],
+                                    "value": "lat",
+                                },
+                                {
+                                    "label": language["tab-analysis"]["keogram-lon"],
+                                    "value": "lon",
+                                },
+                            ],
+                            value="lat",
+                            inline=True,
+                            persistence=True,
+                            persistence_type="session",
+                            style={"margin-right": "20px", "margin-top": "6px"},
+                        ),
+                        dbc.Label(language["tab-analysis"]["keogram-band"]),
+                        dbc.Input(
+                            id="keogram-band-min",
+                            type="number",
+                            min=-180,
+                            max=180,
+                            value=-180,
+                            persistence=True,
+                            persistence_type="session",
+                            style={"width": "90px", "margin": "0px 5px 0px 10px"},
+                        ),
+                        dbc.Input(
+                            id="keogram-band-max",
+                            type="number",
+                            min=-180,
+                            max=180,
+                            value=180,
+                            persistence=True,
+                            persistence_type="session",
+                            style={"width": "90px", "margin-right": "20px"},
+                        ),
+                        dbc.Select(
+                            id="keogram-statistic",
+                            options=[
+                                {
+                                    "label": language["tab-analysis"][statistic],
+                                    "value": statistic,
+                                }
+                                for statistic in ["mean", "max", "count"]
+                            ],
+                            value="mean",
+                            persistence=True,
+                            persistence_type="session",
+                            style={"width": "130px", "margin-right": "20px"},
+                        ),
+                        dbc.Button(
+                            language["buttons"]["build"],
+                            id="build-keogram",
+                        ),
+                    ],
+                    style={"display": "flex", "justify-content": "center"},
+                ),
+            ],
+            style={"margin-top": "20px"},
+        ),
+        dbc.Row(
+            html.Div(
+                language["tab-analysis"]["title-events"],
+            ),
+            style={"margin-top": "30px", "font-size": "20px"},
+        ),
+        dbc.Row(
+            [
+                dbc.Col(
+                    [
+                        dbc.Button(
+                            language["buttons"]["detect-events"],
+                            id="detect-events",
+                            style={"margin-right": "20px"},
+                        ),
+                        dbc.Select(
+                            id="detected-events",
+                            options=[],
+                            placeholder=language["tab-analysis"]["no-events"],
+                            style={"width": "420px", "margin-right": "20px"},
+                        ),
+                        dbc.Button(
+                            language["buttons"]["add-event-tags"],
+                            id="add-event-tags",
+                        ),
+                    ],
+                    style={"display": "flex", "justify-content": "center"},
+                ),
+            ],
+            style={"margin-top": "20px"},
+        ),
+        dbc.Row(
+            html.Div(
+                language["tab-analysis"]["title-velocity"],
+            ),
+            style={"margin-top": "30px", "font-size": "20px"},
+        ),
+        dbc.Row(
+            [
+                dbc.Col(
+                    [
+                        dbc.Label(
+                            language["tab-analysis"]["velocity-hint"],
+                            style={"margin": "6px 20px 0px 0px"},
+                        ),
+                        dbc.Button(
+                            language["buttons"]["estimate-velocity"],
+                            id="estimate-velocity",
+                        ),
+                    ],
+                    style={"display": "flex", "justify-content": "center"},
+                ),
+            ],
+            style={"margin-top": "20px"},
+        ),
+        dbc.Row(
+            [
+                dbc.Col(
+                    dbc.Progress(id="analysis-progress", value=0, label=""),
+                    style={"margin-top": "8px"},
+                ),
+                dbc.Col(
+                    dbc.Button(
+                        language["buttons"]["cancel"],
+                        id="cancel-analysis",
+                        disabled=True,
+                    ),
+                    width="auto",
+                ),
+            ],
+            style={"margin": "25px 10px 0px 10px"},
+        ),
+        dbc.Row(
+            dcc.Graph(id="graph-analysis", figure=analysis_figure),
+            style={"margin-top": "20px"},
+        ),
+    ]
+    return tab_analysis
+
+
+def create_analysis_figure() -> go.Figure:
+    figure = create_fig_for_map(go.Scattergeo())
+    figure.update_layout(title=language["tab-analysis"]["graph-analysis"])
+    return figure
+
+
 def _create_geo_stuctures_window() -> html.Div:
     geo_stuctures_window = html.Div(
         [
@@ -0,0 +1,41 @@
+from pathlib import Path
+import pytest
+from benchmarks.synthetic import create_daily_file, EPOCHS_PER_DAY
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "daily_file(n_sites, n_sats, n_epochs): size of the daily_file fixture",
+    )
+
+
+@pytest.fixture
+def make_daily_file(tmp_path):
+    """
+    Writes synthetic daily files into tmp_path
+    Returns:
+        function (n_sites, n_sats, n_epochs, name) -> path of the file
+    """
+    def make(
+        n_sites: int = 3,
+        n_sats: int = 4,
+        n_epochs: int = EPOCHS_PER_DAY,
+        name: str = "2024-01-01",
+    ) -> Path:
+        return create_daily_file(tmp_path / f"{name}.h5", n_sites, n_sats, n_epochs)
+
+    return make
+
+
+@pytest.fixture
+def daily_file(request, make_daily_file) -> Path:
+    """
+    Synthetic daily file 2024-01-01.h5 with 3 stations of 4 satellites
+    The size is set for a test or a module by
+    @pytest.mark.daily_file(n_sites, n_sats, n_epochs)
+    """
+    marker = request.node.get_closest_marker("daily_file")
+    if marker is None:
+        return make_daily_file()
+    return make_daily_file(*marker.args, **marker.kwargs)
@@ -0,0 +1,37 @@
+import threading
+import pytest
+from spitec.callbacks.admission import *
+
+
+def test_concurrency_limiter(tmp_path):
+    limiter = ConcurrencyLimiter("test", 2, tmp_path)
+    with limiter.slot(timeout=0):
+        with limiter.slot(timeout=0):
+            with pytest.raises(CallbackOverloaded):
+                with limiter.slot(timeout=0.1):
+                    pass
+        # Место освобождается после выхода из блока
+        with limiter.slot(timeout=0):
+            pass
+
+    # Ожидающий вызов получает место, когда оно освобождается
+    entered = threading.Event()
+    with limiter.slot(timeout=0), limiter.slot(timeout=0):
+        def wait_slot():
+            with limiter.slot(timeout=5):
+                entered.set()
+
+        thread = threading.Thread(target=wait_slot)
+        thread.start()
+        assert not entered.wait(0.2)
+    thread.join()
+    assert entered.is_set()
+
+
+def test_callback_limits(monkeypatch):
+    monkeypatch.setenv(CALLBACK_LIMITS_ENV, "update_site_data=4, build_keogram=1,bad")
+    assert callback_limits() == {"update_site_data": 4, "build_keogram": 1}
+    assert get_limiter("update_site_data").limit == 4
+    assert get_limiter("change_xaxis") is None
+    with callback_slot("change_xaxis"):
+        pass
@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+from spitec.processing.animation import *
+from spitec.processing.pierce_points import iter_pierce_points
+
+
+def test_frame_step():
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    end = datetime(2024, 1, 1, 1, tzinfo=timezone.utc)
+    assert frame_step(start, end, 60) == 60
+    assert frame_step(start, end, 10) == 30
+    end = datetime(2024, 1, 1, 23, tzinfo=timezone.utc)
+    assert frame_step(start, end, 30) * MAX_ANIMATION_FRAMES >= 23 * 3600
+
+
+def test_compute_animation_frames(daily_file):
+    start = datetime(2024, 1, 1, 6, tzinfo=timezone.utc)
+    end = datetime(2024, 1, 1, 7, tzinfo=timezone.utc)
+    done = []
+    frames = compute_animation_frames(
+        daily_file, DataProducts.roti, 300, start, end, 120, progress=done.append
+    )
+    assert len(frames.times) == 31
+    assert frames.times[1] - frames.times[0] == 120
+    assert frames.offsets[-1] == len(frames.lat) == len(frames.values)
+    assert done[-1] == 100
+
+    # Первый кадр - все точки эпохи start
+    points = list(iter_pierce_points(daily_file, DataProducts.roti, 300, start, start))
+    lat, lon, values = frames.frame(0)
+    assert len(lat) == sum(len(site.times) for site in points)
+    assert np.allclose(
+        np.sort(values), np.sort(np.concatenate([site.values for site in points])), atol=1e-3
+    )
@@ -0,0 +1,63 @@
+from benchmarks.synthetic import *
+from benchmarks.run import run_benchmarks, compare_results
+from spitec.processing.site_processing import get_sites_coords
+from spitec.processing.data_processing import (
+    get_satellites,
+    retrieve_data,
+    timestamps_to_datetimes,
+)
+
+
+def test_create_daily_file(tmp_path):
+    local_file = get_daily_file(tmp_path, 3, n_sats=4, n_epochs=720)
+    assert local_file.stem == SYNTHETIC_DATE
+    assert list(get_sites_coords(local_file).keys()) == site_names(3)
+    assert set(get_satellites(local_file)) <= set(satellite_names(4))
+
+    data, is_satellite = retrieve_data(local_file, ["s000"], "G01", DataProducts.tec)
+    times = timestamps_to_datetimes(data["s000"]["G01"][DataProducts.timestamp])
+    assert is_satellite["s000"]
+    assert times[0].date().isoformat() == SYNTHETIC_DATE
+    assert len(times) == len(data["s000"]["G01"][DataProducts.tec])
+    # повторный вызов использует уже созданный файл
+    assert get_daily_file(tmp_path, 3, n_sats=4, n_epochs=720) == local_file
+
+
+def test_run_benchmarks(tmp_path):
+    results = run_benchmarks(
+        tmp_path, scales=[2], repeat=1, n_sats=2, n_epochs=720, selected_sites=2
+    )
+    cases = {result["case"] for result in results["results"]}
+    assert {"retrieve_data", "create_map_with_trajectories", "site_map_json"} <= cases
+    assert all(result["median"] >= 0 for result in results["results"])
+
+    comparison = compare_results(results, results)
+    assert not any(item["regression"] for item in comparison)
+
+
+def test_build_payload():
+    from benchmarks.load_test import build_payload
+
+    dependency = {
+        "output": "..graph-site-data.figure@abc...time-slider.disabled..",
+        "inputs": [{"id": "time-slider", "property": "value"}],
+        "state": [{"id": "input-shift", "property": "value"}],
+    }
+    payload = build_payload(dependency, {"time-slider.value": [0, 4]})
+    assert payload["outputs"] == [
+        {"id": "graph-site-data", "property": "figure@abc"},
+        {"id": "time-slider", "property": "disabled"},
+    ]
+    assert payload["inputs"][0]["value"] == [0, 4]
+    assert payload["state"][0]["value"] is None
+    assert payload["changedPropIds"] == ["time-slider.value"]
+
+
+def test_import_time():
+    from benchmarks.import_time import run_import_benchmark
+
+    results = run_import_benchmark(repeat=1)
+    assert results["import"] > 0
+    assert results["top_modules"]
+    # Тяжелые зависимости не загружаются при старте приложения
+    assert results["lazy_imported"] == []
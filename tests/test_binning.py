@@ -0,0 +1,61 @@
+import pytest
+from spitec.processing.binning import *
+
+
+def test_make_edges():
+    edges = make_edges(-180, 180, 2)
+    assert len(edges) == 181
+    assert edges[0] == -180 and edges[-1] == 180
+    assert make_edges(0, 10, 3)[-1] == 12
+
+
+def test_bin_2d_statistics():
+    x = np.array([0.5, 0.6, 0.7, 1.5, 10, np.nan, 2.0])
+    y = np.array([0.5, 0.5, 0.5, 0.5, 0.5, 0.5, 2.0])
+    values = np.array([1.0, 2.0, 6.0, 4.0, 5.0, 1.0, np.nan])
+    x_edges = make_edges(0, 2, 1)
+    y_edges = make_edges(0, 2, 1)
+
+    grid = bin_2d(x, y, values, x_edges, y_edges, BinStatistic.MEAN)
+    assert grid.values.shape == (2, 2)
+    assert grid.counts.tolist() == [[3, 1], [0, 0]]
+    assert grid.values[0, 0] == 3.0
+    assert grid.values[0, 1] == 4.0
+    assert np.isnan(grid.values[1, 0])
+
+    grid = bin_2d(x, y, values, x_edges, y_edges, BinStatistic.MEDIAN)
+    assert grid.values[0, 0] == 2.0
+    assert grid.values[0, 1] == 4.0
+
+    grid = bin_2d(x, y, values, x_edges, y_edges, BinStatistic.COUNT)
+    assert grid.values.tolist() == [[3, 1], [0, 0]]
+
+
+def test_bin_2d_median_matches_numpy():
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0, 4, 1000)
+    y = rng.uniform(0, 4, 1000)
+    values = rng.normal(size=1000)
+    grid = bin_2d(x, y, values, make_edges(0, 4, 2), make_edges(0, 4, 2), BinStatistic.MEDIAN)
+    for iy in range(2):
+        for ix in range(2):
+            cell = (x // 2 == ix) & (y // 2 == iy)
+            assert np.isclose(grid.values[iy, ix], np.median(values[cell]))
+
+
+def test_grid_accumulator_matches_bin_2d():
+    rng = np.random.default_rng(1)
+    x = rng.uniform(0, 10, 500)
+    y = rng.uniform(0, 10, 500)
+    values = rng.normal(size=500)
+    x_edges, y_edges = make_edges(0, 10, 2.5), make_edges(0, 10, 5)
+    accumulator = GridAccumulator(x_edges, y_edges)
+    for chunk in np.array_split(np.arange(500), 7):
+        part = GridAccumulator(x_edges, y_edges)
+        part.add(x[chunk], y[chunk], values[chunk])
+        accumulator.merge(part)
+    for statistic in [BinStatistic.MEAN, BinStatistic.COUNT, BinStatistic.MAX]:
+        expected = bin_2d(x, y, values, x_edges, y_edges, statistic)
+        assert np.allclose(accumulator.result(statistic).values, expected.values)
+    with pytest.raises(ValueError):
+        accumulator.result(BinStatistic.MEDIAN)
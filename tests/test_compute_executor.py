@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import signal
+import time
+import numpy as np
+import pytest
+from spitec.processing.compute_executor import *
+
+
+def weighted_row_sum(row, weight, matrix):
+    return float(matrix[row].sum() * weight)
+
+
+def failing_task(idx):
+    if idx == 2:
+        raise ValueError(idx)
+    return idx
+
+
+def test_map_tasks_shared_arrays():
+    matrix = np.arange(40.0).reshape(8, 5)
+    tasks = [(row, 2.0) for row in range(8)]
+    expected = [float(matrix[row].sum() * 2) for row in range(8)]
+    done = []
+    assert map_tasks(weighted_row_sum, tasks, dict(matrix=matrix), workers=1) == expected
+    assert map_tasks(
+        weighted_row_sum, tasks, dict(matrix=matrix), workers=2, progress=done.append
+    ) == expected
+    assert done[-1] == 100
+    if SHARED_MEMORY_FOLDER.is_dir():
+        assert not any(
+            path.name.startswith(f"{SEGMENT_PREFIX}{os.getpid()}_")
+            for path in SHARED_MEMORY_FOLDER.iterdir()
+        )
+
+
+def test_map_tasks_error():
+    with pytest.raises(ValueError):
+        map_tasks(failing_task, [(idx,) for idx in range(5)], workers=2)
+    # Пул остается рабочим после ошибки в задании
+    assert map_tasks(failing_task, [(0,), (1,)], workers=2) == [0, 1]
+
+
+def test_compute_workers(monkeypatch):
+    monkeypatch.setenv(COMPUTE_WORKERS_ENV, "3")
+    assert compute_workers() == 3
+    monkeypatch.delenv(COMPUTE_WORKERS_ENV)
+    assert compute_workers() == (os.cpu_count() or 1)
+
+
+def sleeping_task(folder):
+    (folder / str(os.getpid())).touch()
+    time.sleep(30)
+
+
+def run_sleeping_job(folder):
+    map_tasks(sleeping_task, [(folder,), (folder,)], workers=2)
+
+
+def is_running(pid):
+    # Зомби уже не выполняет задачу
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+def test_cancelled_job_stops_pool(tmp_path):
+    job = multiprocessing.get_context("fork").Process(
+        target=run_sleeping_job, args=(tmp_path,)
+    )
+    job.start()
+    deadline = time.monotonic() + 10
+    while len(list(tmp_path.iterdir())) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    workers = [int(path.name) for path in tmp_path.iterdir()]
+    assert len(workers) == 2
+    # Так отменяется задание фонового callback
+    job.terminate()
+    job.join()
+    deadline = time.monotonic() + 5
+    while any(is_running(pid) for pid in workers) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    running = [pid for pid in workers if is_running(pid)]
+    for pid in running:
+        os.kill(pid, signal.SIGKILL)
+    assert running == []
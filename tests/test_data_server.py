@@ -0,0 +1,94 @@
+from datetime import datetime, timezone
+import threading
+import h5py
+import numpy as np
+import pytest
+from spitec.processing.data_server import *
+from spitec.processing.data_client import *
+from spitec.processing.data_processing import (
+    retrieve_data,
+    retrieve_data_cached,
+    estimate_read_bytes,
+    series_cache,
+)
+from spitec.processing.pierce_points import (
+    get_network_points,
+    read_network_points,
+    network_cache,
+)
+
+
+pytestmark = pytest.mark.daily_file(3, 2)
+
+
+@pytest.fixture
+def data_server(tmp_path, daily_file, monkeypatch):
+    server = DataServer(tmp_path / "data.sock", tmp_path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv(DATA_SERVER_ENV, str(server.socket_path))
+    series_cache.clear()
+    network_cache.clear()
+    yield server
+    server.shutdown()
+    server.server_close()
+    series_cache.clear()
+    network_cache.clear()
+
+
+def test_retrieve_through_server(data_server, daily_file):
+    client = get_data_client()
+    assert client.ping()
+    sites = ["s000", "s002", "s100"]
+    assert list(estimate_read_bytes(daily_file, sites, "G01", DataProducts.roti)) == ["s000", "s002"]
+    data, is_satellite = retrieve_data_cached(daily_file, sites, "G01", DataProducts.roti)
+    # Ряды кэширует сервер, в процессе их копий нет
+    assert len(series_cache) == 0
+    assert estimate_read_bytes(daily_file, sites, "G01", DataProducts.roti) == dict()
+    expected, expected_is_satellite = retrieve_data(daily_file, sites, "G01", DataProducts.roti)
+    assert is_satellite == expected_is_satellite
+    assert list(data) == list(expected)
+    for site in expected:
+        assert np.array_equal(data[site]["G01"][DataProducts.roti], expected[site]["G01"][DataProducts.roti])
+        assert np.array_equal(data[site]["G01"][DataProducts.timestamp], expected[site]["G01"][DataProducts.timestamp])
+
+    # Окно по времени отрезается на сервере
+    start = datetime(2024, 1, 1, 1, tzinfo=timezone.utc).timestamp()
+    end = datetime(2024, 1, 1, 2, tzinfo=timezone.utc).timestamp()
+    series = client.read_series(daily_file, ["s000"], "G01", "roti", start=start, end=end)
+    assert len(series) == 1
+    _, _, _, timestamps, _ = series[0]
+    assert len(timestamps) > 0
+    assert timestamps.min() >= start and timestamps.max() <= end
+    assert client.stats()["server_series"]["misses"] > 0
+
+
+def test_network_points_in_shared_memory(data_server, daily_file):
+    points = get_network_points(daily_file, DataProducts.roti)
+    expected = read_network_points(daily_file, DataProducts.roti)
+    for name, value in expected._asdict().items():
+        assert np.array_equal(getattr(points, name), value)
+    if SHARED_MEMORY_FOLDER.is_dir():
+        assert not points.values.flags.writeable
+    # Сегменты удаляются с сервером
+    data_server.network_cache.clear()
+    assert np.array_equal(points.values, expected.values)
+
+
+def test_server_errors(data_server, tmp_path):
+    client = get_data_client()
+    with pytest.raises(DataServerError):
+        client.network_points("/etc/passwd", "roti")
+    # Ошибка запроса не отключает сервер
+    assert get_data_client() is client
+
+    # Ошибка чтения файла - тоже ответ с ошибкой, а не закрытое соединение
+    with h5py.File(tmp_path / "2024-01-02.h5", "w") as f:
+        f.create_group("s000")
+    with pytest.raises(DataServerError, match="IndexError"):
+        client.read_series(tmp_path / "2024-01-02.h5", ["s000"], "G01", "roti")
+    assert get_data_client() is client
+
+    unreachable = DataClient(tmp_path / "missing.sock")
+    assert not unreachable.ping()
+    assert not unreachable.available()
@@ -0,0 +1,53 @@
+import os
+import h5py
+import numpy as np
+import pytest
+from spitec.processing.event_detection import *
+
+
+pytestmark = pytest.mark.daily_file(2, 3)
+
+
+@pytest.fixture
+def daily_file(daily_file):
+    # Всплеск ROTI на одном спутнике одной станции
+    with h5py.File(daily_file, "r+") as f:
+        roti = f["s001"]["G02"]["roti"]
+        values = roti[:]
+        values[100:104] = [1.5, 3.0, 2.0, 1.2]
+        roti[...] = values
+    return daily_file
+
+
+def test_find_runs():
+    times = np.array([[0, 30, 60, 90, 120, 300, 330], [0, 30, 60, 90, 120, 150, 180]], dtype=float)
+    mask = np.array(
+        [[0, 1, 1, 0, 1, 1, 1], [1, 0, 0, 0, 0, 1, 1]], dtype=bool
+    )
+    strength = np.arange(14, dtype=float).reshape(2, 7)
+    rows, starts, ends, peaks, magnitudes = find_runs(times, mask, strength, 2)
+    # Разрыв по времени между 120 и 300 делит серию
+    assert list(rows) == [0, 0, 1]
+    assert list(starts) == [30, 300, 150]
+    assert list(ends) == [60, 330, 180]
+    assert list(peaks) == [60, 330, 180]
+    assert list(magnitudes) == [2, 6, 13]
+
+
+def test_build_event_index(daily_file):
+    done = []
+    events = build_event_index(daily_file, workers=1, progress=done.append)
+    assert done[-1] == 100
+    spike = events[(events["site"] == "s001") & (events["sat"] == "G02")]
+    spike = spike[spike["product"] == "roti"]
+    assert set(spike["detector"]) >= {Detector.THRESHOLD, Detector.ROBUST_Z}
+    threshold = spike[spike["detector"] == Detector.THRESHOLD][0]
+    assert threshold["magnitude"] == pytest.approx(3.0)
+    assert threshold["start"] < threshold["time"] < threshold["end"]
+
+    assert np.array_equal(load_event_index(daily_file), events)
+    # Индекс устаревает при изменении файла
+    events_cache.clear()
+    stat = os.stat(daily_file)
+    os.utime(daily_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert load_event_index(daily_file) is None
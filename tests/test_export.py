@@ -0,0 +1,56 @@
+import io
+from datetime import datetime, timezone
+import h5py
+import pytest
+from spitec.processing.export import *
+
+
+pytestmark = pytest.mark.daily_file(2, 2)
+
+
+def export(daily_file, export_format, sat="G01"):
+    start = datetime(2024, 1, 1, 2, tzinfo=timezone.utc)
+    end = datetime(2024, 1, 1, 6, tzinfo=timezone.utc)
+    chunks = iter_export(
+        export_format,
+        daily_file,
+        ["s000", "s001", "unknown"],
+        sat,
+        parse_export_products("roti,tec"),
+        start,
+        end,
+        {"link": "session"},
+    )
+    return b"".join(chunks), start, end
+
+
+def test_export_h5(daily_file):
+    data, start, end = export(daily_file, "h5", sat=None)
+    with h5py.File(io.BytesIO(data)) as f:
+        assert f.attrs["link"] == "session"
+        assert set(f.keys()) == {"s000", "s001"}
+        timestamps = f["s000"]["G01"]["timestamp"][:]
+        assert timestamps.min() >= start.timestamp()
+        assert timestamps.max() <= end.timestamp()
+        assert len(f["s000"]["G01"]["tec"]) == len(timestamps)
+
+
+def test_export_npz_csv(daily_file):
+    data, _, _ = export(daily_file, "npz")
+    arrays = np.load(io.BytesIO(data))
+    assert "s001/G01/roti" in arrays.files
+    assert json.loads(str(arrays["metadata"])) == {"link": "session"}
+
+    data, _, _ = export(daily_file, "csv")
+    lines = data.decode().splitlines()
+    assert lines[1] == "site,sat,time,roti,tec"
+    rows = len(arrays["s000/G01/roti"]) + len(arrays["s001/G01/roti"])
+    assert len(lines) == 2 + rows
+
+
+def test_parse_export_products():
+    assert parse_export_products("roti") == [DataProducts.roti]
+    with pytest.raises(ExportError):
+        parse_export_products("time")
+    with pytest.raises(ExportError):
+        parse_export_products("")
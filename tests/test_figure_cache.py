@@ -0,0 +1,16 @@
+import time
+from spitec.callbacks.figure_cache import *
+
+
+def test_figure_cache(tmp_path):
+    cache = FigureCache(tmp_path, ttl=0.2, name="test_figures")
+    figure = {"data": [{"type": "scattergeo"}], "layout": {}}
+    cache.set("session", figure)
+
+    assert cache.get("session") == figure
+    assert cache.get("unknown") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(cache) == 1
+
+    time.sleep(0.3)
+    assert cache.get("session") is None
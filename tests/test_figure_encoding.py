@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+import base64
+import numpy as np
+import plotly.graph_objects as go
+from spitec.callbacks.figure_encoding import *
+
+
+def decode(array: dict) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(array["bdata"]), dtype="<" + array["dtype"])
+
+
+def test_typed_array():
+    values = np.arange(40, dtype=np.float32)
+    array = typed_array(values)
+    assert array["dtype"] == "f4"
+    assert np.array_equal(decode(array), values)
+
+    # int64 в plotly.js нет
+    array = typed_array(np.arange(40, dtype=np.int64))
+    assert array["dtype"] == "f8"
+    assert np.array_equal(decode(array), np.arange(40))
+
+    array = typed_array(np.arange(40, dtype=">f8"))
+    assert np.array_equal(decode(array), np.arange(40))
+
+
+def test_compact_figure():
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    times = np.array([start + timedelta(seconds=30 * i) for i in range(100)])
+    values = np.linspace(0, 1, 100)
+    lats = np.array([float(i) for i in range(50)] + [None] * 50, dtype=object)
+    figure = go.Figure(
+        [
+            go.Scatter(x=times, y=values, yaxis="y2"),
+            go.Scatter(x=[1, 2, 3], y=np.arange(3.0)),
+            go.Scattergeo(lat=lats, lon=np.zeros(100)),
+        ]
+    )
+
+    compact = compact_figure(figure)
+    site, short, trajectory = compact["data"]
+    assert decode(site["x"])[1] - decode(site["x"])[0] == 30_000
+    assert decode(site["x"])[0] == start.timestamp() * 1000
+    assert np.array_equal(decode(site["y"]), values)
+    assert compact["layout"]["xaxis"]["type"] == "date"
+    assert "type" not in compact["layout"].get("yaxis2", {})
+
+    # Короткие массивы остаются как есть
+    assert list(short["x"]) == [1, 2, 3]
+    assert list(short["y"]) == [0.0, 1.0, 2.0]
+
+    lat = decode(trajectory["lat"])
+    assert np.isnan(lat[50:]).all() and lat[49] == 49.0
+
+    assert compact_figure(None) is None
+    assert compact_figure(compact) == compact
+
+
+def test_compact_figure_keeps_strings():
+    labels = np.array([f"{idx:04d}" for idx in range(40)], dtype=object)
+    figure = go.Figure(
+        go.Scatter(
+            x=np.arange(40.0),
+            y=np.arange(40.0),
+            text=labels,
+            customdata=np.array(list(labels[:39]) + [None], dtype=object),
+        )
+    )
+    trace = compact_figure(figure)["data"][0]
+    assert list(trace["text"]) == list(labels)
+    assert list(trace["customdata"])[:2] == ["0000", "0001"]
@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+import numpy as np
+from spitec.processing.keogram import *
+import spitec.processing.keogram as keogram
+from spitec.processing.pierce_points import iter_pierce_points
+
+
+def test_keogram_time_step():
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert keogram_time_step(start, datetime(2024, 1, 1, 1, tzinfo=timezone.utc)) == 30
+    end = datetime(2024, 1, 1, 23, 59, 59, tzinfo=timezone.utc)
+    assert keogram_time_step(start, end) == 120
+
+
+def test_compute_keogram(daily_file, monkeypatch):
+    # По одной станции в задании, чтобы заданий было несколько
+    monkeypatch.setattr(keogram, "SITES_PER_TASK", 1)
+    start = datetime(2024, 1, 1, 6, tzinfo=timezone.utc)
+    end = datetime(2024, 1, 1, 8, tzinfo=timezone.utc)
+    done = []
+    grid = compute_keogram(
+        daily_file, DataProducts.roti, 300, start, end,
+        KeogramAxis.LAT, (-180, 180), 5, BinStatistic.COUNT, progress=done.append,
+    )
+    assert grid.values.shape == (36, 241)
+    assert grid.x_edges[0] == start.timestamp()
+    assert done[-1] == 100
+
+    total = sum(
+        len(points.times)
+        for points in iter_pierce_points(daily_file, DataProducts.roti, 300, start, end)
+    )
+    assert grid.counts.sum() == total
+
+    # Полоса долгот отбирает часть точек
+    band = compute_keogram(
+        daily_file, DataProducts.roti, 300, start, end,
+        KeogramAxis.LAT, (0, 90), 5, BinStatistic.MEAN,
+    )
+    assert 0 <= band.counts.sum() <= total
+
+    # Части сетки из процессов пула дают ту же кеограмму
+    parallel = compute_keogram(
+        daily_file, DataProducts.roti, 300, start, end,
+        KeogramAxis.LAT, (0, 90), 5, BinStatistic.MEAN,
+        sites=["s000", "s001", "s002"], workers=2,
+    )
+    assert np.array_equal(parallel.counts, band.counts)
+    assert np.allclose(parallel.values, band.values, equal_nan=True)
@@ -0,0 +1,98 @@
+import os
+import dash
+import pytest
+from dash import html, dcc, Input, Output
+from spitec.monitoring.metrics import *
+
+
+@pytest.fixture
+def metrics_store(tmp_path):
+    store = set_metrics_store(tmp_path / METRICS_DB_NAME)
+    yield store
+    set_metrics_store(None)
+
+
+def test_histogram_render():
+    histogram = Histogram("test_seconds", "Test", "callback", (0.1, 1.0))
+    histogram.observe("cb", 0.05)
+    histogram.observe("cb", 0.5)
+    histogram.observe("cb", 5.0)
+    store = MetricsStore()
+    store.add([(histogram.name, *row) for row in histogram.drain()])
+    assert histogram.drain() == []
+
+    lines = histogram.render(store.values()[histogram.name])
+    assert "# TYPE test_seconds histogram" in lines
+    assert 'test_seconds_bucket{callback="cb",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{callback="cb",le="1"} 2' in lines
+    assert 'test_seconds_bucket{callback="cb",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{callback="cb"} 3' in lines
+
+
+def test_timed_generator():
+    @timed("test_generator")
+    def generator():
+        yield 1
+        yield 2
+
+    assert list(generator()) == [1, 2]
+    assert "test_generator" in render_metrics()
+
+
+def test_metrics_of_all_processes(metrics_store):
+    function_seconds.observe("test_parent", 0.1)
+    pid = os.fork()
+    if pid == 0:
+        # Приращения родителя выгружает только родитель
+        function_seconds.observe("test_child", 0.2)
+        flush_metrics()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    text = render_metrics()
+    assert 'spitec_function_seconds_count{function="test_parent"} 1' in text
+    assert 'spitec_function_seconds_count{function="test_child"} 1' in text
+    assert f'pid="{pid}"' not in text
+
+
+def test_metrics_of_background_job(metrics_store):
+    @timed("test_job")
+    def job():
+        pass
+
+    # Фоновое задание Dash порождается из обработчика запроса
+    app = dash.Dash(__name__)
+    with app.server.test_request_context():
+        pid = os.fork()
+        if pid == 0:
+            job()
+            os._exit(0)
+    os.waitpid(pid, 0)
+    assert 'spitec_function_seconds_count{function="test_job"} 1' in render_metrics()
+
+
+def test_instrument_callbacks(metrics_store):
+    app = dash.Dash(__name__)
+    app.layout = html.Div([dcc.Input(id="value"), html.Div(id="echo")])
+
+    @app.callback(Output("echo", "children"), Input("value", "value"))
+    def test_echo(value):
+        if value == "error":
+            raise ValueError(value)
+        return value
+
+    instrument_callbacks(app)
+    instrument_callbacks(app)  # повторный вызов не оборачивает дважды
+    register_metrics(app.server)
+    client = app.server.test_client()
+    for value in ["a", "error"]:
+        client.post("/_dash-update-component", json={
+            "output": "echo.children",
+            "outputs": {"id": "echo", "property": "children"},
+            "inputs": [{"id": "value", "property": "value", "value": value}],
+            "changedPropIds": ["value.value"],
+        })
+
+    text = client.get(METRICS_ROUTE).get_data(as_text=True)
+    assert 'spitec_callback_seconds_count{callback="test_echo"} 2' in text
+    assert 'spitec_callback_errors_total{callback="test_echo"} 1' in text
+    assert 'spitec_callback_response_bytes_count{callback="test_echo"} 2' in text
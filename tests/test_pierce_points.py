@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+from spitec.processing.pierce_points import *
+from spitec.processing.trajectorie import sub_ionospheric
+
+
+def test_sub_ionospheric_points_matches_scalar():
+    az = np.radians(np.array([10.0, 100.0, 200.0, 350.0]))
+    el = np.radians(np.array([15.0, 30.0, 60.0, 85.0]))
+    s_lat, s_lon = np.radians(55), np.radians(179)
+    lat, lon = sub_ionospheric_points(s_lat, s_lon, 300, az, el)
+    for i in range(len(az)):
+        expected = sub_ionospheric(s_lat, s_lon, 300, az[i], el[i])
+        assert np.isclose(lat[i], expected[0])
+        assert np.isclose(lon[i], expected[1])
+
+
+def test_network_points_window(daily_file):
+    start = datetime(2024, 1, 1, 6, tzinfo=timezone.utc)
+    end = datetime(2024, 1, 1, 7, tzinfo=timezone.utc)
+    network = get_network_points(daily_file, DataProducts.roti)
+    assert get_network_points(daily_file, DataProducts.roti) is network
+    assert np.all(np.diff(network.time_offsets.astype(np.int64)) >= 0)
+
+    points = network.pierce_points(300, start, end)
+    assert points.times.min() >= start.timestamp()
+    assert points.times.max() <= end.timestamp()
+
+    # Тот же набор точек, что и при чтении по станциям
+    by_site = list(iter_pierce_points(daily_file, DataProducts.roti, 300, start, end))
+    assert sum(len(site.times) for site in by_site) == len(points.times)
+    assert np.allclose(
+        np.sort(np.concatenate([site.lat for site in by_site])),
+        np.sort(points.lat),
+        atol=1e-4,
+    )
+    assert np.allclose(
+        np.sort(np.concatenate([site.values for site in by_site])),
+        np.sort(points.values),
+        atol=1e-6,
+    )
+    epoch = network.pierce_points(300, start, start)
+    assert np.all(epoch.times == start.timestamp())
@@ -0,0 +1,42 @@
+import json
+import os
+from spitec.callbacks.prewarm import *
+from spitec.processing.catalogue import (
+    get_events_config,
+    catalogue_cache,
+    events_config_cache,
+)
+from spitec.processing.pierce_points import network_cache
+from spitec.processing.stage_cache import file_version
+
+
+def test_prewarm_recent_files(tmp_path, make_daily_file):
+    old_file = make_daily_file(2, 2, 120, name="2024-01-01")
+    new_file = make_daily_file(2, 2, 120, name="2024-01-02")
+    assert recent_daily_files(tmp_path, 5) == [new_file, old_file]
+
+    catalogue_cache.clear()
+    network_cache.clear()
+    report = prewarm(tmp_path, files=1, products=[DataProducts.roti], freeze=False)
+    assert report.files == ["2024-01-02.h5"]
+    assert report.event_indexes == 0
+    assert catalogue_cache.get(file_version(new_file)) is not None
+    assert catalogue_cache.get(file_version(old_file)) is None
+    assert network_cache.get((file_version(new_file), "roti")) is not None
+    network_cache.clear()
+
+
+def test_events_config(tmp_path):
+    config_file = tmp_path / "events.json"
+    assert get_events_config(config_file) is None
+    config_file.write_text(json.dumps({"event": [{"name": "a"}]}))
+    events_config_cache.clear()
+    config = get_events_config(config_file)
+    assert config == {"event": [{"name": "a"}]}
+    assert get_events_config(config_file) is config
+
+    # Файл перечитывается после изменения
+    config_file.write_text(json.dumps({"event": []}))
+    stat = os.stat(config_file)
+    os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert get_events_config(config_file) == {"event": []}
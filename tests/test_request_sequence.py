@@ -0,0 +1,33 @@
+import pytest
+from dash.exceptions import PreventUpdate
+from spitec.callbacks.request_sequence import *
+from spitec.callbacks.render import render_views
+
+
+def test_request_sequence(tmp_path):
+    sequence = RequestSequence(tmp_path)
+    first = {"client": "tab", "seq": 1, "value": [0, 4]}
+    second = {"client": "tab", "seq": 2, "value": [0, 8]}
+    other = {"client": "other", "seq": 1, "value": [0, 24]}
+
+    assert sequence.start(first, "test")
+    assert not sequence.is_superseded(first, "test")
+    assert sequence.start(second, "test")
+    assert sequence.is_superseded(first, "test")
+    # Запрос, пришедший после более нового, отбрасывается
+    assert not sequence.start(first, "test")
+    assert sequence.start(other, "test")
+    assert not sequence.is_superseded(second, "test")
+
+    # Запросы без номера выполняются всегда
+    assert sequence.start(None, "test")
+    assert not sequence.is_superseded(None, "test")
+
+    # Номера общие для всех процессов
+    assert RequestSequence(tmp_path).is_superseded(first, "test")
+    assert len(sequence) == 2
+
+
+def test_render_superseded():
+    with pytest.raises(PreventUpdate):
+        render_views({}, "shift", is_superseded=lambda: True)
@@ -0,0 +1,85 @@
+import json
+import pytest
+from spitec.processing.session_store import *
+
+
+def test_save_load_session(tmp_path):
+    store = SessionStore(tmp_path / SESSIONS_DB_NAME)
+    data = {"projection": "orthographic", "site_data_store": {"st01": 1}}
+
+    session_id = store.save(data)
+    # одинаковое состояние сохраняется один раз
+    assert store.save(dict(data)) == session_id
+    assert len(store) == 1
+    assert session_id in store
+    assert store.load(session_id) == data
+    assert store.load("unknown") is None
+    assert store.load("../secret") is None
+
+
+def test_load_legacy_session(tmp_path):
+    legacy_folder = tmp_path / LEGACY_SESSIONS_FOLDER_NAME
+    legacy_folder.mkdir()
+    session_id = "0b5d7b7e-6a4f-4f5e-9d8b-2f0c1f7f3a11"
+    with open(legacy_folder / f"{session_id}.json", "w") as f:
+        json.dump({"projection": "mercator"}, f)
+
+    store = SessionStore(tmp_path / SESSIONS_DB_NAME, legacy_folder)
+    assert store.load(session_id) == {"projection": "mercator"}
+
+
+@pytest.mark.daily_file(4, 2, 720)
+def test_slim_expand_session(tmp_path, daily_file):
+    local_file = daily_file
+    catalogue = get_file_catalogue(local_file)
+    session_data = {
+        "file_name": str(local_file),
+        "site_coords": catalogue.site_coords,
+        "satellites_options": catalogue.satellites_options(),
+        "site_data_store": {"s002": 2, "s000": 0},
+        "region_site_names": None,
+        "sat": "G01",
+    }
+
+    slim = slim_session(session_data)
+    assert "site_coords" not in slim and "satellites_options" not in slim
+    assert slim["file_name"] == "2024-01-01.h5"
+    assert slim["site_data_store"] == ["s002", "s000"]
+    assert expand_session(slim, tmp_path) == session_data
+    # сессии старого формата не меняются
+    assert expand_session(session_data, tmp_path) == session_data
+
+
+def test_collect_garbage(tmp_path):
+    from spitec.processing.session_maintenance import collect_garbage
+
+    (tmp_path / "2024-01-01.h5").touch()
+    legacy_folder = tmp_path / LEGACY_SESSIONS_FOLDER_NAME
+    legacy_folder.mkdir()
+    legacy_id = "0b5d7b7e-6a4f-4f5e-9d8b-2f0c1f7f3a11"
+    legacy_session = {
+        "file_name": str(tmp_path / "2024-01-01.h5"),
+        "site_coords": {},
+        "satellites_options": [],
+        "site_data_store": {"s000": 0},
+        "region_site_names": None,
+        "user_trajectories": None,
+    }
+    with open(legacy_folder / f"{legacy_id}.json", "w") as f:
+        json.dump(legacy_session, f)
+
+    store = SessionStore(tmp_path / SESSIONS_DB_NAME, legacy_folder)
+    orphan_id = store.save({"file_name": "2023-01-01.h5"})
+
+    report = collect_garbage(tmp_path)
+    assert report.legacy_compacted == 1
+    assert report.sessions_orphaned == 1
+    assert report.sessions_left == 1
+    assert list(legacy_folder.iterdir()) == []
+    assert store.load(orphan_id) is None
+    # ссылка старого формата открывается из хранилища
+    assert store.load(legacy_id)["site_data_store"] == ["s000"]
+
+    report = collect_garbage(tmp_path, max_age_days=0)
+    assert report.sessions_expired == 1
+    assert len(store) == 0
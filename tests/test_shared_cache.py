@@ -0,0 +1,130 @@
+from pathlib import Path
+import gc
+import os
+import numpy as np
+import pytest
+from spitec.processing.shared_cache import *
+from spitec.processing.data_processing import (
+    retrieve_data,
+    retrieve_data_cached,
+    series_cache,
+    DataProducts,
+)
+from spitec.processing.stage_cache import file_version
+from spitec.processing.pierce_points import (
+    get_network_points,
+    read_network_points,
+    network_cache,
+)
+
+
+def test_set_and_attach(tmp_path):
+    cache = SharedArrayCache(tmp_path, 2**20)
+    values = np.arange(10, dtype=np.float32)
+    meta, arrays = cache.set("a", {"sat": "G01"}, {"values": values, "empty": np.array([])})
+    assert meta == {"sat": "G01"}
+    assert np.array_equal(arrays["values"], values)
+    assert not arrays["values"].flags.writeable
+    assert cache.get("b") is None
+
+    meta, arrays = cache.get("a")
+    assert np.array_equal(arrays["values"], values)
+    assert arrays["empty"].shape == (0,)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evict_unreferenced_lru(tmp_path):
+    array = np.zeros(2**16)
+    cache = SharedArrayCache(tmp_path, 3 * array.nbytes)
+    _, held = cache.set("held", dict(), {"values": array})
+    for key in ["old", "new"]:
+        cache.set(key, dict(), {"values": array})
+    gc.collect()
+    # Запись "held" старше всех, но ее массивы живы - удаляется "old"
+    assert cache.evict(array.nbytes) == 1
+    assert cache.get("old") is None
+    assert cache.get("held") is not None
+    del held
+    gc.collect()
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_referenced_entries_keep_size(tmp_path):
+    array = np.zeros(100_000)
+    cache = SharedArrayCache(tmp_path, 1_000_000)
+    held = [cache.set(idx, dict(), {"values": array}) for idx in range(10)]
+    # Записи, которые не поместились, остаются в процессе
+    assert cache.size() <= cache.max_bytes
+    assert 0 < len(cache) < len(held)
+    assert all(np.array_equal(arrays["values"], array) for _, arrays in held)
+    del held
+    gc.collect()
+    cache.clear()
+
+
+def test_index_keeps_size_and_lru(tmp_path, monkeypatch):
+    array = np.zeros(1000)
+    cache = SharedArrayCache(tmp_path, 2**20)
+    cache.set("probe", dict(), {"values": array})
+    entry_size = cache.size()
+    cache.clear()
+    cache.max_bytes = 10 * entry_size
+    # Размер и порядок вытеснения берутся из индекса, без обхода папки
+    glob = Path.glob
+    monkeypatch.setattr(Path, "glob", lambda *args: pytest.fail("glob of the folder"))
+    cache.set_many([(idx, dict(), {"values": array}) for idx in range(10)])
+    assert len(cache.get_many([0, 1])) == 2
+    cache.set_many([(idx, dict(), {"values": array}) for idx in range(10, 13)])
+    assert sorted(cache.get_many(list(range(13)))) == [0, 1, 5, 6, 7, 8, 9, 10, 11, 12]
+    monkeypatch.setattr(Path, "glob", glob)
+
+    files_size = sum(path.stat().st_size for path in tmp_path.glob(f"*{ENTRY_SUFFIX}"))
+    assert cache.size() == files_size == cache.max_bytes
+    # Записи папки без индекса добавляются в новый индекс
+    for path in tmp_path.glob(f"{INDEX_DB_NAME}*"):
+        path.unlink()
+    cache = SharedArrayCache(tmp_path, cache.max_bytes)
+    assert (cache.size(), len(cache)) == (files_size, 10)
+
+
+@pytest.mark.daily_file(3, 2)
+def test_retrieve_through_shared_cache(tmp_path, daily_file, monkeypatch):
+    monkeypatch.setenv(SHARED_CACHE_ENV, "64")
+    monkeypatch.setenv(SHARED_CACHE_FOLDER_ENV, str(tmp_path / "shared"))
+    series_cache.clear()
+    network_cache.clear()
+    cache = get_shared_cache()
+
+    sites = ["s000", "s001", "s100"]
+    data, is_satellite = retrieve_data_cached(daily_file, sites, "G01", DataProducts.roti)
+    # Записи есть и у станции без данных; в кэш процесса они не попадают
+    assert len(cache) == len(sites)
+    assert len(series_cache) == 0
+    series_cache.clear()
+    again, _ = retrieve_data_cached(daily_file, sites, "G01", DataProducts.roti)
+    assert cache.hits == len(sites)
+    expected, expected_is_satellite = retrieve_data(daily_file, sites, "G01", DataProducts.roti)
+    assert is_satellite == expected_is_satellite
+    for result in [data, again]:
+        assert list(result) == list(expected)
+        for site in expected:
+            for product in [DataProducts.roti, DataProducts.timestamp]:
+                assert np.array_equal(
+                    result[site]["G01"][product], expected[site]["G01"][product]
+                )
+
+    points = get_network_points(daily_file, DataProducts.roti)
+    network = read_network_points(daily_file, DataProducts.roti)
+    for name, value in network._asdict().items():
+        assert np.array_equal(getattr(points, name), value)
+
+    # Другой процесс находит записи без чтения файла
+    key = ("network_points", file_version(daily_file), "roti")
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0 if cache.get(key) is not None else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    series_cache.clear()
+    network_cache.clear()
@@ -0,0 +1,60 @@
+import h5py
+import pytest
+from spitec.processing.stage_cache import *
+from spitec.processing.data_processing import *
+from spitec.callbacks.render import RenderStage, invalidated_stages
+
+
+@pytest.fixture
+def mock_hdf5_file(tmp_path):
+    test_file = tmp_path / "test_file.h5"
+    with h5py.File(test_file, "w") as f:
+        sat1 = f.create_group("Site1").create_group("Sat1")
+        sat1[DataProducts.timestamp.hdf_name] = [1609459200, 1609462800]
+        sat1[DataProducts.roti.hdf_name] = [1.0, 2.0]
+
+        sat2 = f.create_group("Site2").create_group("Sat2")
+        sat2[DataProducts.timestamp.hdf_name] = [1609459200, 1609462800]
+        sat2[DataProducts.roti.hdf_name] = [3.0, 4.0]
+    yield test_file
+    test_file.unlink()
+
+
+def test_stage_cache_lru():
+    cache = StageCache("test", 2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # вытесняет "b"
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (2, 1)
+    assert STAGE_CACHES["test"] is cache
+
+
+def test_retrieve_data_cached(mock_hdf5_file):
+    series_cache.clear()
+    sites = ["Site2", "Site1", "UnknownSite"]
+
+    expected = retrieve_data(mock_hdf5_file, sites, Sat("Sat1"), DataProducts.roti)
+    first = retrieve_data_cached(mock_hdf5_file, sites, Sat("Sat1"), DataProducts.roti)
+    hits = series_cache.hits
+    second = retrieve_data_cached(mock_hdf5_file, sites, Sat("Sat1"), DataProducts.roti)
+
+    assert series_cache.hits == hits + len(sites)
+    for data, is_satellite in [first, second]:
+        assert list(data.keys()) == list(expected[0].keys())
+        assert is_satellite == expected[1]
+        np.testing.assert_array_equal(
+            data["Site2"]["Sat2"][DataProducts.roti], np.array([3.0, 4.0])
+        )
+
+
+def test_invalidated_stages():
+    assert invalidated_stages("shift") == {RenderStage.SITE_DATA}
+    assert invalidated_stages("input_hm") == {RenderStage.MAP}
+    assert invalidated_stages("time_value") == set(RenderStage)
+    assert invalidated_stages(("new_points", "data_types")) == set(RenderStage)
+    assert invalidated_stages(None) == set(RenderStage)
@@ -0,0 +1,62 @@
+import base64
+import pytest
+from spitec.processing.trajectory_parsing import *
+
+
+def test_parse_trajectory_csv():
+    data = (
+        b"Time, Longitude, Latitude, Hm\n"
+        b"02:41:30, 24.8, -15.4, 300\r\n"
+        b"02:42:00,25,-15,310\n"
+    )
+    times, lons, lats, hms = parse_trajectory_csv(data, "2024-01-01")
+
+    assert times.dtype == np.dtype("datetime64[s]")
+    assert lons.dtype == lats.dtype == hms.dtype == np.float64
+    np.testing.assert_array_equal(
+        times,
+        np.array(["2024-01-01T02:41:30", "2024-01-01T02:42:00"], dtype="datetime64[s]"),
+    )
+    np.testing.assert_array_equal(lons, [24.8, 25.0])
+    np.testing.assert_array_equal(lats, [-15.4, -15.0])
+    np.testing.assert_array_equal(hms, [300.0, 310.0])
+
+
+def test_parse_trajectory_csv_chunks():
+    rows = [f"00:00:{i:02d},{i},{-i},300" for i in range(50)]
+    data = ("Time, Longitude, Latitude, Hm\n" + "\n".join(rows)).encode()
+
+    times, lons, _, _ = parse_trajectory_csv(data, "2024-01-01", chunk_rows=7)
+
+    assert len(times) == len(lons) == 50
+    np.testing.assert_array_equal(lons, np.arange(50))
+
+
+@pytest.mark.parametrize(
+    "rows, bad_row",
+    [
+        ("02:41:30,1,2,300\n02:4x:00,1,2,300", 3),
+        ("02:41:30,1,2,300\n02:42:00,1,abc,300", 3),
+        ("02:41:30,1,2,\n02:42:00,1,2,300", 2),
+    ],
+)
+def test_parse_trajectory_csv_invalid_row(rows, bad_row):
+    data = ("Time, Longitude, Latitude, Hm\n" + rows).encode()
+
+    with pytest.raises(TrajectoryFileError) as err:
+        parse_trajectory_csv(data, "2024-01-01", chunk_rows=1)
+    assert err.value.row == bad_row
+
+
+def test_parse_trajectory_csv_empty():
+    with pytest.raises(TrajectoryFileError):
+        parse_trajectory_csv(b"Time, Longitude, Latitude, Hm\n", "2024-01-01")
+
+
+def test_decode_trajectory_upload():
+    data = b"Time, Longitude, Latitude, Hm\n02:41:30, 24.8, -15.4, 300\n"
+    contents = "data:text/csv;base64," + base64.b64encode(data).decode()
+
+    assert decode_trajectory_upload(contents) == data
+    with pytest.raises(TrajectoryFileSizeError):
+        decode_trajectory_upload(contents, max_size=10)
@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from datetime import datetime, timezone
+from spitec.processing.trajectory_store import *
+
+
+def test_save_load_trajectory(tmp_path):
+    times = np.array(
+        ["2024-01-01T01:00:00", "2024-01-01T01:00:30", "2024-01-01T02:00:00"],
+        dtype="datetime64[s]",
+    )
+    lats = np.array([10.0, 10.5, 11.0])
+    lons = np.array([20.0, 20.5, 21.0])
+    hms = np.array([300.0, 300.0, 310.0])
+
+    trajectory_id = save_trajectory(tmp_path, times, lats, lons, hms)
+    assert (tmp_path / f"{trajectory_id}.npz").exists()
+    # повторное сохранение тех же данных не создает новый файл
+    assert save_trajectory(tmp_path, times, lats, lons, hms) == trajectory_id
+    assert len(list(tmp_path.iterdir())) == 1
+
+    trajectory = load_trajectory(tmp_path, trajectory_id, "traj")
+    assert trajectory.site_name == "traj"
+    assert trajectory.times[0] == datetime(2024, 1, 1, 1, tzinfo=timezone.utc)
+    # разрыв больше 10 минут заполнен тремя пустыми точками
+    assert len(trajectory.times) == 6
+    assert list(trajectory.traj_lat[2:5]) == [None, None, None]
+    assert trajectory.traj_hm[-1] == 310.0
+
+
+def test_load_missing_trajectory(tmp_path):
+    assert load_trajectory(tmp_path, "unknown", "traj") is None
+
+
+def test_save_same_trajectory_concurrently(tmp_path):
+    times = np.arange(200_000).astype("datetime64[s]")
+    values = np.zeros(200_000)
+    barrier = threading.Barrier(8)
+
+    def save(_):
+        barrier.wait()
+        return save_trajectory(tmp_path, times, values, values, values)
+
+    with ThreadPoolExecutor(8) as executor:
+        ids = list(executor.map(save, range(8)))
+    assert len(set(ids)) == 1
+    # Временные файлы не остаются
+    assert [path.name for path in tmp_path.iterdir()] == [f"{ids[0]}.npz"]
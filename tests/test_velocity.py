@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+import numpy as np
+import pytest
+from spitec.processing.velocity import *
+from spitec.processing.velocity import _fft_size
+
+
+def plane_wave_series(velocity, azimuth, n_sites=12, seed=0):
+    # Волновой пакет с периодом 40 мин в точках вокруг (50, 30), часть отсчетов пропущена
+    rng = np.random.default_rng(seed)
+    lat = 50 + rng.uniform(-0.7, 0.7, n_sites)
+    lon = 30 + rng.uniform(-1, 1, n_sites)
+    east = RE_km * np.radians(lon - 30) * np.cos(np.radians(np.mean(lat)))
+    north = RE_km * np.radians(lat - np.mean(lat))
+    slowness = np.array([
+        np.sin(np.radians(azimuth)), np.cos(np.radians(azimuth))
+    ]) * 1000 / velocity
+    times = np.arange(0, 4 * 3600, EPOCH_SECONDS, dtype=float)
+    delays = east * slowness[0] + north * slowness[1]
+    phase = times - delays[:, np.newaxis]
+    values = np.sin(2 * np.pi * phase / 2400) * np.exp(-((phase - 7200) / 2400) ** 2)
+    values += rng.normal(0, 0.05, values.shape)
+    values[:, :20] = np.nan
+    values[0, 200:260] = np.nan
+    return SatelliteSeries([f"s{i:03d}" for i in range(n_sites)], times, values, lat, lon)
+
+
+def test_fft_size():
+    assert [_fft_size(size) for size in [1, 7, 181, 2940]] == [1, 8, 192, 3000]
+
+
+def test_estimate_plane_wave():
+    series = plane_wave_series(250, 120)
+    pairs = compute_pair_lags(series, workers=1)
+    assert len(pairs.first) == 12 * 11 // 2
+    estimate = fit_velocity(series, pairs)
+    assert estimate.velocity == pytest.approx(250, rel=0.05)
+    assert estimate.azimuth == pytest.approx(120, abs=3)
+    assert estimate.used.sum() > 0.9 * len(pairs.first)
+
+
+def test_fit_velocity_without_correlation():
+    series = plane_wave_series(250, 120)
+    series.values[:] = np.random.default_rng(1).normal(size=series.values.shape)
+    assert fit_velocity(series, compute_pair_lags(series, workers=1)) is None
+
+
+@pytest.mark.daily_file(3, 2)
+def test_read_satellite_series(daily_file):
+    local_file = daily_file
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    end = datetime(2024, 1, 1, 2, tzinfo=timezone.utc)
+    series = read_satellite_series(
+        local_file, ["s000", "s001", "s002", "s100"], "G01",
+        DataProducts.dtec_20_60, 300, start, end,
+    )
+    assert series.values.shape == (len(series.sites), 241)
+    assert "s100" not in series.sites
+    assert np.all(np.abs(series.lat) <= 90)
@@ -0,0 +1,67 @@
+import pytest
+from spitec.processing.work_budget import *
+from spitec.processing.data_processing import (
+    estimate_read_bytes,
+    retrieve_data_cached,
+    series_cache,
+)
+from spitec.processing.data_products import DataProducts
+from spitec.callbacks.figure import create_site_data_with_values
+from spitec.callbacks.render import apply_work_budget
+from benchmarks.synthetic import site_names
+
+
+def test_plan_sites():
+    sites = ["a", "b", "c", "d"]
+    budget = WorkBudget(max_sites=3, max_samples=0, max_read_bytes=250)
+    read_bytes = {"a": 100, "b": 100, "c": 100, "d": 100}
+    assert plan_sites(sites, read_bytes, budget) == ["a", "b"]
+    # Станции из кэша не читаются
+    assert plan_sites(sites, {"c": 100}, budget) == ["a", "b", "c"]
+    # Хотя бы одна станция рисуется всегда
+    assert plan_sites(sites, {"a": 1000}, budget) == ["a"]
+    assert plan_sites(sites, read_bytes, WorkBudget(0, 0, 0)) == sites
+
+    assert decimation_step(1000, 0) == 1
+    assert decimation_step(1000, 1000) == 1
+    assert decimation_step(1001, 500) == 3
+
+
+def test_work_budget_from_env(monkeypatch):
+    monkeypatch.setenv(MAX_SITES_ENV, "5")
+    monkeypatch.setenv(MAX_READ_MB_ENV, "0.5")
+    budget = WorkBudget.from_env()
+    assert budget.max_sites == 5
+    assert budget.max_samples == DEFAULT_MAX_SAMPLES
+    assert budget.max_read_bytes == 2**19
+
+
+@pytest.mark.daily_file(4, 2, 600)
+def test_degraded_render(daily_file):
+    local_file = daily_file
+    sites = site_names(4)
+    series_cache.clear()
+    read_bytes = estimate_read_bytes(local_file, sites, "G01", DataProducts.roti)
+    assert sorted(read_bytes) == sites
+    retrieve_data_cached(local_file, sites[:1], "G01", DataProducts.roti)
+    assert sorted(estimate_read_bytes(local_file, sites, "G01", DataProducts.roti)) == sites[1:]
+
+    view_state = {
+        "site_data_store": {site: idx for idx, site in enumerate(sites)},
+        "local_file": str(local_file),
+        "sat": "G01",
+        "data_types": "roti",
+    }
+    budget = WorkBudget(max_sites=3, max_samples=0, max_read_bytes=0)
+    limited, hidden_sites = apply_work_budget(view_state, budget)
+    assert list(limited["site_data_store"]) == sites[:3]
+    assert hidden_sites == 1
+    assert len(view_state["site_data_store"]) == 4
+
+    figure = create_site_data_with_values(
+        limited["site_data_store"], "G01", "roti", str(local_file),
+        [0, 24], None, None, None, max_samples=900, hidden_sites=hidden_sites,
+    )
+    assert sum(len(trace.x) for trace in figure.data) <= 900
+    assert "3 of 4" in figure.layout.annotations[0].text
+    series_cache.clear()